@@ -9,9 +9,11 @@ from typing import Any, AsyncIterator, Optional
 from urllib import request
 
 try:
-    from .json_extract import extract_first_json
+    from .json_extract import parse_json_response
+    from . import http_transport
 except ImportError:
-    from json_extract import extract_first_json
+    from json_extract import parse_json_response
+    import http_transport
 
 logger = logging.getLogger("cuenote.core")
 
@@ -91,7 +93,7 @@ def get_available_models() -> list[dict]:
     return CLAUDE_MODELS
 
 
-def generate(
+async def generate(
     prompt: str,
     api_key: str,
     model: Optional[str] = None,
@@ -113,21 +115,16 @@ def generate(
         "temperature": temperature,
     }
 
-    req = request.Request(
-        url,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Content-Type": "application/json",
-            "x-api-key": api_key,
-            "anthropic-version": ANTHROPIC_API_VERSION,
-        },
-        method="POST",
-    )
-
     try:
-        with request.urlopen(req, timeout=120) as response:
-            body = response.read().decode("utf-8")
-        data = json.loads(body)
+        data = await http_transport.post_json(
+            "anthropic",
+            url,
+            payload,
+            headers={
+                "x-api-key": api_key,
+                "anthropic-version": ANTHROPIC_API_VERSION,
+            },
+        )
 
         # Anthropic API 응답에서 텍스트 추출
         content = data.get("content", [])
@@ -141,28 +138,26 @@ def generate(
         raise
 
 
-def call_json(
+async def call_json(
     prompt: str,
     schema_hint: str,
     api_key: str,
     model: Optional[str] = None
 ) -> Any:
-    """JSON 응답을 생성하고 파싱"""
-    text = generate(prompt, api_key, model)
+    """JSON 응답을 생성하고 파싱 (로컬 복구 + 스키마 검증에 실패할 때만 한 번 더 요청)"""
+    text = await generate(prompt, api_key, model)
     try:
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
-    except Exception as exc:
-        logger.warning("JSON parse failed, retrying once: %s", exc)
+        return parse_json_response(text, schema_hint)
+    except ValueError as exc:
+        logger.warning("JSON parse failed after local repair, retrying once: %s", exc)
         repair_prompt = (
             "Return ONLY valid JSON that matches this schema hint.\n"
             f"Schema hint: {schema_hint}\n"
             "If you need to correct formatting, do so silently.\n\n"
             f"Original prompt:\n{prompt}"
         )
-        text = generate(repair_prompt, api_key, model)
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
+        text = await generate(repair_prompt, api_key, model)
+        return parse_json_response(text, schema_hint, final=True)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -177,12 +172,6 @@ async def stream_generate(
     max_tokens: int = 4096,
 ) -> AsyncIterator[str]:
     """스트리밍 방식으로 텍스트 생성"""
-    try:
-        import httpx
-    except ImportError:
-        logger.error("httpx is required for streaming. Install with: pip install httpx")
-        raise ImportError("httpx is required for Anthropic streaming")
-
     if model is None:
         model = DEFAULT_CLAUDE_MODEL
 
@@ -199,38 +188,38 @@ async def stream_generate(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            async with client.stream(
-                "POST",
-                url,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "x-api-key": api_key,
-                    "anthropic-version": ANTHROPIC_API_VERSION,
-                }
-            ) as response:
-                response.raise_for_status()
-
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        try:
-                            data = json.loads(data_str)
-                            event_type = data.get("type", "")
-
-                            if event_type == "content_block_delta":
-                                delta = data.get("delta", {})
-                                if delta.get("type") == "text_delta":
-                                    text = delta.get("text", "")
-                                    if text:
-                                        yield text
-                                        if chunk_delay > 0:
-                                            await asyncio.sleep(chunk_delay)
-                            elif event_type == "message_stop":
-                                break
-                        except json.JSONDecodeError:
-                            continue
+        client = http_transport.get_client("anthropic")
+        async with client.stream(
+            "POST",
+            url,
+            json=payload,
+            headers={
+                "Content-Type": "application/json",
+                "x-api-key": api_key,
+                "anthropic-version": ANTHROPIC_API_VERSION,
+            }
+        ) as response:
+            response.raise_for_status()
+
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]
+                    try:
+                        data = json.loads(data_str)
+                        event_type = data.get("type", "")
+
+                        if event_type == "content_block_delta":
+                            delta = data.get("delta", {})
+                            if delta.get("type") == "text_delta":
+                                text = delta.get("text", "")
+                                if text:
+                                    yield text
+                                    if chunk_delay > 0:
+                                        await asyncio.sleep(chunk_delay)
+                        elif event_type == "message_stop":
+                            break
+                    except json.JSONDecodeError:
+                        continue
     except Exception as e:
         logger.error(f"Anthropic streaming error: {e}")
         raise
@@ -1,6 +1,19 @@
+"""
+CueNote Core - SQLite 데이터 계층
+스레드마다 하나의 연결을 재사용하고(연결별 prepared statement 캐시 유지),
+WAL + synchronous=NORMAL + 메모리 맵 I/O로 동작합니다.
+비동기 라우터는 run_db / fetch_all 등으로 전용 스레드 풀에서 쿼리를 실행해
+이벤트 루프를 막지 않습니다.
+"""
+import asyncio
+import functools
 import logging
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
 
 from .config import DATA_DIR
 
@@ -8,57 +21,347 @@ DB_PATH = DATA_DIR / "cuenote.db"
 
 logger = logging.getLogger("cuenote.core")
 
+# DB 작업 전용 스레드 수 (스레드마다 연결 하나)
+DB_WORKERS = 4
+
+# 연결별 prepared statement 캐시 크기
+STATEMENT_CACHE_SIZE = 256
+
+# 잠금 대기 시간 (초) / 메모리 맵 크기 (바이트)
+BUSY_TIMEOUT_SECONDS = 5.0
+MMAP_SIZE = 256 * 1024 * 1024
+
+T = TypeVar("T")
+
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+# close_all() 이후 각 스레드가 닫힌 연결을 버리고 새로 열도록 하는 세대 번호
+_generation = 0
+
+
+def _connect() -> sqlite3.Connection:
+    # 연결은 만든 스레드에서만 사용하지만, 종료 시 close_all()이 다른 스레드에서 닫을 수 있도록 허용
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
 
 def get_conn() -> sqlite3.Connection:
-    return sqlite3.connect(DB_PATH)
+    """
+    현재 스레드의 공유 연결 (최초 호출 시 생성)
+    호출한 쪽에서 닫지 않습니다. 쓰기는 transaction()으로 묶어 커밋/롤백을 보장하세요.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "generation", -1) != _generation:
+        conn = _connect()
+        with _connections_lock:
+            _connections.append(conn)
+            _local.conn = conn
+            _local.generation = _generation
+    return conn
 
 
-def init_db() -> None:
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """현재 스레드 연결로 트랜잭션 실행 (정상 종료 시 커밋, 예외 시 롤백)"""
     conn = get_conn()
     try:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS todos (
-                id TEXT PRIMARY KEY,
-                note_path TEXT,
-                line_no INTEGER,
-                text TEXT,
-                checked INTEGER,
-                updated_at TEXT
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS notes (
-                path TEXT PRIMARY KEY,
-                content_hash TEXT,
-                updated_at TEXT
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS schedules (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                description TEXT,
-                date TEXT NOT NULL,
-                start_time TEXT,
-                end_time TEXT,
-                color TEXT DEFAULT '#c9a76c',
-                completed INTEGER DEFAULT 0,
-                created_at TEXT,
-                updated_at TEXT
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE INDEX IF NOT EXISTS idx_schedules_date ON schedules(date);
-            """
-        )
+        yield conn
         conn.commit()
-    finally:
-        conn.close()
-    logger.info("Database ready at %s", DB_PATH)
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def close_all() -> None:
+    """모든 스레드의 연결과 DB 스레드 풀 정리 (앱 종료 시)"""
+    global _executor, _generation
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning("Failed to close database connection: %s", e)
+        _connections.clear()
+        _generation += 1
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 비동기 실행 (전용 스레드 풀)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="cuenote-db")
+    return _executor
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """DB를 사용하는 동기 함수를 DB 스레드 풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _fetch_all(sql: str, params: tuple) -> list[tuple]:
+    return get_conn().execute(sql, params).fetchall()
+
+
+def _fetch_one(sql: str, params: tuple) -> Optional[tuple]:
+    return get_conn().execute(sql, params).fetchone()
+
+
+def _execute(sql: str, params: tuple) -> int:
+    with transaction() as conn:
+        return conn.execute(sql, params).rowcount
+
+
+def _execute_many(sql: str, rows: list[tuple]) -> int:
+    with transaction() as conn:
+        return conn.executemany(sql, rows).rowcount
+
+
+async def fetch_all(sql: str, params: tuple = ()) -> list[tuple]:
+    return await run_db(_fetch_all, sql, params)
+
+
+async def fetch_one(sql: str, params: tuple = ()) -> Optional[tuple]:
+    return await run_db(_fetch_one, sql, params)
+
+
+async def execute(sql: str, params: tuple = ()) -> int:
+    """쓰기 쿼리 하나를 트랜잭션으로 실행, 영향받은 행 수 반환"""
+    return await run_db(_execute, sql, params)
+
+
+async def execute_many(sql: str, rows: Iterable[tuple]) -> int:
+    """같은 쓰기 쿼리를 여러 행에 대해 한 트랜잭션으로 실행"""
+    return await run_db(_execute_many, sql, list(rows))
+
+
+def _create_note_fts(conn: sqlite3.Connection) -> None:
+    """
+    note_index 본문 전문 검색용 FTS5 테이블 (external content + 트리거로 자동 동기화)
+    한국어 부분 일치를 위해 trigram 토크나이저를 사용하고, 지원하지 않는 SQLite에서는 unicode61로 대체
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_fts'"
+    ).fetchone()
+    if not exists:
+        for tokenizer in ("trigram", "unicode61 remove_diacritics 2"):
+            try:
+                conn.execute(
+                    f"""
+                    CREATE VIRTUAL TABLE note_fts USING fts5(
+                        title, path, content,
+                        content='note_index', content_rowid='rowid',
+                        tokenize='{tokenizer}'
+                    );
+                    """
+                )
+                break
+            except sqlite3.OperationalError as e:
+                logger.warning("FTS5 tokenizer %s unavailable: %s", tokenizer, e)
+        else:
+            return
+        # 기존 인덱스 내용으로 초기 구축
+        conn.execute("INSERT INTO note_fts(note_fts) VALUES ('rebuild')")
+
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS note_index_fts_insert AFTER INSERT ON note_index BEGIN
+            INSERT INTO note_fts(rowid, title, path, content)
+            VALUES (new.rowid, new.title, new.path, new.content);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS note_index_fts_delete AFTER DELETE ON note_index BEGIN
+            INSERT INTO note_fts(note_fts, rowid, title, path, content)
+            VALUES ('delete', old.rowid, old.title, old.path, old.content);
+        END;
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS note_index_fts_update AFTER UPDATE ON note_index BEGIN
+            INSERT INTO note_fts(note_fts, rowid, title, path, content)
+            VALUES ('delete', old.rowid, old.title, old.path, old.content);
+            INSERT INTO note_fts(rowid, title, path, content)
+            VALUES (new.rowid, new.title, new.path, new.content);
+        END;
+        """
+    )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 스키마 마이그레이션
+# ─────────────────────────────────────────────────────────────────────────────
+
+def prefix_range(prefix: str) -> tuple[str, str]:
+    """
+    접두사 검색용 [하한, 상한) 범위
+    LIKE 'x/%'는 인덱스를 쓰지 못하고 대소문자와 '_'/'%'도 구분하지 않으므로,
+    path >= 하한 AND path < 상한 조건으로 인덱스 범위 검색을 합니다.
+    """
+    if not prefix:
+        return "", "\U0010ffff"
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _migration_initial(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS todos (
+            id TEXT PRIMARY KEY,
+            note_path TEXT,
+            line_no INTEGER,
+            text TEXT,
+            checked INTEGER,
+            updated_at TEXT
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS notes (
+            path TEXT PRIMARY KEY,
+            content_hash TEXT,
+            updated_at TEXT
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS note_index (
+            vault TEXT NOT NULL,
+            path TEXT NOT NULL,
+            mtime_ns INTEGER,
+            size INTEGER,
+            content_hash TEXT,
+            title TEXT,
+            word_count INTEGER,
+            preview TEXT,
+            content TEXT,
+            PRIMARY KEY (vault, path)
+        );
+        """
+    )
+    _create_note_fts(conn)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schedules (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            date TEXT NOT NULL,
+            start_time TEXT,
+            end_time TEXT,
+            color TEXT DEFAULT '#c9a76c',
+            completed INTEGER DEFAULT 0,
+            created_at TEXT,
+            updated_at TEXT
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_schedules_date ON schedules(date);
+        """
+    )
+
+
+def _migration_query_indexes(conn: sqlite3.Connection) -> None:
+    """
+    조회 경로별 인덱스
+    - 노트별 TODO 삭제/경로 변경: note_path
+    - GET /todos, 오늘의 계획: 정렬(updated_at)과 조회 컬럼을 모두 담은 커버링 인덱스
+    - 일정: 날짜 범위 + 시간순 정렬, 날짜별 개수(completed 포함 커버링)
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_todos_note_path ON todos(note_path, line_no)")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_todos_updated
+        ON todos(updated_at, id, note_path, line_no, text, checked)
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_todos_checked_updated
+        ON todos(checked, updated_at, id, note_path, line_no, text)
+        """
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_schedules_date")
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_schedules_date_time
+        ON schedules(date, start_time, created_at, completed)
+        """
+    )
+
+
+# (버전, 설명, 적용 함수) - 버전 순서대로 한 번씩만 적용되며, 기존 항목은 수정하지 않고 새 항목을 추가합니다.
+MIGRATIONS: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "initial schema", _migration_initial),
+    (2, "query indexes for todos and schedules", _migration_query_indexes),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """적용되지 않은 마이그레이션을 각각 하나의 트랜잭션으로 적용하고 현재 버전 반환"""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        );
+        """
+    )
+    conn.commit()
+    current = get_schema_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        # DDL은 암시적 트랜잭션이 시작되지 않으므로 명시적으로 묶음
+        conn.execute("BEGIN")
+        try:
+            apply(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, datetime('now'))",
+                (version, description),
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        logger.info("Database migrated to version %d: %s", version, description)
+        current = version
+    return current
+
+
+def init_db() -> None:
+    conn = get_conn()
+    version = migrate(conn)
+    # 변경된 인덱스의 통계를 갱신해 쿼리 플래너가 커버링 인덱스를 선택하도록 함
+    conn.execute("PRAGMA optimize")
+    logger.info("Database ready at %s (schema version %d)", DB_PATH, version)
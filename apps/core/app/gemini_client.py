@@ -8,10 +8,14 @@ import logging
 from typing import Any, AsyncIterator, Optional
 from urllib import request
 
+import httpx
+
 try:
-    from .json_extract import extract_first_json
+    from . import http_transport
+    from .json_extract import parse_json_response
 except ImportError:
-    from json_extract import extract_first_json
+    import http_transport
+    from json_extract import parse_json_response
 
 logger = logging.getLogger("cuenote.core")
 
@@ -90,13 +94,14 @@ def get_available_models() -> list[dict]:
     return GEMINI_MODELS
 
 
-def generate(
+async def generate(
     prompt: str,
     api_key: str,
     model: Optional[str] = None,
     temperature: float = 0.0,
+    json_mode: bool = False,
 ) -> str:
-    """Gemini API를 통해 텍스트 생성"""
+    """Gemini API를 통해 텍스트 생성 (json_mode: 응답 MIME 타입을 JSON으로 제한)"""
     if model is None:
         model = DEFAULT_GEMINI_MODEL
 
@@ -112,18 +117,11 @@ def generate(
             "temperature": temperature,
         }
     }
-
-    req = request.Request(
-        url,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
+    if json_mode:
+        payload["generationConfig"]["responseMimeType"] = "application/json"
 
     try:
-        with request.urlopen(req, timeout=120) as response:
-            body = response.read().decode("utf-8")
-        data = json.loads(body)
+        data = await http_transport.post_json("gemini", url, payload)
         
         # Gemini API 응답에서 텍스트 추출
         candidates = data.get("candidates", [])
@@ -138,28 +136,26 @@ def generate(
         raise
 
 
-def call_json(
+async def call_json(
     prompt: str,
     schema_hint: str,
     api_key: str,
     model: Optional[str] = None
 ) -> Any:
-    """JSON 응답을 생성하고 파싱"""
-    text = generate(prompt, api_key, model)
+    """JSON 응답을 생성하고 파싱 (로컬 복구 + 스키마 검증에 실패할 때만 한 번 더 요청)"""
+    text = await generate(prompt, api_key, model, json_mode=True)
     try:
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
-    except Exception as exc:
-        logger.warning("JSON parse failed, retrying once: %s", exc)
+        return parse_json_response(text, schema_hint)
+    except ValueError as exc:
+        logger.warning("JSON parse failed after local repair, retrying once: %s", exc)
         repair_prompt = (
             "Return ONLY valid JSON that matches this schema hint.\n"
             f"Schema hint: {schema_hint}\n"
             "If you need to correct formatting, do so silently.\n\n"
             f"Original prompt:\n{prompt}"
         )
-        text = generate(repair_prompt, api_key, model)
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
+        text = await generate(repair_prompt, api_key, model, json_mode=True)
+        return parse_json_response(text, schema_hint, final=True)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -171,17 +167,12 @@ async def stream_generate(
     api_key: str,
     model: Optional[str] = None,
     chunk_delay: float = 0.01,  # 청크 간 딜레이 (초)
+    json_mode: bool = False,
 ) -> AsyncIterator[str]:
     """
     스트리밍 방식으로 텍스트 생성
     Gemini는 빠른 응답을 보내므로, 약간의 딜레이를 추가하여 자연스럽게 표시합니다.
     """
-    try:
-        import httpx
-    except ImportError:
-        logger.error("httpx is required for streaming. Install with: pip install httpx")
-        raise ImportError("httpx is required for Gemini streaming")
-
     if model is None:
         model = DEFAULT_GEMINI_MODEL
 
@@ -197,35 +188,37 @@ async def stream_generate(
             "temperature": 0.0,
         }
     }
+    if json_mode:
+        payload["generationConfig"]["responseMimeType"] = "application/json"
 
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            async with client.stream(
-                "POST",
-                url,
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                response.raise_for_status()
+        client = http_transport.get_client("gemini")
+        async with client.stream(
+            "POST",
+            url,
+            json=payload,
+            headers={"Content-Type": "application/json"}
+        ) as response:
+            response.raise_for_status()
                 
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        try:
-                            data = json.loads(line[6:])
-                            candidates = data.get("candidates", [])
-                            if candidates:
-                                content = candidates[0].get("content", {})
-                                parts = content.get("parts", [])
-                                if parts:
-                                    text = parts[0].get("text", "")
-                                    if text:
-                                        # 텍스트를 그대로 전송 (공백, 줄바꿈 보존)
-                                        # Gemini가 한번에 많이 보내도 SSE로 잘 전달됨
-                                        yield text
-                                        if chunk_delay > 0:
-                                            await asyncio.sleep(chunk_delay)
-                        except json.JSONDecodeError:
-                            continue
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    try:
+                        data = json.loads(line[6:])
+                        candidates = data.get("candidates", [])
+                        if candidates:
+                            content = candidates[0].get("content", {})
+                            parts = content.get("parts", [])
+                            if parts:
+                                text = parts[0].get("text", "")
+                                if text:
+                                    # 텍스트를 그대로 전송 (공백, 줄바꿈 보존)
+                                    # Gemini가 한번에 많이 보내도 SSE로 잘 전달됨
+                                    yield text
+                                    if chunk_delay > 0:
+                                        await asyncio.sleep(chunk_delay)
+                    except json.JSONDecodeError:
+                        continue
     except httpx.HTTPStatusError as e:
         logger.error(f"Gemini API HTTP error: {e.response.status_code} - {e.response.text}")
         raise
@@ -240,20 +233,11 @@ async def stream_generate_json(
     model: Optional[str] = None
 ) -> AsyncIterator[str]:
     """
-    JSON 응답을 스트리밍으로 생성
-    완료 후 JSON 파싱은 클라이언트에서 처리
+    JSON 모드(responseMimeType)로 응답을 스트리밍 생성
+    조각 단위 파싱은 호출자(json_extract.JSONStreamParser)가 처리합니다.
     """
-    full_response = ""
-    async for chunk in stream_generate(prompt, api_key, model):
-        full_response += chunk
+    async for chunk in stream_generate(prompt, api_key, model, chunk_delay=0.0, json_mode=True):
         yield chunk
-    
-    # 스트리밍 완료 후 JSON 유효성 검사 (로깅용)
-    try:
-        extract_first_json(full_response)
-        logger.info("Gemini streaming JSON generation completed successfully")
-    except Exception as e:
-        logger.warning(f"Streamed content may not be valid JSON: {e}")
 
 
 def validate_api_key(api_key: str) -> bool:
@@ -442,9 +426,8 @@ JSON 응답:"""
         result_text = generate_with_image(prompt, image_data, api_key, model)
         
         # JSON 파싱 시도
-        from .json_extract import extract_first_json
-        json_text = extract_first_json(result_text)
-        result = json.loads(json_text)
+        from .json_extract import loads_lenient
+        result = loads_lenient(result_text)
         
         return {
             "markdown": result.get("markdown", result_text),
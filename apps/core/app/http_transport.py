@@ -0,0 +1,106 @@
+"""
+CueNote Core - 공용 비동기 HTTP 전송 계층
+LLM 제공자별로 keep-alive 연결 풀을 공유하는 httpx.AsyncClient를 관리하고,
+제공자별 동시 요청 수를 제한합니다. (h2 패키지가 있으면 원격 API에 HTTP/2 사용)
+"""
+import asyncio
+import logging
+from typing import Any, Optional
+
+import httpx
+
+logger = logging.getLogger("cuenote.core")
+
+# 기본 요청 타임아웃 (초)
+DEFAULT_TIMEOUT = 120.0
+
+# 제공자별 최대 동시 요청 수 (로컬 Ollama는 GPU 하나를 공유하므로 낮게)
+PROVIDER_CONCURRENCY = {
+    "ollama": 2,
+    "gemini": 8,
+    "openai": 8,
+    "anthropic": 8,
+}
+DEFAULT_CONCURRENCY = 4
+
+# 연결 풀 설정
+POOL_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+
+# HTTP/2를 쓰지 않는 제공자 (평문 HTTP 로컬 서버)
+HTTP1_ONLY = {"ollama"}
+
+# 제공자별 클라이언트 / 세마포어 (이벤트 루프별로 생성)
+_clients: dict[str, httpx.AsyncClient] = {}
+_semaphores: dict[str, asyncio.Semaphore] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _check_loop() -> None:
+    """이벤트 루프가 바뀌면 이전 루프에 묶인 클라이언트/세마포어를 버림"""
+    global _loop
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        _clients.clear()
+        _semaphores.clear()
+        _loop = loop
+
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """제공자별 공용 AsyncClient 반환 (최초 호출 시 생성)"""
+    _check_loop()
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=POOL_LIMITS,
+            http2=provider not in HTTP1_ONLY and _http2_available(),
+        )
+        _clients[provider] = client
+    return client
+
+
+def get_semaphore(provider: str) -> asyncio.Semaphore:
+    """제공자별 동시 요청 제한 세마포어"""
+    _check_loop()
+    semaphore = _semaphores.get(provider)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PROVIDER_CONCURRENCY.get(provider, DEFAULT_CONCURRENCY))
+        _semaphores[provider] = semaphore
+    return semaphore
+
+
+async def post_json(
+    provider: str,
+    url: str,
+    payload: dict,
+    headers: Optional[dict] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Any:
+    """JSON POST 요청 후 응답 JSON 반환 (HTTP 오류 시 httpx.HTTPStatusError)"""
+    client = get_client(provider)
+    async with get_semaphore(provider):
+        response = await client.post(url, json=payload, headers=headers, timeout=timeout)
+    if response.is_error:
+        logger.error(
+            "%s API HTTP error: %s - %s", provider, response.status_code, response.text[:500]
+        )
+        response.raise_for_status()
+    return response.json()
+
+
+async def aclose_all() -> None:
+    """모든 공용 클라이언트 종료 (앱 종료 시)"""
+    for client in list(_clients.values()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning("Failed to close HTTP client: %s", e)
+    _clients.clear()
@@ -1,3 +1,25 @@
+"""
+CueNote Core - LLM 응답 JSON 추출
+응답 텍스트에서 첫 JSON 객체를 찾고, 스트리밍 중인 응답을 토큰 단위로 파싱하여
+완성된 필드(예: keyPoints의 각 항목)를 바로 꺼낼 수 있게 합니다.
+깨지거나 잘린 응답은 다시 LLM을 부르기 전에 여기서 먼저 복구하고(repair_json),
+스키마 힌트로 검증합니다(parse_json_response).
+"""
+import json
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Optional
+
+# 경로 패턴에서 모든 키/인덱스와 일치하는 자리
+WILDCARD = "*"
+
+_SCALAR_END = set(",]}") | set(" \t\r\n")
+
+# 문자열 끝에서 완성되지 않은 이스케이프 (\ 또는 \uXXX)
+_UNFINISHED_ESCAPE = re.compile(r"(?<!\\)(\\\\)*\\(u[0-9a-fA-F]{0,3})?$")
+
+
 def extract_first_json(text: str) -> str:
     start = text.find("{")
     if start == -1:
@@ -29,3 +51,437 @@ def extract_first_json(text: str) -> str:
                 return text[start : i + 1]
 
     raise ValueError("Unbalanced JSON braces")
+
+
+def _matches(path: tuple, patterns: list[tuple]) -> bool:
+    return any(
+        len(pattern) == len(path)
+        and all(p == WILDCARD or p == key for p, key in zip(pattern, path, strict=True))
+        for pattern in patterns
+    )
+
+
+def iter_matches(
+    value: Any, patterns: Iterable[tuple], path: tuple = ()
+) -> Iterator[tuple[tuple, Any]]:
+    """이미 파싱된 값에서 패턴과 일치하는 (경로, 값)을 문서 순서대로 반환 (루트 제외)"""
+    patterns = list(patterns)
+    if isinstance(value, dict):
+        children = value.items()
+    elif isinstance(value, list):
+        children = enumerate(value)
+    else:
+        return
+    for key, child in children:
+        child_path = path + (key,)
+        # 스트리밍 파서와 같은 순서: 안쪽 값이 먼저 완성됨
+        yield from iter_matches(child, patterns, child_path)
+        if _matches(child_path, patterns):
+            yield child_path, child
+
+
+class _Frame:
+    """열려 있는 객체/배열 하나의 파싱 상태"""
+
+    __slots__ = ("kind", "start", "key", "index", "expect", "member_start")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind          # "{" 또는 "["
+        self.start = start        # 여는 괄호 위치
+        self.key: Any = None      # 객체: 현재 키, 배열: 현재 인덱스
+        self.index = 0
+        self.member_start = start + 1  # 객체: 현재 키가 시작된 위치
+        # 객체: key → colon → value → comma, 배열: value → comma
+        self.expect = "key" if kind == "{" else "value"
+
+
+class JSONStreamParser:
+    """
+    LLM 스트리밍 응답을 조각 단위로 받아 완성된 값을 즉시 꺼내는 증분 파서
+    새로 들어온 문자만 한 번씩 훑으므로 전체 비용은 응답 길이에 비례합니다.
+
+    patterns: 꺼낼 값의 경로 (예: ("keyPoints", "*"), ("summary",)). 루트 값은 경로 ()로
+    항상 반환됩니다. 첫 '{' 또는 '[' 앞의 설명문/코드 펜스는 무시합니다.
+    """
+
+    def __init__(self, patterns: Iterable[tuple] = ()):
+        self.patterns = list(patterns)
+        self.text = ""
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._started = False
+        self._root = 0
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._value_start: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        """루트 값이 닫혔는지"""
+        return self._done
+
+    def _path(self) -> tuple:
+        return tuple(frame.key for frame in self._stack)
+
+    def _complete(self, start: int, end: int, events: list):
+        """start~end 구간의 값이 완성됨"""
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None:
+            frame.expect = "comma"
+        path = self._path()
+        if path and not _matches(path, self.patterns):
+            return
+        try:
+            value = json.loads(self.text[start:end])
+        except ValueError:
+            return
+        events.append((path, value))
+
+    def feed(self, chunk: str) -> list[tuple[tuple, Any]]:
+        """응답 조각 추가 → 이번 조각으로 완성된 (경로, 값) 목록"""
+        self.text += chunk
+        events: list[tuple[tuple, Any]] = []
+        text = self.text
+        i = self._pos
+        n = len(text)
+
+        while i < n and not self._done:
+            char = text[i]
+
+            if not self._started:
+                if char in "{[":
+                    self._started = True
+                    self._root = i
+                    self._stack.append(_Frame(char, i))
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    start = self._value_start
+                    assert start is not None  # 문자열은 항상 여는 따옴표 위치를 기록한 뒤 시작
+                    frame = self._stack[-1]
+                    if frame.kind == "{" and frame.expect == "key":
+                        try:
+                            frame.key = json.loads(text[start:i + 1])
+                        except ValueError:
+                            frame.key = text[start + 1:i]
+                        frame.expect = "colon"
+                    else:
+                        self._complete(start, i + 1, events)
+                    self._value_start = None
+                i += 1
+                continue
+
+            if self._value_start is not None:
+                # 숫자 / true / false / null 진행 중
+                if char not in _SCALAR_END:
+                    i += 1
+                    continue
+                self._complete(self._value_start, i, events)
+                self._value_start = None
+
+            frame = self._stack[-1]
+            if frame.kind == "[" and char not in ",]" and not char.isspace():
+                frame.key = frame.index
+            if char == '"':
+                self._in_string = True
+                self._value_start = i
+                if frame.kind == "{" and frame.expect == "key":
+                    frame.member_start = i
+            elif char in "{[":
+                self._stack.append(_Frame(char, i))
+            elif char in "}]":
+                self._stack.pop()
+                if self._stack:
+                    self._complete(frame.start, i + 1, events)
+                else:
+                    self._done = True
+                    try:
+                        events.append(((), json.loads(text[frame.start:i + 1])))
+                    except ValueError:
+                        pass
+            elif char == ",":
+                if frame.kind == "[":
+                    frame.index += 1
+                    frame.expect = "value"
+                else:
+                    frame.key = None
+                    frame.expect = "key"
+            elif char == ":":
+                frame.expect = "value"
+            elif not char.isspace():
+                self._value_start = i
+            i += 1
+
+        self._pos = i
+        return events
+
+    def close(self) -> str:
+        """
+        응답이 중간에 끊긴 경우: 열린 문자열/객체/배열을 닫은 JSON 텍스트
+        (값이 없는 키와 끝의 쉼표는 버림)
+        """
+        if not self._started:
+            raise ValueError("No JSON object found")
+        text = self.text[self._root:self._pos]
+        if self._done:
+            return text
+
+        frame = self._stack[-1]
+        value_started = self._value_start is not None
+        if frame.kind == "{" and (
+            frame.expect == "colon"
+            or (frame.expect == "key" and self._in_string)
+            or (frame.expect == "value" and not value_started)
+        ):
+            # 키만 있고 값이 시작되지 않음 → 멤버 제거
+            text = text[:frame.member_start - self._root]
+        elif self._in_string:
+            text = _UNFINISHED_ESCAPE.sub("", text) + '"'
+        elif self._value_start is not None:
+            scalar = text[self._value_start - self._root:]
+            for literal in ("true", "false", "null"):
+                if literal.startswith(scalar):
+                    text += literal[len(scalar):]
+                    break
+            else:
+                text = text[:self._value_start - self._root] + scalar.rstrip("+-.eE")
+                if not scalar.rstrip("+-.eE") and frame.kind == "{":
+                    text = text[:frame.member_start - self._root]
+
+        text = text.rstrip().rstrip(",")
+        return text + "".join("}" if f.kind == "{" else "]" for f in reversed(self._stack))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 로컬 복구
+# ─────────────────────────────────────────────────────────────────────────────
+
+# ```json ... ``` 코드 펜스 (끝 펜스가 잘린 경우 포함)
+_FENCE = re.compile(r"```[a-zA-Z]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+
+# 여는 따옴표 → 닫는 따옴표로 인정하는 문자 (스마트 따옴표는 짝이 어긋나게 쓰이기도 함)
+_QUOTE_CLOSERS = {
+    '"': '"',
+    "'": "'",
+    "\u201c": "\u201d\u201c\"",
+    "\u201d": "\u201d\u201c\"",
+    "\u2018": "\u2019\u2018'",
+    "\u2019": "\u2019\u2018'",
+}
+
+# 따옴표 없는 키 또는 Python 리터럴
+# (유니코드 단어 문자 기준 - str.isalpha()가 참인 한글 등도 한 단어로 묶음)
+_BARE_WORD = re.compile(r"[^\W\d]\w*")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+# 문자열을 닫는 따옴표 뒤에 올 수 있는 문자 (빈 문자열 = 텍스트 끝)
+_AFTER_STRING = ("", ",", ":", "}", "]")
+
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", '"': '\\"'}
+
+
+def _next_significant(text: str, i: int) -> str:
+    """i 이후 첫 공백 아닌 문자 (없으면 빈 문자열)"""
+    n = len(text)
+    while i < n and text[i].isspace():
+        i += 1
+    return text[i] if i < n else ""
+
+
+def _normalize(text: str) -> str:
+    """
+    흔한 LLM JSON 오류를 표준 JSON 토큰으로 고침 (괄호 짝은 맞추지 않음)
+    - 작은따옴표 / 스마트 따옴표 문자열 → 큰따옴표 문자열
+    - 문자열 안의 이스케이프 안 된 따옴표 / 줄바꿈
+    - 닫는 괄호 앞의 쉼표, 따옴표 없는 키, True/False/None
+    """
+    out: list[str] = []
+    i, n = 0, len(text)
+    quote: Optional[str] = None  # 현재 문자열을 연 따옴표
+
+    while i < n:
+        char = text[i]
+
+        if quote is not None:
+            if char == "\\" and i + 1 < n:
+                # JSON에 없는 \' 이스케이프는 따옴표만 남김
+                out.append("'" if text[i + 1] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if char in _QUOTE_CLOSERS[quote] and _next_significant(text, i + 1) in _AFTER_STRING:
+                out.append('"')
+                quote = None
+            else:
+                out.append(_STRING_ESCAPES.get(char, char))
+            i += 1
+            continue
+
+        if char in _QUOTE_CLOSERS:
+            out.append('"')
+            quote = char
+        elif char == ",":
+            if _next_significant(text, i + 1) not in ("}", "]"):
+                out.append(char)
+        elif char.isalpha() or char == "_":
+            match = _BARE_WORD.match(text, i)
+            if match is None:
+                out.append(char)
+                i += 1
+                continue
+            word = match.group(0)
+            if word in _PY_LITERALS:
+                out.append(_PY_LITERALS[word])
+            elif _next_significant(text, i + len(word)) == ":":
+                out.append(f'"{word}"')
+            else:
+                out.append(word)
+            i += len(word)
+            continue
+        else:
+            out.append(char)
+        i += 1
+
+    return "".join(out)
+
+
+def repair_json(text: str) -> str:
+    """
+    LLM 응답에서 JSON 값을 꺼내 표준 JSON 텍스트로 복구
+    코드 펜스, 닫는 괄호 앞 쉼표, 작은/스마트 따옴표, 끊긴 문자열과 괄호를 처리합니다.
+    JSON 값이 없으면 ValueError.
+    """
+    fence = _FENCE.search(text)
+    if fence and ("{" in fence.group(1) or "[" in fence.group(1)):
+        text = fence.group(1)
+    starts = [pos for pos in (text.find("{"), text.find("[")) if pos != -1]
+    if not starts:
+        raise ValueError("No JSON object found")
+    parser = JSONStreamParser()
+    try:
+        parser.feed(_normalize(text[min(starts):]))
+        return parser.close()
+    except ValueError:
+        raise
+    except Exception as e:
+        # 호출자는 ValueError만 처리하므로(재요청 경로) 예상 못한 복구 실패도 ValueError로 전달
+        raise ValueError(f"Failed to repair JSON: {e}") from e
+
+
+def loads_lenient(text: str) -> Any:
+    """
+    응답 텍스트에서 JSON 값을 파싱 (다시 요청하지 않고 로컬에서 먼저 복구)
+    복구할 수 없으면 ValueError.
+    """
+    try:
+        return json.loads(extract_first_json(text))
+    except ValueError:
+        pass
+    return json.loads(repair_json(text), strict=False)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 스키마 힌트 검증 / 통계
+# ─────────────────────────────────────────────────────────────────────────────
+
+_NUMBER = (int, float)
+_HINT_TYPES = {
+    "array": list, "list": list, "object": dict, "string": str, "float": _NUMBER, "number": _NUMBER,
+}
+
+# 프로세스 시작 이후 JSON 응답 처리 통계
+_stats = {"parsed": 0, "repaired": 0, "failed": 0, "schemaMismatch": 0, "reprompts": 0}
+_stats_lock = threading.Lock()
+
+
+@lru_cache(maxsize=64)
+def schema_fields(schema_hint: str) -> dict[str, Any]:
+    """
+    스키마 힌트에서 기대 필드와 타입 추출 (타입을 모르면 None)
+    - JSON 예시: '{"label": "", "keywords": []}'
+    - 설명문: "ExtractedSchedules with fields schedules (array of ...) and confidence (float)"
+    """
+    try:
+        sample = json.loads(schema_hint)
+    except ValueError:
+        sample = None
+    if isinstance(sample, dict):
+        types = {list: list, dict: dict, str: str, int: _NUMBER, float: _NUMBER}
+        return {key: types.get(type(value)) for key, value in sample.items()}
+
+    match = re.search(r"\bfields?\s+(.+)", schema_hint)
+    if not match:
+        return {}
+    fields: dict[str, Any] = {}
+    for part in re.split(r",|\band\b", match.group(1)):
+        name = re.match(r"\s*([A-Za-z_]\w*)", part)
+        if not name:
+            continue
+        detail = re.search(r"\((\w+)", part)
+        fields[name.group(1)] = _HINT_TYPES.get(detail.group(1).lower()) if detail else None
+    return fields
+
+
+def matches_schema(value: Any, schema_hint: str) -> bool:
+    """
+    파싱된 값이 스키마 힌트와 맞는지 (선택 필드가 빠질 수 있으므로 기대 필드 중 하나 이상 존재 +
+    존재하는 필드의 타입 일치)
+    """
+    fields = schema_fields(schema_hint)
+    if not fields:
+        return True
+    if not isinstance(value, dict):
+        return False
+    present = [key for key in fields if key in value]
+    return bool(present) and all(
+        fields[key] is None or isinstance(value[key], fields[key]) for key in present
+    )
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def parse_json_response(text: str, schema_hint: str = "", final: bool = False) -> Any:
+    """
+    LLM 응답을 파싱하고 스키마 힌트로 검증 (call_json의 공통 단계)
+    그대로 파싱 → 로컬 복구 순으로 시도하며, 둘 다 실패하거나 스키마와 맞지 않으면 ValueError
+    (호출자가 다시 요청). final=True(재요청 응답)이면 스키마가 달라도 파싱된 값을 반환합니다.
+    """
+    if final:
+        _count("reprompts")
+    try:
+        value = json.loads(extract_first_json(text))
+        outcome = "parsed"
+    except ValueError:
+        try:
+            value = json.loads(repair_json(text), strict=False)
+            outcome = "repaired"
+        except ValueError:
+            _count("failed")
+            raise
+    if not matches_schema(value, schema_hint):
+        _count("schemaMismatch")
+        if not final:
+            if outcome == "repaired":
+                _count("failed")
+            raise ValueError(f"Response does not match schema hint: {schema_hint}")
+    _count(outcome)
+    return value
+
+
+def repair_stats() -> dict:
+    """JSON 응답 처리 통계 (로컬 복구 성공률 = 복구 성공 / 그대로 파싱되지 않은 응답)"""
+    with _stats_lock:
+        stats: dict[str, float] = dict(_stats)
+    needed = stats["repaired"] + stats["failed"]
+    stats["repairHitRate"] = round(stats["repaired"] / needed, 4) if needed else 0.0
+    return stats
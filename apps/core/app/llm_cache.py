@@ -0,0 +1,273 @@
+"""
+CueNote Core - LLM 응답 캐시
+temperature 0으로 호출하는 결정적 AI 작업(요약, 번역, 일정 추출 등)의 응답을
+제공자+모델+프롬프트+스키마 힌트 해시로 디스크(SQLite)에 저장합니다.
+TTL이 지난 항목은 무시하고, 전체 크기가 상한을 넘으면 가장 오래 사용하지 않은 항목부터 제거합니다.
+
+SQLite 작업은 db.run_db로 DB 스레드 풀에서 실행하고, 연결 하나(WAL)를 계속 재사용합니다.
+적중 시 접근 시각은 메모리에 모았다가 한 번에 기록하고, 전체 크기는 누적값으로 관리해
+쓰기마다 테이블을 훑지 않습니다.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from .config import DATA_DIR, logger
+from .db import BUSY_TIMEOUT_SECONDS, run_db
+
+CACHE_DB_PATH = DATA_DIR / "llm_cache.db"
+
+# 항목 유효 기간 (초)
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# 캐시 전체 크기 상한 (바이트) - 초과 시 LRU 순으로 목표 크기까지 제거
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+EVICT_TARGET_RATIO = 0.9
+
+# 적중 기록(accessed_at, hit_count)을 모아 두었다가 기록하는 기준 (개수 / 초)
+ACCESS_FLUSH_SIZE = 64
+ACCESS_FLUSH_SECONDS = 30.0
+
+# 만료 항목 일괄 삭제 주기 (초)
+EXPIRE_SWEEP_SECONDS = 60 * 60
+
+# 프로세스 시작 이후 통계
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+_lock = threading.Lock()
+
+# 아래 상태는 모두 _lock 안에서만 사용
+_conn: Optional[sqlite3.Connection] = None
+_total_bytes = 0
+_pending_access: dict[str, tuple[float, int]] = {}
+_last_access_flush = 0.0
+_last_sweep = 0.0
+
+
+def _sum_sizes(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+
+def _get_conn() -> sqlite3.Connection:
+    """공유 연결 (최초 호출 시 생성 + 스키마 준비 + 전체 크기 집계)"""
+    global _conn, _total_bytes
+    if _conn is not None:
+        return _conn
+    conn = sqlite3.connect(CACHE_DB_PATH, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            provider TEXT,
+            model TEXT,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            hit_count INTEGER DEFAULT 0
+        );
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at);")
+    conn.commit()
+    _total_bytes = _sum_sizes(conn)
+    _conn = conn
+    return conn
+
+
+def make_key(provider: str, model: Optional[str], prompt: str, schema_hint: str = "") -> str:
+    """캐시 키 (제공자 + 모델 + 프롬프트 + 스키마 힌트의 SHA-256)"""
+    raw = json.dumps([provider or "ollama", model or "", schema_hint, prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 동기 구현 (DB 스레드 풀에서 실행, _lock 보유)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _flush_access(conn: sqlite3.Connection) -> None:
+    """모아 둔 적중 기록을 한 번에 반영 (커밋은 호출자가 수행)"""
+    global _last_access_flush
+    if _pending_access:
+        conn.executemany(
+            "UPDATE llm_cache SET accessed_at = ?, hit_count = hit_count + ? WHERE key = ?",
+            [(accessed_at, hits, key) for key, (accessed_at, hits) in _pending_access.items()],
+        )
+        _pending_access.clear()
+    _last_access_flush = time.monotonic()
+
+
+def _delete_keys(conn: sqlite3.Connection, rows: list[tuple[str, int]]) -> None:
+    """(키, 크기) 목록 삭제 + 누적 크기 갱신"""
+    global _total_bytes
+    conn.executemany("DELETE FROM llm_cache WHERE key = ?", [(key,) for key, _ in rows])
+    for key, size in rows:
+        _total_bytes -= size
+        _pending_access.pop(key, None)
+
+
+def _get_sync(key: str) -> Optional[Any]:
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute(
+            "SELECT value, created_at, size FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[1] > CACHE_TTL_SECONDS:
+            if row is not None:
+                _delete_keys(conn, [(key, row[2])])
+                conn.commit()
+            _stats["misses"] += 1
+            return None
+
+        _, hits = _pending_access.get(key, (now, 0))
+        _pending_access[key] = (now, hits + 1)
+        if (
+            len(_pending_access) >= ACCESS_FLUSH_SIZE
+            or time.monotonic() - _last_access_flush > ACCESS_FLUSH_SECONDS
+        ):
+            _flush_access(conn)
+            conn.commit()
+        _stats["hits"] += 1
+    return json.loads(row[0])
+
+
+def _put_sync(key: str, data: str, provider: str, model: Optional[str]) -> None:
+    global _total_bytes
+    now = time.time()
+    size = len(data.encode("utf-8"))
+    with _lock:
+        conn = _get_conn()
+        try:
+            old = conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache
+                    (key, provider, model, value, size, created_at, accessed_at, hit_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+                """,
+                (key, provider, model or "", data, size, now, now),
+            )
+            _pending_access.pop(key, None)
+            _total_bytes += size - (old[0] if old else 0)
+            _stats["writes"] += 1
+            _evict(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            # 실패한 쓰기가 누적 크기를 어긋나게 했을 수 있으므로 다시 집계
+            _total_bytes = _sum_sizes(conn)
+            raise
+
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """만료 항목 제거(주기적) 후, 크기 상한 초과 시 가장 오래 사용하지 않은 항목부터 제거"""
+    global _last_sweep
+    if time.monotonic() - _last_sweep > EXPIRE_SWEEP_SECONDS:
+        _last_sweep = time.monotonic()
+        cutoff = time.time() - CACHE_TTL_SECONDS
+        expired = conn.execute(
+            "SELECT key, size FROM llm_cache WHERE created_at < ?", (cutoff,)
+        ).fetchall()
+        if expired:
+            _delete_keys(conn, expired)
+            _stats["evictions"] += len(expired)
+
+    if _total_bytes <= MAX_CACHE_BYTES:
+        return
+
+    # LRU 순서가 정확하도록 모아 둔 접근 시각부터 반영
+    _flush_access(conn)
+    target = MAX_CACHE_BYTES * EVICT_TARGET_RATIO
+    remaining = _total_bytes
+    to_delete: list[tuple[str, int]] = []
+    for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at"):
+        if remaining <= target:
+            break
+        to_delete.append((key, size))
+        remaining -= size
+    _delete_keys(conn, to_delete)
+    _stats["evictions"] += len(to_delete)
+    logger.info("LLM cache evicted %d entries", len(to_delete))
+
+
+def _stats_sync() -> dict:
+    with _lock:
+        conn = _get_conn()
+        entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        total = _total_bytes
+        counters = dict(_stats)
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        **counters,
+        "hitRate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": entries,
+        "bytes": total,
+        "maxBytes": MAX_CACHE_BYTES,
+        "ttlSeconds": CACHE_TTL_SECONDS,
+    }
+
+
+def _clear_sync() -> int:
+    global _total_bytes
+    with _lock:
+        conn = _get_conn()
+        cur = conn.execute("DELETE FROM llm_cache")
+        conn.commit()
+        _pending_access.clear()
+        _total_bytes = 0
+    return cur.rowcount
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 공개 API (비동기)
+# ─────────────────────────────────────────────────────────────────────────────
+
+async def get(key: str) -> Optional[Any]:
+    """캐시된 응답 반환 (없거나 만료되면 None)"""
+    try:
+        return await run_db(_get_sync, key)
+    except Exception as e:
+        logger.warning("LLM cache read failed: %s", e)
+        return None
+
+
+async def put(key: str, value: Any, provider: str = "", model: Optional[str] = None) -> None:
+    """응답을 캐시에 저장하고 필요하면 LRU 제거"""
+    try:
+        data = json.dumps(value, ensure_ascii=False)
+    except (TypeError, ValueError):
+        return
+    try:
+        await run_db(_put_sync, key, data, provider, model)
+    except Exception as e:
+        logger.warning("LLM cache write failed: %s", e)
+
+
+async def stats() -> dict:
+    """캐시 통계 (항목 수, 크기, 적중률 등)"""
+    return await run_db(_stats_sync)
+
+
+async def clear() -> int:
+    """캐시 전체 삭제, 삭제된 항목 수 반환"""
+    return await run_db(_clear_sync)
+
+
+def close() -> None:
+    """모아 둔 적중 기록을 반영하고 연결 종료 (앱 종료 시, DB 스레드 풀 종료 전)"""
+    global _conn
+    with _lock:
+        if _conn is None:
+            return
+        try:
+            _flush_access(_conn)
+            _conn.commit()
+            _conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Failed to close LLM cache: %s", e)
+        _conn = None
@@ -6,7 +6,8 @@ import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .db import init_db
+from .db import init_db, close_all
+from .vault_watcher import vault_watcher
 from .routers import vault_router, todos_router, ai_router, llm_router, environment_router, schedules_router, graph_router, github_router, mcp_router, chatbot_router
 
 # 로거 설정
@@ -46,14 +47,19 @@ app.include_router(chatbot_router)
 async def on_startup() -> None:
     """앱 시작 시 초기화"""
     init_db()
+    await vault_watcher.start()
     logger.info("CueNote core started")
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
     """앱 종료 시 정리"""
-    from . import mcp_client
+    from . import mcp_client, http_transport, llm_cache
+    await vault_watcher.stop()
     await mcp_client.stop_all()
+    await http_transport.aclose_all()
+    llm_cache.close()
+    close_all()
     logger.info("CueNote core stopped")
 
 
@@ -0,0 +1,673 @@
+"""
+CueNote Core - 노트 인덱스
+Vault 내 마크다운 노트의 메타데이터(경로, mtime, 크기, 해시, 제목, 단어 수, 미리보기)를
+SQLite에 영구 저장하고, stat(mtime/size) 비교로 변경된 파일만 다시 읽습니다.
+"""
+import bisect
+import hashlib
+import os
+import re
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import logger
+from .db import get_conn, prefix_range, transaction
+from .todo_index import rename_folder_todos, rename_note_todos
+
+# 같은 Vault를 다시 스캔하기 전 최소 간격 (초)
+REVALIDATE_INTERVAL = 2.0
+
+# 인덱싱에서 제외할 디렉토리
+EXCLUDED_DIRS = {".trash", ".git"}
+
+# Vault별 마지막 스캔 시각
+_last_scan: dict[str, float] = {}
+
+# 파일 감시자가 최신 상태로 유지 중인 Vault (요청 시 재스캔 불필요)
+_watched: set[str] = set()
+
+# Vault별 쓰기 횟수와 계산된 리비전 캐시 (쓰기 횟수가 같을 때만 유효)
+_write_counts: dict[str, int] = {}
+_revisions: dict[str, tuple[int, str]] = {}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 메타데이터 추출
+# ─────────────────────────────────────────────────────────────────────────────
+
+def get_content_hash(content: str) -> str:
+    """노트 내용 해시 (SHA-256)"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def extract_title(rel_path: str, content: str) -> str:
+    """첫 번째 헤딩을 제목으로 사용하고, 없으면 파일 경로를 사용"""
+    first_heading = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+    if first_heading:
+        return first_heading.group(1).strip()
+    return rel_path.replace(".md", "")
+
+
+def build_preview(content: str, max_length: int = 150) -> str:
+    """노트 내용에서 미리보기 텍스트 추출"""
+    # 마크다운 문법 제거
+    text = re.sub(r'^#+\s+', '', content, flags=re.MULTILINE)  # 헤딩
+    text = re.sub(r'!\[.*?\]\(.*?\)', '', text)  # 이미지
+    text = re.sub(r'\[([^\]]+)\]\(.*?\)', r'\1', text)  # 링크
+    text = re.sub(r'[*_~`>]', '', text)  # 강조/인용 등
+    text = re.sub(r'\n{2,}', '\n', text)  # 빈 줄 정리
+    text = text.strip()
+
+    if len(text) > max_length:
+        return text[:max_length].rsplit(' ', 1)[0] + '…'
+    return text
+
+
+def _vault_key(vault_path: Path) -> str:
+    return str(vault_path)
+
+
+def _iter_markdown_files(vault_path: Path):
+    """Vault 내 마크다운 파일의 (상대 경로, stat) 목록 (제외 디렉토리는 건너뜀)"""
+    for dirpath, dirnames, filenames in os.walk(vault_path):
+        dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+        for filename in filenames:
+            if not filename.endswith(".md"):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(full_path)
+            except OSError:
+                continue
+            rel_path = os.path.relpath(full_path, vault_path).replace("\\", "/")
+            yield rel_path, st
+
+
+def _upsert(conn, vault: str, rel_path: str, content: str, mtime_ns: int, size: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO note_index
+            (vault, path, mtime_ns, size, content_hash, title, word_count, preview, content)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(vault, path) DO UPDATE SET
+            mtime_ns = excluded.mtime_ns,
+            size = excluded.size,
+            content_hash = excluded.content_hash,
+            title = excluded.title,
+            word_count = excluded.word_count,
+            preview = excluded.preview,
+            content = excluded.content
+        """,
+        (
+            vault,
+            rel_path,
+            mtime_ns,
+            size,
+            get_content_hash(content),
+            extract_title(rel_path, content),
+            len(content.split()),
+            build_preview(content),
+            content,
+        ),
+    )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 리비전 (Vault 내용 버전)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _bump_revision(vault: str) -> None:
+    """인덱스 내용이 바뀐 뒤(커밋 후) 호출 - 캐시된 리비전 무효화"""
+    _write_counts[vault] = _write_counts.get(vault, 0) + 1
+
+
+def get_revision(vault_path: Path) -> str:
+    """
+    Vault 내용 리비전 (Merkle 방식)
+    폴더별로 (경로, 콘텐츠 해시) 목록을 해시하고, 폴더 해시들을 다시 해시한 루트 값입니다.
+    노트 내용/경로가 하나라도 바뀌면 달라지며, 인덱스에 쓰기가 없는 동안은 캐시된 값을 반환합니다.
+    """
+    refresh(vault_path)
+    vault = _vault_key(vault_path)
+    write_count = _write_counts.get(vault, 0)
+    cached = _revisions.get(vault)
+    if cached and cached[0] == write_count:
+        return cached[1]
+
+    conn = get_conn()
+    rows = conn.execute(
+        "SELECT path, content_hash FROM note_index WHERE vault = ? ORDER BY path",
+        (vault,),
+    ).fetchall()
+
+    folders: dict = {}
+    for path, content_hash in rows:
+        folder = path.rsplit("/", 1)[0] if "/" in path else ""
+        digest = folders.get(folder)
+        if digest is None:
+            digest = folders[folder] = hashlib.sha256()
+        digest.update(f"{path}\0{content_hash}\n".encode("utf-8"))
+
+    root = hashlib.sha256()
+    for folder in sorted(folders):
+        root.update(f"{folder}\0{folders[folder].hexdigest()}\n".encode("utf-8"))
+    revision = root.hexdigest()[:32]
+    _revisions[vault] = (write_count, revision)
+    return revision
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 재검증 (증분 스캔)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def set_watched(vault_path: Path, watched: bool) -> None:
+    """파일 감시자가 해당 Vault의 인덱스를 유지 중인지 표시"""
+    if watched:
+        _watched.add(_vault_key(vault_path))
+    else:
+        _watched.discard(_vault_key(vault_path))
+
+
+def refresh(vault_path: Path, force: bool = False) -> dict:
+    """
+    stat 기반 증분 재검증
+    mtime/size가 바뀐 파일만 다시 읽고, 사라진 파일은 인덱스에서 제거합니다.
+    Returns: {"changed": [다시 읽은 경로], "removed": [제거된 경로], "unchanged": 개수}
+    """
+    vault = _vault_key(vault_path)
+    now = time.monotonic()
+    if not force:
+        if vault in _watched and vault in _last_scan:
+            return {"changed": [], "removed": [], "unchanged": 0, "skipped": True}
+        if now - _last_scan.get(vault, 0.0) < REVALIDATE_INTERVAL:
+            return {"changed": [], "removed": [], "unchanged": 0, "skipped": True}
+
+    stats: dict = {"changed": [], "removed": [], "unchanged": 0}
+    if not vault_path.exists():
+        _last_scan[vault] = now
+        return stats
+    added = 0
+
+    with transaction() as conn:
+        known = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute(
+                "SELECT path, mtime_ns, size FROM note_index WHERE vault = ?", (vault,)
+            )
+        }
+
+        for rel_path, st in _iter_markdown_files(vault_path):
+            previous = known.pop(rel_path, None)
+            if previous == (st.st_mtime_ns, st.st_size):
+                stats["unchanged"] += 1
+                continue
+            try:
+                content = (vault_path / rel_path).read_text(encoding="utf-8")
+            except Exception as e:
+                logger.warning("Failed to index note %s: %s", rel_path, e)
+                continue
+            _upsert(conn, vault, rel_path, content, st.st_mtime_ns, st.st_size)
+            stats["changed"].append(rel_path)
+            if previous is None:
+                added += 1
+
+        if known:
+            conn.executemany(
+                "DELETE FROM note_index WHERE vault = ? AND path = ?",
+                [(vault, path) for path in known],
+            )
+            stats["removed"] = list(known)
+
+    if stats["changed"] or stats["removed"]:
+        _bump_revision(vault)
+    _last_scan[vault] = time.monotonic()
+    if stats["changed"] or stats["removed"]:
+        logger.info(
+            "Note index refreshed: +%d ~%d -%d (%d unchanged)",
+            added, len(stats["changed"]) - added, len(stats["removed"]), stats["unchanged"],
+        )
+    return stats
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 쓰기 경로 훅
+# ─────────────────────────────────────────────────────────────────────────────
+
+def write_atomic(file_path: Path, content: str) -> None:
+    """임시 파일에 쓴 뒤 rename으로 교체 (중간에 실패해도 기존 파일이 깨지지 않음)"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    # .md가 아닌 숨김 이름이라 감시자/인덱스가 임시 파일을 노트로 보지 않음
+    tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if file_path.exists():
+            os.chmod(tmp_path, file_path.stat().st_mode & 0o7777)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _utf16_indexer(content: str):
+    """UTF-16 코드 단위 오프셋(에디터/JS 문자열 기준) → 파이썬 문자열 인덱스 변환 함수"""
+    if content.isascii():
+        astral = []
+    else:
+        astral = [i for i, ch in enumerate(content) if ord(ch) > 0xFFFF]
+    # 각 보조 평면 문자의 UTF-16 시작 오프셋 (앞선 보조 평면 문자마다 코드 단위가 하나씩 더 있음)
+    starts = [i + k for k, i in enumerate(astral)]
+    size = len(content) + len(astral)
+
+    def to_index(offset: int) -> int:
+        if offset < 0 or offset > size:
+            raise ValueError(f"Edit offset {offset} is out of range")
+        before = bisect.bisect_left(starts, offset)
+        if before and starts[before - 1] + 1 == offset:
+            raise ValueError(f"Edit offset {offset} splits a surrogate pair")
+        return offset - before
+
+    return to_index
+
+
+def apply_text_edits(
+    content: str, edits: list[tuple[int, int, str]]
+) -> tuple[str, list[tuple[int, int, int, str]]]:
+    """
+    텍스트 편집 목록 적용
+    edits: (offset, delete, insert) - 오프셋은 원본 기준 UTF-16 코드 단위, 서로 겹치지 않아야 함
+    Returns: (새 내용, 변경 목록)
+        변경: (원본 시작 줄, 원본 끝 줄, 새 시작 줄, 새 내용에서 바뀐 줄들의 텍스트)
+        줄 번호는 1부터 시작합니다.
+    """
+    to_index = _utf16_indexer(content)
+    ordered = sorted(
+        (to_index(offset), to_index(offset + delete), insert) for offset, delete, insert in edits
+    )
+
+    pieces: list[str] = []
+    placed: list[tuple[int, int, int, int]] = []
+    pos = new_len = 0
+    for start, end, insert in ordered:
+        if start < pos:
+            raise ValueError("Edits overlap")
+        pieces.append(content[pos:start])
+        new_len += start - pos
+        placed.append((start, end, new_len, new_len + len(insert)))
+        pieces.append(insert)
+        new_len += len(insert)
+        pos = end
+    pieces.append(content[pos:])
+    new_content = "".join(pieces)
+
+    changes: list[tuple[int, int, int, str]] = []
+    old_line = new_line = 1
+    old_pos = new_pos = 0
+    for start, end, new_start, new_end in placed:
+        old_line += content.count("\n", old_pos, start)
+        new_line += new_content.count("\n", new_pos, new_start)
+        old_pos, new_pos = start, new_start
+        line_start = new_content.rfind("\n", 0, new_start) + 1
+        line_end = new_content.find("\n", new_end)
+        changes.append((
+            old_line,
+            old_line + content.count("\n", start, end),
+            new_line,
+            new_content[line_start:line_end if line_end >= 0 else len(new_content)],
+        ))
+    return new_content, changes
+
+
+def save_note(vault_path: Path, rel_path: str, content: str) -> bool:
+    """
+    노트 저장 (에디터 자동 저장 경로)
+    인덱스에 기록된 콘텐츠 해시와 같고 파일의 mtime/size도 기록 그대로면 쓰지 않습니다.
+    그 외에는 원자적으로 쓰고 새 해시/mtime/size를 인덱스에 기록합니다.
+    Returns: 실제로 파일을 썼으면 True
+    """
+    file_path = vault_path / rel_path
+    row = get_conn().execute(
+        "SELECT mtime_ns, size, content_hash FROM note_index WHERE vault = ? AND path = ?",
+        (_vault_key(vault_path), rel_path),
+    ).fetchone()
+    if row and row[2] == get_content_hash(content):
+        try:
+            st = file_path.stat()
+        except OSError:
+            st = None
+        if st is not None and (st.st_mtime_ns, st.st_size) == (row[0], row[1]):
+            return False
+
+    write_atomic(file_path, content)
+    update_note(vault_path, rel_path, content)
+    return True
+
+
+def update_note(vault_path: Path, rel_path: str, content: Optional[str] = None) -> bool:
+    """
+    단일 노트를 인덱스에 반영 (content가 없으면 파일에서 읽음)
+    Returns: 내용이 새로 추가되었거나 바뀌었으면 True
+    """
+    if not rel_path.endswith(".md"):
+        return False
+    file_path = vault_path / rel_path
+    vault = _vault_key(vault_path)
+
+    with transaction() as conn:
+        try:
+            st = file_path.stat()
+            row = conn.execute(
+                "SELECT mtime_ns, size, content_hash FROM note_index WHERE vault = ? AND path = ?",
+                (vault, rel_path),
+            ).fetchone()
+            if content is None:
+                if row and (row[0], row[1]) == (st.st_mtime_ns, st.st_size):
+                    return False
+                content = file_path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning("Failed to index note %s: %s", rel_path, e)
+            return False
+
+        if row and row[2] == get_content_hash(content):
+            # 내용은 같고 stat만 바뀐 경우
+            if (row[0], row[1]) != (st.st_mtime_ns, st.st_size):
+                conn.execute(
+                    "UPDATE note_index SET mtime_ns = ?, size = ? WHERE vault = ? AND path = ?",
+                    (st.st_mtime_ns, st.st_size, vault, rel_path),
+                )
+            return False
+
+        _upsert(conn, vault, rel_path, content, st.st_mtime_ns, st.st_size)
+    _bump_revision(vault)
+    return True
+
+
+def remove_note(vault_path: Path, rel_path: str) -> None:
+    """노트를 인덱스에서 제거"""
+    with transaction() as conn:
+        conn.execute(
+            "DELETE FROM note_index WHERE vault = ? AND path = ?",
+            (_vault_key(vault_path), rel_path),
+        )
+    _bump_revision(_vault_key(vault_path))
+
+
+def remove_folder(vault_path: Path, folder: str) -> None:
+    """폴더 하위의 모든 노트를 인덱스에서 제거"""
+    with transaction() as conn:
+        conn.execute(
+            "DELETE FROM note_index WHERE vault = ? AND path >= ? AND path < ?",
+            (_vault_key(vault_path), *prefix_range(folder.rstrip("/") + "/")),
+        )
+    _bump_revision(_vault_key(vault_path))
+
+
+def rename_note(vault_path: Path, old_path: str, new_path: str) -> None:
+    """노트 경로 변경을 인덱스에 반영 (TODO도 같은 트랜잭션에서 새 경로 기준 ID로 이동)"""
+    vault = _vault_key(vault_path)
+    with transaction() as conn:
+        # REPLACE 충돌 해결은 삭제 트리거를 실행하지 않으므로 (FTS 동기화) 대상 경로를 먼저 삭제
+        conn.execute("DELETE FROM note_index WHERE vault = ? AND path = ?", (vault, new_path))
+        conn.execute(
+            "UPDATE note_index SET path = ? WHERE vault = ? AND path = ?",
+            (new_path, vault, old_path),
+        )
+        rename_note_todos(conn, old_path, new_path)
+    _bump_revision(vault)
+
+
+def rename_folder(vault_path: Path, old_folder: str, new_folder: str) -> None:
+    """폴더 이름 변경을 하위 노트 경로에 반영 (TODO도 같은 트랜잭션에서 새 경로 기준 ID로 이동)"""
+    old_prefix = old_folder.rstrip("/") + "/"
+    new_prefix = new_folder.rstrip("/") + "/"
+    vault = _vault_key(vault_path)
+    params = (new_prefix, len(old_prefix) + 1, vault, *prefix_range(old_prefix))
+    with transaction() as conn:
+        conn.execute(
+            """
+            DELETE FROM note_index WHERE vault = ? AND path IN (
+                SELECT ? || substr(path, ?) FROM note_index
+                WHERE vault = ? AND path >= ? AND path < ?
+            )
+            """,
+            (vault, *params),
+        )
+        conn.execute(
+            """
+            UPDATE note_index SET path = ? || substr(path, ?)
+            WHERE vault = ? AND path >= ? AND path < ?
+            """,
+            params,
+        )
+        rename_folder_todos(conn, old_prefix, new_prefix)
+    _bump_revision(vault)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 조회
+# ─────────────────────────────────────────────────────────────────────────────
+
+def list_paths(vault_path: Path) -> list[str]:
+    """인덱스된 노트 경로 목록 (정렬됨)"""
+    refresh(vault_path)
+    conn = get_conn()
+    rows = conn.execute(
+        "SELECT path FROM note_index WHERE vault = ? ORDER BY path",
+        (_vault_key(vault_path),),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def list_notes(vault_path: Path, content_chars: int = 0) -> list[dict]:
+    """
+    인덱스된 노트 메타데이터 목록
+    content_chars > 0이면 본문 앞부분을 content 필드로 함께 반환합니다.
+    """
+    refresh(vault_path)
+    conn = get_conn()
+    rows = conn.execute(
+        """
+        SELECT path, mtime_ns, size, content_hash, title, word_count, preview,
+               substr(content, 1, ?)
+        FROM note_index
+        WHERE vault = ?
+        ORDER BY path
+        """,
+        (content_chars, _vault_key(vault_path)),
+    ).fetchall()
+
+    return [_row_to_note(row) for row in rows]
+
+
+def get_notes(vault_path: Path, paths: list[str], content_chars: int = 0) -> dict[str, dict]:
+    """지정한 경로의 노트 메타데이터 (인덱스에 없는 경로는 제외)"""
+    if not paths:
+        return {}
+    refresh(vault_path)
+    placeholders = ",".join("?" for _ in paths)
+    conn = get_conn()
+    rows = conn.execute(
+        f"""
+        SELECT path, mtime_ns, size, content_hash, title, word_count, preview,
+               substr(content, 1, ?)
+        FROM note_index
+        WHERE vault = ? AND path IN ({placeholders})
+        """,
+        (content_chars, _vault_key(vault_path), *paths),
+    ).fetchall()
+    return {row[0]: _row_to_note(row) for row in rows}
+
+
+def _row_to_note(row) -> dict:
+    return {
+        "path": row[0],
+        "mtime": row[1] / 1e9,
+        "size": row[2],
+        "hash": row[3],
+        "title": row[4],
+        "wordCount": row[5],
+        "preview": row[6],
+        "content": row[7] or "",
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 전문 검색 (FTS5 + BM25)
+# ─────────────────────────────────────────────────────────────────────────────
+
+# BM25 컬럼 가중치 (title, path, content)
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+# 검색 결과 하이라이트 마커
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+_fts_tokenizer: Optional[str] = None
+
+
+def _get_fts_tokenizer(conn) -> str:
+    """note_fts 토크나이저 종류 ("trigram" / "unicode61" / "" = FTS 없음)"""
+    global _fts_tokenizer
+    if _fts_tokenizer is None:
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'note_fts'"
+        ).fetchone()
+        if not row:
+            return ""
+        _fts_tokenizer = "trigram" if "trigram" in row[0] else "unicode61"
+    return _fts_tokenizer
+
+
+def parse_query(query: str) -> list[str]:
+    """검색어를 단어 목록으로 분리 ("따옴표 구문" 지원, 끝의 *는 접두어 검색 표시로 무시)"""
+    terms = []
+    for quoted, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        term = (quoted or word).strip().rstrip("*").strip()
+        if term:
+            terms.append(term.lower())
+    return terms
+
+
+def _fts_phrase(term: str, prefix: bool) -> str:
+    phrase = '"' + term.replace('"', '""') + '"'
+    return phrase + "*" if prefix else phrase
+
+
+def _make_snippet(content: str, terms: list[str], radius: int = 50) -> str:
+    """첫 번째 일치 위치 주변 발췌 (FTS를 쓸 수 없는 짧은 검색어용)"""
+    lowered = content.lower()
+    for term in terms:
+        idx = lowered.find(term)
+        if idx >= 0:
+            start = max(0, idx - radius)
+            end = min(len(content), idx + len(term) + radius)
+            return (
+                ("…" if start > 0 else "")
+                + content[start:idx]
+                + HIGHLIGHT_OPEN + content[idx:idx + len(term)] + HIGHLIGHT_CLOSE
+                + content[idx + len(term):end]
+                + ("…" if end < len(content) else "")
+            )
+    return ""
+
+
+def search_notes(vault_path: Path, query: str, limit: int = 20) -> tuple[list[dict], int]:
+    """
+    노트 전문 검색 (제목/경로/본문 전체)
+    FTS5 MATCH + BM25 순위를 사용하고, trigram 토크나이저로 검색할 수 없는 3자 미만 검색어는
+    부분 문자열 조건으로 함께 거릅니다.
+    Returns: (결과 목록 [path, title, preview, snippet, match, score], 전체 일치 개수)
+    """
+    terms = parse_query(query)
+    if not terms:
+        return [], 0
+
+    refresh(vault_path)
+    vault = _vault_key(vault_path)
+    conn = get_conn()
+    tokenizer = _get_fts_tokenizer(conn)
+    if tokenizer == "trigram":
+        fts_terms = [t for t in terms if len(t) >= 3]
+    elif tokenizer:
+        fts_terms = terms
+    else:
+        fts_terms = []
+    like_terms = [t for t in terms if t not in fts_terms]
+
+    like_sql = "".join(
+        " AND (instr(lower(ni.title), ?) > 0 OR instr(lower(ni.path), ?) > 0"
+        " OR instr(lower(ni.content), ?) > 0)"
+        for _ in like_terms
+    )
+    like_params = [t for t in like_terms for _ in range(3)]
+
+    if fts_terms:
+        match = " AND ".join(_fts_phrase(t, prefix=tokenizer != "trigram") for t in fts_terms)
+        from_sql = (
+            "FROM note_fts JOIN note_index ni ON ni.rowid = note_fts.rowid"
+            " WHERE note_fts MATCH ? AND ni.vault = ?" + like_sql
+        )
+        params = [match, vault, *like_params]
+        total = conn.execute(f"SELECT count(*) {from_sql}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""
+            SELECT ni.path, ni.title, ni.preview,
+                   snippet(note_fts, 2, ?, ?, '…', ?),
+                   bm25(note_fts, ?, ?, ?) AS score,
+                   highlight(note_fts, 0, ?, ?)
+            {from_sql}
+            ORDER BY score
+            LIMIT ?
+            """,
+            # trigram은 토큰이 글자 단위이므로 발췌 길이를 최대(64)로
+            [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, 64 if tokenizer == "trigram" else 16, *BM25_WEIGHTS,
+             HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, *params, limit],
+        ).fetchall()
+        results = [
+            {
+                "path": row[0],
+                "title": row[1],
+                "preview": row[2],
+                "snippet": row[3] if HIGHLIGHT_OPEN in row[3] else "",
+                "titleHighlight": row[5],
+                "score": -row[4],
+            }
+            for row in rows
+        ]
+    else:
+        # 짧은 검색어만 있는 경우: 제목 > 경로 > 본문 가중치 점수
+        score_sql = " + ".join(
+            "(instr(lower(ni.title), ?) > 0) * 3 + (instr(lower(ni.path), ?) > 0) * 2"
+            " + (instr(lower(ni.content), ?) > 0)"
+            for _ in like_terms
+        )
+        from_sql = "FROM note_index ni WHERE ni.vault = ?" + like_sql
+        params = [vault, *like_params]
+        total = conn.execute(f"SELECT count(*) {from_sql}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""
+            SELECT ni.path, ni.title, ni.preview, ni.content, {score_sql} AS score
+            {from_sql}
+            ORDER BY score DESC, ni.path
+            LIMIT ?
+            """,
+            [*like_params, *params, limit],
+        ).fetchall()
+        results = [
+            {
+                "path": row[0],
+                "title": row[1],
+                "preview": row[2],
+                "snippet": _make_snippet(row[3] or "", like_terms),
+                "titleHighlight": row[1],
+                "score": float(row[4]),
+            }
+            for row in rows
+        ]
+
+    for result in results:
+        result["match"] = "content" if result["snippet"] else "title"
+    return results, total
@@ -4,9 +4,13 @@ from typing import Any, Optional, AsyncIterator
 from urllib import request
 
 try:
-    from .json_extract import extract_first_json
+    from .json_extract import parse_json_response
+    from . import http_transport
+    from .token_budget import count_tokens
 except ImportError:
-    from json_extract import extract_first_json
+    from json_extract import parse_json_response
+    import http_transport
+    from token_budget import count_tokens
 
 OLLAMA_BASE_URL = "http://127.0.0.1:11434"
 
@@ -21,13 +25,9 @@ MAX_INPUT_CHARS = 12000  # 입력 텍스트 최대 길이 (약 3000 토큰)
 logger = logging.getLogger("cuenote.core")
 
 
-def estimate_tokens(text: str) -> int:
-    """텍스트의 대략적인 토큰 수 추정 (영어 기준 4자 = 1토큰, 한글 기준 1자 = 1토큰)"""
-    # 한글 문자 수
-    korean_chars = sum(1 for c in text if '\uac00' <= c <= '\ud7af')
-    # 영어/기타 문자 수
-    other_chars = len(text) - korean_chars
-    return korean_chars + (other_chars // 4)
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """텍스트의 토큰 수 (모델 tokenizer.json이 있으면 정확히, 없으면 token_budget 추정기)"""
+    return count_tokens(text, "ollama", model)
 
 
 def truncate_text(text: str, max_chars: int = MAX_INPUT_CHARS) -> tuple[str, bool]:
@@ -53,12 +53,18 @@ def truncate_text(text: str, max_chars: int = MAX_INPUT_CHARS) -> tuple[str, boo
     return truncated, True
 
 
-def calculate_context_size(text: str) -> int:
-    """텍스트 길이에 따른 적절한 컨텍스트 크기 계산"""
-    estimated_tokens = estimate_tokens(text)
-    # 입력 + 출력을 위한 여유 공간 (입력의 2배 정도)
-    needed_ctx = estimated_tokens * 3
-    return min(max(needed_ctx, DEFAULT_CONTEXT_TOKENS), MAX_CONTEXT_TOKENS)
+def calculate_context_size(text: str, model: Optional[str] = None) -> int:
+    """
+    텍스트 길이에 따른 적절한 컨텍스트 크기 계산
+    입력 + 출력 여유(입력만큼, 최소 1024)를 2의 거듭제곱으로 올림합니다.
+    num_ctx가 바뀌면 Ollama가 모델을 다시 불러오므로 값의 종류를 적게 유지합니다.
+    """
+    tokens = estimate_tokens(text, model)
+    needed_ctx = tokens + max(tokens, 1024)
+    num_ctx = DEFAULT_CONTEXT_TOKENS
+    while num_ctx < needed_ctx and num_ctx < MAX_CONTEXT_TOKENS:
+        num_ctx *= 2
+    return min(num_ctx, MAX_CONTEXT_TOKENS)
 
 
 def get_installed_models() -> list[dict]:
@@ -99,18 +105,19 @@ def get_installed_models() -> list[dict]:
         return []
 
 
-def generate(
+async def generate(
     prompt: str, 
     temperature: float = 0.0, 
     num_ctx: Optional[int] = None,
-    model: Optional[str] = None
+    model: Optional[str] = None,
+    json_mode: bool = False,
 ) -> str:
-    """Ollama API를 통해 텍스트 생성"""
+    """Ollama API를 통해 텍스트 생성 (json_mode: 응답을 JSON으로 제한)"""
     if model is None:
         model = DEFAULT_OLLAMA_MODEL
     
     if num_ctx is None:
-        num_ctx = calculate_context_size(prompt)
+        num_ctx = calculate_context_size(prompt, model)
     
     payload = {
         "model": model,
@@ -118,35 +125,27 @@ def generate(
         "stream": False,
         "options": {"temperature": temperature, "num_ctx": num_ctx},
     }
-    req = request.Request(
-        f"{OLLAMA_BASE_URL}/api/generate",
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-    with request.urlopen(req, timeout=120) as response:  # 긴 텍스트를 위해 타임아웃 증가
-        body = response.read().decode("utf-8")
-    data = json.loads(body)
+    if json_mode:
+        payload["format"] = "json"
+    data = await http_transport.post_json("ollama", f"{OLLAMA_BASE_URL}/api/generate", payload)
     return data.get("response", "")
 
 
-def call_json(prompt: str, schema_hint: str, model: Optional[str] = None) -> Any:
-    """JSON 응답을 생성하고 파싱"""
-    text = generate(prompt, model=model)
+async def call_json(prompt: str, schema_hint: str, model: Optional[str] = None) -> Any:
+    """JSON 응답을 생성하고 파싱 (로컬 복구 + 스키마 검증에 실패할 때만 한 번 더 요청)"""
+    text = await generate(prompt, model=model, json_mode=True)
     try:
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
-    except Exception as exc:
-        logger.warning("JSON parse failed, retrying once: %s", exc)
+        return parse_json_response(text, schema_hint)
+    except ValueError as exc:
+        logger.warning("JSON parse failed after local repair, retrying once: %s", exc)
         repair_prompt = (
             "Return ONLY valid JSON that matches this schema hint.\n"
             f"Schema hint: {schema_hint}\n"
             "If you need to correct formatting, do so silently.\n\n"
             f"Original prompt:\n{prompt}"
         )
-        text = generate(repair_prompt, model=model)
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
+        text = await generate(repair_prompt, model=model, json_mode=True)
+        return parse_json_response(text, schema_hint, final=True)
 
 
 def process_long_text(text: str, max_chars: int = MAX_INPUT_CHARS) -> tuple[str, str]:
@@ -215,17 +214,35 @@ async def stream_generate_json(
     model: Optional[str] = None
 ) -> AsyncIterator[str]:
     """
-    JSON 응답을 스트리밍으로 생성
-    완료 후 JSON 파싱은 클라이언트에서 처리
+    JSON 모드(format=json)로 응답을 스트리밍 생성
+    조각 단위 파싱은 호출자(json_extract.JSONStreamParser)가 처리합니다.
     """
-    full_response = ""
-    async for chunk in stream_generate(prompt, model):
-        full_response += chunk
-        yield chunk
-    
-    # 스트리밍 완료 후 JSON 유효성 검사 (로깅용)
+    if model is None:
+        model = DEFAULT_OLLAMA_MODEL
+
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "format": "json",
+        "options": {"temperature": 0.0, "num_ctx": calculate_context_size(prompt, model)},
+    }
+    client = http_transport.get_client("ollama")
     try:
-        extract_first_json(full_response)
-        logger.info("Streaming JSON generation completed successfully")
+        async with http_transport.get_semaphore("ollama"):
+            async with client.stream("POST", f"{OLLAMA_BASE_URL}/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        break
     except Exception as e:
-        logger.warning(f"Streamed content may not be valid JSON: {e}")
+        logger.error(f"Ollama JSON streaming failed: {e}")
+        raise
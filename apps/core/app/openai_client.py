@@ -9,9 +9,11 @@ from typing import Any, AsyncIterator, Optional
 from urllib import request
 
 try:
-    from .json_extract import extract_first_json
+    from .json_extract import parse_json_response
+    from . import http_transport
 except ImportError:
-    from json_extract import extract_first_json
+    from json_extract import parse_json_response
+    import http_transport
 
 logger = logging.getLogger("cuenote.core")
 
@@ -121,13 +123,21 @@ def get_available_models() -> list[dict]:
     return OPENAI_MODELS
 
 
-def generate(
+def _json_response_format(prompt: str) -> dict:
+    """JSON 모드 응답 형식 (API가 프롬프트에 'json' 언급을 요구하므로 없으면 일반 텍스트)"""
+    if "json" in prompt.lower():
+        return {"type": "json_object"}
+    return {"type": "text"}
+
+
+async def generate(
     prompt: str,
     api_key: str,
     model: Optional[str] = None,
     temperature: float = 0.0,
+    json_mode: bool = False,
 ) -> str:
-    """OpenAI API를 통해 텍스트 생성"""
+    """OpenAI API를 통해 텍스트 생성 (json_mode: JSON 객체 응답 형식 사용)"""
     if model is None:
         model = DEFAULT_OPENAI_MODEL
 
@@ -140,21 +150,16 @@ def generate(
         ],
         "temperature": temperature,
     }
-
-    req = request.Request(
-        url,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-        },
-        method="POST",
-    )
+    if json_mode:
+        payload["response_format"] = _json_response_format(prompt)
 
     try:
-        with request.urlopen(req, timeout=120) as response:
-            body = response.read().decode("utf-8")
-        data = json.loads(body)
+        data = await http_transport.post_json(
+            "openai",
+            url,
+            payload,
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
 
         # OpenAI API 응답에서 텍스트 추출
         choices = data.get("choices", [])
@@ -167,28 +172,26 @@ def generate(
         raise
 
 
-def call_json(
+async def call_json(
     prompt: str,
     schema_hint: str,
     api_key: str,
     model: Optional[str] = None
 ) -> Any:
-    """JSON 응답을 생성하고 파싱"""
-    text = generate(prompt, api_key, model)
+    """JSON 응답을 생성하고 파싱 (로컬 복구 + 스키마 검증에 실패할 때만 한 번 더 요청)"""
+    text = await generate(prompt, api_key, model, json_mode=True)
     try:
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
-    except Exception as exc:
-        logger.warning("JSON parse failed, retrying once: %s", exc)
+        return parse_json_response(text, schema_hint)
+    except ValueError as exc:
+        logger.warning("JSON parse failed after local repair, retrying once: %s", exc)
         repair_prompt = (
             "Return ONLY valid JSON that matches this schema hint.\n"
             f"Schema hint: {schema_hint}\n"
             "If you need to correct formatting, do so silently.\n\n"
             f"Original prompt:\n{prompt}"
         )
-        text = generate(repair_prompt, api_key, model)
-        json_text = extract_first_json(text)
-        return json.loads(json_text)
+        text = await generate(repair_prompt, api_key, model, json_mode=True)
+        return parse_json_response(text, schema_hint, final=True)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -200,14 +203,9 @@ async def stream_generate(
     api_key: str,
     model: Optional[str] = None,
     chunk_delay: float = 0.0,
+    json_mode: bool = False,
 ) -> AsyncIterator[str]:
-    """스트리밍 방식으로 텍스트 생성"""
-    try:
-        import httpx
-    except ImportError:
-        logger.error("httpx is required for streaming. Install with: pip install httpx")
-        raise ImportError("httpx is required for OpenAI streaming")
-
+    """스트리밍 방식으로 텍스트 생성 (json_mode: JSON 객체 응답 형식 사용)"""
     if model is None:
         model = DEFAULT_OPENAI_MODEL
 
@@ -221,37 +219,39 @@ async def stream_generate(
         "temperature": 0.0,
         "stream": True,
     }
+    if json_mode:
+        payload["response_format"] = _json_response_format(prompt)
 
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            async with client.stream(
-                "POST",
-                url,
-                json=payload,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {api_key}",
-                }
-            ) as response:
-                response.raise_for_status()
+        client = http_transport.get_client("openai")
+        async with client.stream(
+            "POST",
+            url,
+            json=payload,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+            }
+        ) as response:
+            response.raise_for_status()
 
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str == "[DONE]":
-                            break
-                        try:
-                            data = json.loads(data_str)
-                            choices = data.get("choices", [])
-                            if choices:
-                                delta = choices[0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    yield content
-                                    if chunk_delay > 0:
-                                        await asyncio.sleep(chunk_delay)
-                        except json.JSONDecodeError:
-                            continue
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]
+                    if data_str == "[DONE]":
+                        break
+                    try:
+                        data = json.loads(data_str)
+                        choices = data.get("choices", [])
+                        if choices:
+                            delta = choices[0].get("delta", {})
+                            content = delta.get("content", "")
+                            if content:
+                                yield content
+                                if chunk_delay > 0:
+                                    await asyncio.sleep(chunk_delay)
+                    except json.JSONDecodeError:
+                        continue
     except Exception as e:
         logger.error(f"OpenAI streaming error: {e}")
         raise
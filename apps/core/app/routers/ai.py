@@ -3,7 +3,8 @@ CueNote Core - AI 라우터
 요약, 번역, 다듬기, 스트리밍 등 AI 기능
 Ollama 및 Gemini API 지원
 """
-from typing import Optional, cast, Literal
+import json
+from typing import Any, AsyncIterator, Optional, cast, Literal
 from fastapi import APIRouter, HTTPException
 from sse_starlette.sse import EventSourceResponse
 
@@ -12,6 +13,8 @@ from .. import ollama_client
 from .. import gemini_client
 from .. import openai_client
 from .. import anthropic_client
+from .. import llm_cache
+from ..json_extract import JSONStreamParser, iter_matches, parse_json_response
 from ..schemas import (
     SummarizePayload, SummarizeResponse,
     TranslatePayload, TranslateResponse,
@@ -25,60 +28,163 @@ from ..schemas import (
     OCRModelStatus, OCRDownloadResponse,
 )
 
-# 기존 호환성을 위한 import
-from ..ollama_client import process_long_text, MAX_INPUT_CHARS
+from ..text_chunking import split_markdown, map_bounded, reduce_hierarchically
+from ..token_budget import PromptBudget
 
 # MCP 통합
 from .mcp_integration import try_mcp_enhance
 
 
-def call_json_with_provider(
+async def call_json_with_provider(
     prompt: str,
     schema_hint: str,
     provider: str = "ollama",
     api_key: str = "",
-    model: Optional[str] = None
+    model: Optional[str] = None,
+    use_cache: bool = True
 ):
-    """LLM 제공자에 따라 적절한 클라이언트로 JSON 호출"""
-    if provider == "gemini" and api_key:
-        return gemini_client.call_json(prompt, schema_hint, api_key, model)
-    elif provider == "openai" and api_key:
-        return openai_client.call_json(prompt, schema_hint, api_key, model)
-    elif provider == "anthropic" and api_key:
-        return anthropic_client.call_json(prompt, schema_hint, api_key, model)
+    """LLM 제공자에 따라 적절한 클라이언트로 JSON 호출 (응답 캐시 사용)"""
+    if not (provider in ("gemini", "openai", "anthropic") and api_key):
+        provider = "ollama"
+    cache_key = llm_cache.make_key(provider, model, prompt, schema_hint)
+    if use_cache:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if provider == "gemini":
+        result = await gemini_client.call_json(prompt, schema_hint, api_key, model)
+    elif provider == "openai":
+        result = await openai_client.call_json(prompt, schema_hint, api_key, model)
+    elif provider == "anthropic":
+        result = await anthropic_client.call_json(prompt, schema_hint, api_key, model)
     else:
-        return ollama_client.call_json(prompt, schema_hint, model)
+        result = await ollama_client.call_json(prompt, schema_hint, model)
+
+    await llm_cache.put(cache_key, result, provider, model)
+    return result
+
+
+def _json_stream(prompt: str, provider: str, api_key: str, model: Optional[str]) -> AsyncIterator[str]:
+    """제공자별 JSON 모드 스트림 (Anthropic은 JSON 모드가 없어 일반 스트림 + 로컬 복구)"""
+    if provider == "gemini":
+        return gemini_client.stream_generate_json(prompt, api_key, model)
+    if provider == "openai":
+        return openai_client.stream_generate(prompt, api_key, model, json_mode=True)
+    if provider == "anthropic":
+        return anthropic_client.stream_generate(prompt, api_key, model)
+    return ollama_client.stream_generate_json(prompt, model)
+
+
+async def stream_json_with_provider(
+    prompt: str,
+    schema_hint: str,
+    patterns: list[tuple],
+    provider: str = "ollama",
+    api_key: str = "",
+    model: Optional[str] = None,
+    use_cache: bool = True
+) -> AsyncIterator[tuple[tuple, Any]]:
+    """
+    JSON 응답을 스트리밍으로 받아, patterns와 일치하는 필드가 완성될 때마다 (경로, 값) 반환
+    마지막으로 전체 결과를 경로 ()로 반환합니다. 응답 캐시는 call_json_with_provider와 공유합니다.
+
+    응답이 끊기거나 깨졌으면 로컬에서 먼저 복구하고, 그래도 안 될 때만 다시 요청합니다.
+    """
+    if not (provider in ("gemini", "openai", "anthropic") and api_key):
+        provider = "ollama"
+    cache_key = llm_cache.make_key(provider, model, prompt, schema_hint)
+    if use_cache:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            for event in iter_matches(cached, patterns):
+                yield event
+            yield (), cached
+            return
+
+    parser = JSONStreamParser(patterns)
+    emitted: set[tuple] = set()
+    async for chunk in _json_stream(prompt, provider, api_key, model):
+        for path, value in parser.feed(chunk):
+            if path:
+                emitted.add(path)
+                yield path, value
+
+    try:
+        # 끊기거나 깨진 응답은 로컬에서 복구, 스키마 검증까지 통과해야 사용
+        result = parse_json_response(parser.text, schema_hint)
+    except ValueError as exc:
+        logger.warning("Streamed JSON unusable after local repair, requesting again: %s", exc)
+        result = await call_json_with_provider(
+            prompt, schema_hint, provider=provider, api_key=api_key, model=model, use_cache=False
+        )
+    for path, value in iter_matches(result, patterns):
+        if path not in emitted:
+            yield path, value
+
+    await llm_cache.put(cache_key, result, provider, model)
+    yield (), result
+
+
+def sse_json(event: str, data: Any) -> dict:
+    """SSE 이벤트 (데이터는 JSON)"""
+    return {"event": event, "data": json.dumps(data, ensure_ascii=False)}
+
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
 
+# 작업별 출력/입력 토큰 비율 (출력이 입력에 비례하는 작업은 그만큼 입력 예산을 줄임)
+OUTPUT_RATIOS = {
+    "translate": 1.3,
+    "improve": 1.2,
+    "expand": 3.0,
+    "shorten": 0.6,
+    "proofread": 1.2,
+    "summarize": 0.0,
+    "custom": 1.0,
+    "format": 1.2,
+}
+
+
+def fit_prompt(build_prompt, content: str, payload, output_ratio: float = 0.0) -> tuple[str, str, str]:
+    """
+    모델 컨텍스트에서 템플릿(내용 제외)과 출력 예약을 뺀 만큼 내용을 채워 프롬프트 생성
+    Returns: (프롬프트, 처리된 내용, 경고 메시지 또는 빈 문자열)
+    """
+    budget = PromptBudget(payload.provider, payload.api_key, payload.model or None)
+    budget.spend(build_prompt(""))
+    fitted, truncated = budget.fit(content, output_ratio)
+    warning = ""
+    if truncated:
+        warning = f"(원본 텍스트가 너무 길어 일부만 처리되었습니다. 처리된 길이: {len(fitted)}자)"
+        logger.warning(
+            f"Text truncated from {len(content)} to {len(fitted)} chars "
+            f"({budget.provider} {budget.window}-token context)"
+        )
+    return build_prompt(fitted), fitted, warning
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 요약
 # ─────────────────────────────────────────────────────────────────────────────
 
-@router.post("/summarize", response_model=SummarizeResponse)
-async def summarize_note(payload: SummarizePayload):
-    """노트 내용을 요약합니다."""
-    content = payload.content.strip()
-    
-    if not content:
-        raise HTTPException(status_code=400, detail="Content is empty")
-    
-    content, truncation_warning = process_long_text(content)
-    word_count = len(content.split())
-    
-    if word_count < 20:
-        return SummarizeResponse(summary=content, keyPoints=[], wordCount=word_count)
-    
+# 긴 노트는 청크별 요약 → 계층적 병합 (맵-리듀스)
+SUMMARY_SCHEMA_HINT = "SummarizeResult with fields summary, keyPoints"
+
+
+def _summary_language_instruction(language: str) -> str:
     # 언어 설정: auto이면 원문과 같은 언어로 응답
-    if payload.language == "auto":
-        lang_instruction = "in the SAME language as the input text"
-    elif payload.language == "ko":
-        lang_instruction = "한국어로"
-    else:
-        lang_instruction = f"in {payload.language}"
-    
-    prompt = (
+    if language == "auto":
+        return "in the SAME language as the input text"
+    elif language == "ko":
+        return "한국어로"
+    return f"in {language}"
+
+
+def _summary_prompt(content: str, lang_instruction: str) -> str:
+    """요약 프롬프트 (긴 노트의 청크별 요약에도 그대로 사용 → 청크 단위 캐시)"""
+    return (
         f"You are a helpful assistant that summarizes notes. Respond {lang_instruction}.\n"
         "Output MUST be JSON only and match the schema.\n\n"
         "Rules:\n"
@@ -91,38 +197,197 @@ async def summarize_note(payload: SummarizePayload):
         '{\n  "summary": "string",\n  "keyPoints": ["string"]\n}\n'
         "Return JSON only."
     )
+
+
+def _combine_summaries_prompt(partials: str, lang_instruction: str) -> str:
+    """긴 노트의 부분 요약들을 하나로 합치는 프롬프트"""
+    return (
+        f"You are a helpful assistant that merges partial summaries of ONE long note. Respond {lang_instruction}.\n"
+        "Output MUST be JSON only and match the schema.\n\n"
+        "Rules:\n"
+        "- The partial summaries below cover consecutive parts of the note, in order\n"
+        "- summary: A concise 2-3 sentence summary of the WHOLE note\n"
+        "- keyPoints: Up to 5 bullet points with the most important information across all parts\n"
+        "- Do not add information that is not in the partial summaries\n\n"
+        f"Partial summaries:\n{partials}\n\n"
+        "Schema:\n"
+        '{\n  "summary": "string",\n  "keyPoints": ["string"]\n}\n'
+        "Return JSON only."
+    )
+
+
+def _render_summary(result) -> str:
+    """요약 JSON을 리듀스 입력용 텍스트로 변환"""
+    if not isinstance(result, dict):
+        return str(result or "").strip()
+    lines = [str(result.get("summary", "")).strip()]
+    lines += [f"- {point}" for point in result.get("keyPoints", []) if point]
+    return "\n".join(line for line in lines if line)
+
+
+def summary_budget(provider: str, api_key: str, model: Optional[str], lang_instruction: str) -> PromptBudget:
+    """요약/병합 프롬프트 한 번에 넣을 수 있는 내용의 토큰 예산"""
+    budget = PromptBudget(provider, api_key, model)
+    budget.spend(_combine_summaries_prompt("", lang_instruction))
+    return budget
+
+
+async def reduce_long_text(
+    content: str,
+    lang_instruction: str,
+    provider: str,
+    api_key: str,
+    model: Optional[str],
+    use_cache: bool = True
+) -> str:
+    """
+    컨텍스트에 들어가지 않는 텍스트를 맵-리듀스로 줄임
+    제목/문단 경계 청크를 제한된 동시성으로 요약(청크별 캐시)한 뒤,
+    부분 요약이 한 번의 입력에 들어갈 때까지 계층적으로 합친 텍스트를 반환합니다.
+    """
+    async def call(prompt: str):
+        return await call_json_with_provider(
+            prompt, SUMMARY_SCHEMA_HINT,
+            provider=provider, api_key=api_key, model=model, use_cache=use_cache
+        )
+
+    async def summarize_chunk(chunk: str) -> str:
+        return _render_summary(await call(_summary_prompt(chunk, lang_instruction)))
+
+    async def combine(group: str) -> str:
+        return _render_summary(await call(_combine_summaries_prompt(group, lang_instruction)))
+
+    budget = summary_budget(provider, api_key, model, lang_instruction)
+    max_tokens = budget.available()
+    chunks = split_markdown(content, budget.chars_for(content, max_tokens))
+    logger.info(f"Long text split into {len(chunks)} chunks ({len(content)} chars, {max_tokens} tokens each)")
+    partials = [p for p in await map_bounded(chunks, summarize_chunk) if p]
+    return await reduce_hierarchically(partials, combine, budget.chars_for("\n\n".join(partials), max_tokens))
+
+
+async def _summary_request_prompt(
+    content: str,
+    lang_instruction: str,
+    payload: SummarizePayload,
+    model: Optional[str],
+    use_cache: bool
+) -> str:
+    """최종 요약 프롬프트 (컨텍스트를 넘는 노트는 맵-리듀스한 부분 요약을 병합)"""
+    budget = summary_budget(payload.provider, payload.api_key, model, lang_instruction)
+    if budget.count(content) > budget.available():
+        partials = await reduce_long_text(
+            content, lang_instruction, payload.provider, payload.api_key, model, use_cache
+        )
+        return _combine_summaries_prompt(partials, lang_instruction)
+    return _summary_prompt(content, lang_instruction)
+
+
+def _summary_response(result, word_count: int, mcp_used: list) -> dict:
+    if not isinstance(result, dict):
+        result = {}
+    response_data = {
+        "summary": result.get("summary", "요약 생성 실패"),
+        "keyPoints": result.get("keyPoints", []),
+        "wordCount": word_count,
+    }
+    # MCP 도구가 사용된 경우 응답에 포함
+    if mcp_used:
+        response_data["mcp_used"] = mcp_used
+        logger.info("MCP tools used in summarize: %s", [t['tool'] for t in mcp_used])
+    return response_data
+
+
+@router.post("/summarize", response_model=SummarizeResponse)
+async def summarize_note(payload: SummarizePayload):
+    """노트 내용을 요약합니다. (컨텍스트를 넘는 노트는 청크 맵-리듀스)"""
+    content = payload.content.strip()
+    
+    if not content:
+        raise HTTPException(status_code=400, detail="Content is empty")
+    
+    word_count = len(content.split())
+    
+    if word_count < 20:
+        return SummarizeResponse(summary=content, keyPoints=[], wordCount=word_count)
+    
+    lang_instruction = _summary_language_instruction(payload.language)
+    model = payload.model if payload.model else None
+    use_cache = not payload.no_cache
     
     try:
         # MCP 도구 활용 시도
-        mcp_result = await try_mcp_enhance(content, "summarize")
+        mcp_result = await try_mcp_enhance(content[:ollama_client.MAX_INPUT_CHARS], "summarize")
         mcp_used = mcp_result.get("mcp_used", [])
 
-        result = call_json_with_provider(
+        prompt = await _summary_request_prompt(content, lang_instruction, payload, model, use_cache)
+        result = await call_json_with_provider(
             prompt,
-            "SummarizeResult with fields summary, keyPoints",
+            SUMMARY_SCHEMA_HINT,
             provider=payload.provider,
             api_key=payload.api_key,
-            model=payload.model if payload.model else None
+            model=model,
+            use_cache=use_cache
         )
-        summary = result.get("summary", "요약 생성 실패")
-        if truncation_warning:
-            summary = f"{summary}\n\n{truncation_warning}"
-        
-        response_data = {
-            "summary": summary,
-            "keyPoints": result.get("keyPoints", []),
-            "wordCount": word_count,
-        }
-        # MCP 도구가 사용된 경우 응답에 포함
-        if mcp_used:
-            response_data["mcp_used"] = mcp_used
-            logger.info("MCP tools used in summarize: %s", [t['tool'] for t in mcp_used])
-        return response_data
+        return _summary_response(result, word_count, mcp_used)
     except Exception as e:
         logger.error("Summarize failed: %s", e)
         raise HTTPException(status_code=500, detail="Failed to generate summary")
 
 
+# 스트리밍 요약에서 필드별로 보내는 SSE 이벤트 이름
+SUMMARY_STREAM_EVENTS = {"summary": "summary", "keyPoints": "keyPoint"}
+
+
+@router.post("/summarize/stream")
+async def summarize_note_stream(payload: SummarizePayload):
+    """
+    노트 요약 (SSE) - JSON 응답을 스트리밍으로 파싱하여 필드가 완성되는 대로 전송
+    이벤트: mcp, summary(요약 문장), keyPoint(핵심 포인트 하나씩), result(SummarizeResponse), done, error
+    """
+    content = payload.content.strip()
+
+    if not content:
+        raise HTTPException(status_code=400, detail="Content is empty")
+
+    word_count = len(content.split())
+    lang_instruction = _summary_language_instruction(payload.language)
+    model = payload.model if payload.model else None
+    use_cache = not payload.no_cache
+
+    async def event_generator():
+        try:
+            if word_count < 20:
+                yield sse_json("result", {"summary": content, "keyPoints": [], "wordCount": word_count})
+                yield {"event": "done", "data": ""}
+                return
+
+            mcp_result = await try_mcp_enhance(content[:ollama_client.MAX_INPUT_CHARS], "summarize")
+            mcp_used = mcp_result.get("mcp_used", [])
+            if mcp_used:
+                yield {"event": "mcp", "data": json.dumps(mcp_used)}
+
+            prompt = await _summary_request_prompt(content, lang_instruction, payload, model, use_cache)
+            async for path, value in stream_json_with_provider(
+                prompt,
+                SUMMARY_SCHEMA_HINT,
+                [("summary",), ("keyPoints", "*")],
+                provider=payload.provider,
+                api_key=payload.api_key,
+                model=model,
+                use_cache=use_cache
+            ):
+                if path:
+                    yield sse_json(SUMMARY_STREAM_EVENTS[path[0]], value)
+                else:
+                    yield sse_json("result", _summary_response(value, word_count, mcp_used))
+            yield {"event": "done", "data": ""}
+        except Exception as e:
+            logger.error("Summarize stream failed: %s", e)
+            yield {"event": "error", "data": "Failed to generate summary"}
+
+    return EventSourceResponse(event_generator())
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 번역
 # ─────────────────────────────────────────────────────────────────────────────
@@ -135,35 +400,39 @@ async def translate_text(payload: TranslatePayload):
     if not content:
         raise HTTPException(status_code=400, detail="Content is empty")
     
-    content, truncation_warning = process_long_text(content)
-    
     language_names = {
         "ko": "Korean", "en": "English", "ja": "Japanese",
         "zh": "Chinese", "es": "Spanish", "fr": "French", "de": "German"
     }
     target_lang_name = language_names.get(payload.target_language, payload.target_language)
     
-    prompt = (
-        f"Translate the following text to {target_lang_name}.\n"
-        "Output MUST be JSON only and match the schema.\n\n"
-        "CRITICAL RULES:\n"
-        "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
-        "- Only translate the actual text content, not URLs or special markers\n"
-        "- Preserve the original meaning and tone\n"
-        "- Detect the source language\n\n"
-        f"Text to translate:\n{content}\n\n"
-        "Schema:\n"
-        '{\n  "translated": "string",\n  "source_language": "string"\n}\n'
-        "Return JSON only."
+    def build_prompt(text: str) -> str:
+        return (
+            f"Translate the following text to {target_lang_name}.\n"
+            "Output MUST be JSON only and match the schema.\n\n"
+            "CRITICAL RULES:\n"
+            "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
+            "- Only translate the actual text content, not URLs or special markers\n"
+            "- Preserve the original meaning and tone\n"
+            "- Detect the source language\n\n"
+            f"Text to translate:\n{text}\n\n"
+            "Schema:\n"
+            '{\n  "translated": "string",\n  "source_language": "string"\n}\n'
+            "Return JSON only."
+        )
+
+    prompt, content, truncation_warning = fit_prompt(
+        build_prompt, content, payload, OUTPUT_RATIOS["translate"]
     )
     
     try:
-        result = call_json_with_provider(
+        result = await call_json_with_provider(
             prompt,
             "TranslateResult with fields translated, source_language",
             provider=payload.provider,
             api_key=payload.api_key,
-            model=payload.model if payload.model else None
+            model=payload.model if payload.model else None,
+            use_cache=not payload.no_cache
         )
         translated = result.get("translated", content)
         if truncation_warning:
@@ -189,8 +458,6 @@ async def improve_text(payload: ImprovePayload):
     if not content:
         raise HTTPException(status_code=400, detail="Content is empty")
     
-    content, truncation_warning = process_long_text(content)
-    
     style_instructions = {
         "professional": "Make it more professional and polished",
         "casual": "Make it more casual and friendly",
@@ -209,28 +476,34 @@ async def improve_text(payload: ImprovePayload):
     else:
         lang_instruction = f"Write in {payload.language}"
     
-    prompt = (
-        f"Improve the following text. {style_inst}. {lang_instruction}.\n"
-        "Output MUST be JSON only and match the schema.\n\n"
-        "CRITICAL RULES:\n"
-        "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
-        "- Improve grammar, clarity, and flow\n"
-        "- Preserve the original meaning\n"
-        "- List 2-3 key changes made\n"
-        "- IMPORTANT: Match the language of the input text when language is 'auto'\n\n"
-        f"Text to improve:\n{content}\n\n"
-        "Schema:\n"
-        '{\n  "improved": "string",\n  "changes": ["string"]\n}\n'
-        "Return JSON only."
+    def build_prompt(text: str) -> str:
+        return (
+            f"Improve the following text. {style_inst}. {lang_instruction}.\n"
+            "Output MUST be JSON only and match the schema.\n\n"
+            "CRITICAL RULES:\n"
+            "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
+            "- Improve grammar, clarity, and flow\n"
+            "- Preserve the original meaning\n"
+            "- List 2-3 key changes made\n"
+            "- IMPORTANT: Match the language of the input text when language is 'auto'\n\n"
+            f"Text to improve:\n{text}\n\n"
+            "Schema:\n"
+            '{\n  "improved": "string",\n  "changes": ["string"]\n}\n'
+            "Return JSON only."
+        )
+
+    prompt, content, truncation_warning = fit_prompt(
+        build_prompt, content, payload, OUTPUT_RATIOS["improve"]
     )
     
     try:
-        result = call_json_with_provider(
+        result = await call_json_with_provider(
             prompt,
             "ImproveResult with fields improved, changes",
             provider=payload.provider,
             api_key=payload.api_key,
-            model=payload.model if payload.model else None
+            model=payload.model if payload.model else None,
+            use_cache=not payload.no_cache
         )
         improved = result.get("improved", content)
         if truncation_warning:
@@ -256,8 +529,6 @@ async def expand_text(payload: ExpandPayload):
     if not content:
         raise HTTPException(status_code=400, detail="Content is empty")
     
-    content, truncation_warning = process_long_text(content, max_chars=8000)
-    
     # 언어 설정: auto이면 원문과 같은 언어로 응답
     if payload.language == "auto":
         lang_instruction = "Write in the SAME language as the input text"
@@ -266,28 +537,34 @@ async def expand_text(payload: ExpandPayload):
     else:
         lang_instruction = f"Write in {payload.language}"
     
-    prompt = (
-        f"Expand and elaborate on the following text. {lang_instruction}.\n"
-        "Output MUST be JSON only and match the schema.\n\n"
-        "CRITICAL RULES:\n"
-        "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
-        "- Add more detail and explanation\n"
-        "- Keep the same tone and style\n"
-        "- Make it about 2-3x longer\n"
-        "- IMPORTANT: Match the language of the input text when language is 'auto'\n\n"
-        f"Text to expand:\n{content}\n\n"
-        "Schema:\n"
-        '{\n  "expanded": "string"\n}\n'
-        "Return JSON only."
+    def build_prompt(text: str) -> str:
+        return (
+            f"Expand and elaborate on the following text. {lang_instruction}.\n"
+            "Output MUST be JSON only and match the schema.\n\n"
+            "CRITICAL RULES:\n"
+            "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
+            "- Add more detail and explanation\n"
+            "- Keep the same tone and style\n"
+            "- Make it about 2-3x longer\n"
+            "- IMPORTANT: Match the language of the input text when language is 'auto'\n\n"
+            f"Text to expand:\n{text}\n\n"
+            "Schema:\n"
+            '{\n  "expanded": "string"\n}\n'
+            "Return JSON only."
+        )
+
+    prompt, content, truncation_warning = fit_prompt(
+        build_prompt, content, payload, OUTPUT_RATIOS["expand"]
     )
     
     try:
-        result = call_json_with_provider(
+        result = await call_json_with_provider(
             prompt,
             "ExpandResult with field expanded",
             provider=payload.provider,
             api_key=payload.api_key,
-            model=payload.model if payload.model else None
+            model=payload.model if payload.model else None,
+            use_cache=not payload.no_cache
         )
         expanded = result.get("expanded", content)
         if truncation_warning:
@@ -310,8 +587,6 @@ async def shorten_text(payload: ShortenPayload):
     if not content:
         raise HTTPException(status_code=400, detail="Content is empty")
     
-    content, truncation_warning = process_long_text(content)
-    
     # 언어 설정: auto이면 원문과 같은 언어로 응답
     if payload.language == "auto":
         lang_instruction = "Write in the SAME language as the input text"
@@ -320,28 +595,34 @@ async def shorten_text(payload: ShortenPayload):
     else:
         lang_instruction = f"Write in {payload.language}"
     
-    prompt = (
-        f"Shorten and condense the following text. {lang_instruction}.\n"
-        "Output MUST be JSON only and match the schema.\n\n"
-        "CRITICAL RULES:\n"
-        "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
-        "- Keep the essential meaning\n"
-        "- Remove redundancy\n"
-        "- Make it about half the length\n"
-        "- IMPORTANT: Match the language of the input text when language is 'auto'\n\n"
-        f"Text to shorten:\n{content}\n\n"
-        "Schema:\n"
-        '{\n  "shortened": "string"\n}\n'
-        "Return JSON only."
+    def build_prompt(text: str) -> str:
+        return (
+            f"Shorten and condense the following text. {lang_instruction}.\n"
+            "Output MUST be JSON only and match the schema.\n\n"
+            "CRITICAL RULES:\n"
+            "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is\n"
+            "- Keep the essential meaning\n"
+            "- Remove redundancy\n"
+            "- Make it about half the length\n"
+            "- IMPORTANT: Match the language of the input text when language is 'auto'\n\n"
+            f"Text to shorten:\n{text}\n\n"
+            "Schema:\n"
+            '{\n  "shortened": "string"\n}\n'
+            "Return JSON only."
+        )
+
+    prompt, content, truncation_warning = fit_prompt(
+        build_prompt, content, payload, OUTPUT_RATIOS["shorten"]
     )
     
     try:
-        result = call_json_with_provider(
+        result = await call_json_with_provider(
             prompt,
             "ShortenResult with field shortened",
             provider=payload.provider,
             api_key=payload.api_key,
-            model=payload.model if payload.model else None
+            model=payload.model if payload.model else None,
+            use_cache=not payload.no_cache
         )
         shortened = result.get("shortened", content)
         if truncation_warning:
@@ -356,6 +637,79 @@ async def shorten_text(payload: ShortenPayload):
 # 맞춤법 교정
 # ─────────────────────────────────────────────────────────────────────────────
 
+def _proofread_prompt(payload: ProofreadPayload, content: str) -> tuple[str, str, str]:
+    """
+    맞춤법 교정 프롬프트 → (프롬프트, 처리된 내용, 경고 메시지)
+    스키마에서 items를 corrected(전체 텍스트)보다 앞에 두어, 스트리밍 시 수정 항목이 먼저 완성됩니다.
+    """
+    def build_prompt(text: str) -> str:
+        return (
+            "You are a professional proofreader. Find and fix spelling, grammar, and punctuation errors.\n"
+            "Output MUST be JSON only and match the schema.\n\n"
+            "CRITICAL RULES:\n"
+            "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is (headers, lists, bold, italic, links, code)\n"
+            "- Find ALL errors including:\n"
+            "  * Spelling mistakes (e.g., '안녕하세욧' → '안녕하세요', 'teh' → 'the')\n"
+            "  * Grammar errors (e.g., subject-verb agreement, tense)\n"
+            "  * Punctuation (e.g., missing periods, incorrect comma usage)\n"
+            "  * Spacing issues (e.g., '안녕 하세요' → '안녕하세요', 'helloworld' → 'hello world')\n"
+            "- DO NOT change the meaning or style of the text\n"
+            "- DO NOT translate - keep the original language\n"
+            "- If text mixes Korean and English, fix each language according to its rules\n"
+            "- Return EACH error as a separate item in the 'items' array\n"
+            "- For each item, provide: original text, corrected text, reason, and type\n"
+            "- Type must be one of: 'spelling', 'grammar', 'punctuation', 'spacing'\n"
+            "- If there are no errors, return empty items array\n\n"
+            f"Text to proofread:\n{text}\n\n"
+            "Schema:\n"
+            '{\n'
+            '  "items": [\n'
+            '    {\n'
+            '      "original": "wrong word or phrase",\n'
+            '      "corrected": "correct word or phrase",\n'
+            '      "reason": "brief explanation (in same language as the error)",\n'
+            '      "type": "spelling|grammar|punctuation|spacing"\n'
+            '    }\n'
+            '  ],\n'
+            '  "corrected": "string (the full corrected text)",\n'
+            '  "language_detected": "ko|en|mixed"\n'
+            '}\n'
+            "Return JSON only."
+        )
+
+    return fit_prompt(build_prompt, content, payload, OUTPUT_RATIOS["proofread"])
+
+
+def _correction_item(item) -> Optional[CorrectionItem]:
+    if isinstance(item, dict) and "original" in item and "corrected" in item:
+        return CorrectionItem(
+            original=item.get("original", ""),
+            corrected=item.get("corrected", ""),
+            reason=item.get("reason", ""),
+            type=item.get("type", "spelling")
+        )
+    return None
+
+
+def _proofread_response(result, content: str, truncation_warning: str) -> ProofreadResponse:
+    if not isinstance(result, dict):
+        result = {}
+    corrected = result.get("corrected", content)
+    if truncation_warning:
+        corrected = f"{corrected}\n\n{truncation_warning}"
+
+    # items 파싱
+    items = [item for item in map(_correction_item, result.get("items", [])) if item]
+    return ProofreadResponse(
+        corrected=corrected,
+        items=items,
+        language_detected=result.get("language_detected", "")
+    )
+
+
+PROOFREAD_SCHEMA_HINT = "ProofreadResult with fields corrected, items, language_detected"
+
+
 @router.post("/proofread", response_model=ProofreadResponse)
 async def proofread_text(payload: ProofreadPayload):
     """선택된 텍스트의 맞춤법과 문법을 교정합니다. 한국어와 영어를 지원합니다."""
@@ -364,76 +718,62 @@ async def proofread_text(payload: ProofreadPayload):
     if not content:
         raise HTTPException(status_code=400, detail="Content is empty")
     
-    content, truncation_warning = process_long_text(content)
-    
-    prompt = (
-        "You are a professional proofreader. Find and fix spelling, grammar, and punctuation errors.\n"
-        "Output MUST be JSON only and match the schema.\n\n"
-        "CRITICAL RULES:\n"
-        "- PRESERVE ALL MARKDOWN FORMATTING exactly as-is (headers, lists, bold, italic, links, code)\n"
-        "- Find ALL errors including:\n"
-        "  * Spelling mistakes (e.g., '안녕하세욧' → '안녕하세요', 'teh' → 'the')\n"
-        "  * Grammar errors (e.g., subject-verb agreement, tense)\n"
-        "  * Punctuation (e.g., missing periods, incorrect comma usage)\n"
-        "  * Spacing issues (e.g., '안녕 하세요' → '안녕하세요', 'helloworld' → 'hello world')\n"
-        "- DO NOT change the meaning or style of the text\n"
-        "- DO NOT translate - keep the original language\n"
-        "- If text mixes Korean and English, fix each language according to its rules\n"
-        "- Return EACH error as a separate item in the 'items' array\n"
-        "- For each item, provide: original text, corrected text, reason, and type\n"
-        "- Type must be one of: 'spelling', 'grammar', 'punctuation', 'spacing'\n"
-        "- If there are no errors, return empty items array\n\n"
-        f"Text to proofread:\n{content}\n\n"
-        "Schema:\n"
-        '{\n'
-        '  "corrected": "string (the full corrected text)",\n'
-        '  "items": [\n'
-        '    {\n'
-        '      "original": "wrong word or phrase",\n'
-        '      "corrected": "correct word or phrase",\n'
-        '      "reason": "brief explanation (in same language as the error)",\n'
-        '      "type": "spelling|grammar|punctuation|spacing"\n'
-        '    }\n'
-        '  ],\n'
-        '  "language_detected": "ko|en|mixed"\n'
-        '}\n'
-        "Return JSON only."
-    )
+    prompt, content, truncation_warning = _proofread_prompt(payload, content)
     
     try:
-        result = call_json_with_provider(
+        result = await call_json_with_provider(
             prompt,
-            "ProofreadResult with fields corrected, items, language_detected",
+            PROOFREAD_SCHEMA_HINT,
             provider=payload.provider,
             api_key=payload.api_key,
-            model=payload.model if payload.model else None
-        )
-        corrected = result.get("corrected", content)
-        if truncation_warning:
-            corrected = f"{corrected}\n\n{truncation_warning}"
-        
-        # items 파싱
-        raw_items = result.get("items", [])
-        items = []
-        for item in raw_items:
-            if isinstance(item, dict) and "original" in item and "corrected" in item:
-                items.append(CorrectionItem(
-                    original=item.get("original", ""),
-                    corrected=item.get("corrected", ""),
-                    reason=item.get("reason", ""),
-                    type=item.get("type", "spelling")
-                ))
-        
-        return ProofreadResponse(
-            corrected=corrected,
-            items=items,
-            language_detected=result.get("language_detected", "")
+            model=payload.model if payload.model else None,
+            use_cache=not payload.no_cache
         )
+        return _proofread_response(result, content, truncation_warning)
     except Exception as e:
         logger.error("Proofread failed: %s", e)
         raise HTTPException(status_code=500, detail="Failed to proofread text")
 
 
+@router.post("/proofread/stream")
+async def proofread_text_stream(payload: ProofreadPayload):
+    """
+    맞춤법 교정 (SSE) - 수정 항목을 찾는 대로 하나씩 전송
+    이벤트: item(CorrectionItem), result(ProofreadResponse), done, error
+    """
+    content = payload.content.strip()
+
+    if not content:
+        raise HTTPException(status_code=400, detail="Content is empty")
+
+    prompt, content, truncation_warning = _proofread_prompt(payload, content)
+
+    async def event_generator():
+        try:
+            async for path, value in stream_json_with_provider(
+                prompt,
+                PROOFREAD_SCHEMA_HINT,
+                [("items", "*")],
+                provider=payload.provider,
+                api_key=payload.api_key,
+                model=payload.model if payload.model else None,
+                use_cache=not payload.no_cache
+            ):
+                if path:
+                    item = _correction_item(value)
+                    if item:
+                        yield sse_json("item", item.model_dump())
+                else:
+                    response = _proofread_response(value, content, truncation_warning)
+                    yield sse_json("result", response.model_dump())
+            yield {"event": "done", "data": ""}
+        except Exception as e:
+            logger.error("Proofread stream failed: %s", e)
+            yield {"event": "error", "data": "Failed to proofread text"}
+
+    return EventSourceResponse(event_generator())
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 스트리밍
 # ─────────────────────────────────────────────────────────────────────────────
@@ -569,14 +909,28 @@ async def ai_stream(payload: StreamPayload):
     if not content and payload.action != "custom":
         raise HTTPException(status_code=400, detail="Content is empty")
     
-    max_chars = 8000 if payload.action == "expand" else MAX_INPUT_CHARS
-    content, truncation_warning = process_long_text(content, max_chars)
-    payload.content = content
-    
+    def build_prompt(text: str) -> str:
+        payload.content = text
+        return build_stream_prompt(payload)
+
     try:
-        prompt = build_stream_prompt(payload)
+        build_prompt("")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+    # 컨텍스트를 넘는 요약은 자르지 않고 청크 맵-리듀스 후 최종 요약만 스트리밍
+    truncation_warning = ""
+    reduce_long = False
+    if payload.action == "summarize":
+        budget = PromptBudget(payload.provider, payload.api_key, payload.model or None)
+        budget.spend(build_prompt(""))
+        reduce_long = budget.count(content) > budget.available()
+    if reduce_long:
+        prompt = ""
+    else:
+        prompt, content, truncation_warning = fit_prompt(
+            build_prompt, content, payload, OUTPUT_RATIOS.get(payload.action, 1.0)
+        )
     
     # LLM 제공자에 따른 스트리밍 함수 선택
     provider = payload.provider
@@ -586,21 +940,27 @@ async def ai_stream(payload: StreamPayload):
     async def event_generator():
         try:
             # MCP 도구 활용 시도 (스트리밍 전에)
-            mcp_result = await try_mcp_enhance(content, payload.action)
+            mcp_result = await try_mcp_enhance(content[:ollama_client.MAX_INPUT_CHARS], payload.action)
             mcp_used = mcp_result.get("mcp_used", [])
             if mcp_used:
-                import json
                 yield {"event": "mcp", "data": json.dumps(mcp_used)}
 
+            stream_prompt = prompt
+            if reduce_long:
+                partials = await reduce_long_text(
+                    content, _summary_language_instruction("auto"), provider, api_key, model
+                )
+                stream_prompt, _, _ = fit_prompt(build_prompt, partials, payload)
+
             # LLM 제공자에 따른 스트리밍 함수 선택
             if provider == "gemini" and api_key:
-                stream_func = gemini_client.stream_generate(prompt, api_key, model)
+                stream_func = gemini_client.stream_generate(stream_prompt, api_key, model)
             elif provider == "openai" and api_key:
-                stream_func = openai_client.stream_generate(prompt, api_key, model)
+                stream_func = openai_client.stream_generate(stream_prompt, api_key, model)
             elif provider == "anthropic" and api_key:
-                stream_func = anthropic_client.stream_generate(prompt, api_key, model)
+                stream_func = anthropic_client.stream_generate(stream_prompt, api_key, model)
             else:
-                stream_func = ollama_client.stream_generate(prompt, model)
+                stream_func = ollama_client.stream_generate(stream_prompt, model)
             
             async for chunk in stream_func:
                 escaped_chunk = chunk.replace('\n', '\\n')
@@ -621,6 +981,10 @@ async def ai_stream(payload: StreamPayload):
 # 문서 추출 (PDF/이미지 → 마크다운)
 # ─────────────────────────────────────────────────────────────────────────────
 
+# LLM으로 형식화할 최대 청크 수 (넘는 부분은 원문 그대로 덧붙임)
+EXTRACT_MAX_CHUNKS = 16
+
+
 def extract_text_from_pdf(pdf_data: str) -> tuple[str, int]:
     """
     PDF에서 텍스트 추출
@@ -662,16 +1026,8 @@ def extract_text_from_pdf(pdf_data: str) -> tuple[str, int]:
     return "\n\n".join(text_parts), page_count
 
 
-def format_text_as_markdown(
-    text: str,
-    provider: str,
-    api_key: str,
-    language: str,
-    model: Optional[str] = None
-) -> str:
-    """
-    추출된 텍스트를 마크다운 형식으로 정리
-    """
+def _markdown_format_prompt(text: str, language: str) -> str:
+    """추출 텍스트 → 마크다운 형식화 프롬프트"""
     # 언어 설정: auto이면 원문과 같은 언어로 응답
     if language == "auto":
         lang_instruction = "Write in the SAME language as the input text"
@@ -680,7 +1036,7 @@ def format_text_as_markdown(
     else:
         lang_instruction = f"Write in {language}"
     
-    prompt = f"""You are a document converter. Convert the following text into clean markdown format.
+    return f"""You are a document converter. Convert the following text into clean markdown format.
 
 RULES (DO NOT output these rules, just follow them):
 - Use appropriate headings (#, ##, ###)
@@ -697,15 +1053,57 @@ RULES (DO NOT output these rules, just follow them):
 ---END INPUT---
 
 Output the markdown below (no explanations, no instructions, just the converted content):"""
+
+
+async def format_text_as_markdown(
+    text: str,
+    provider: str,
+    api_key: str,
+    language: str,
+    model: Optional[str] = None
+) -> str:
+    """
+    추출된 텍스트를 마크다운 형식으로 정리
+    """
+    prompt = _markdown_format_prompt(text, language)
     
     if provider == "gemini" and api_key:
-        return gemini_client.generate(prompt, api_key, model)
+        return await gemini_client.generate(prompt, api_key, model)
     elif provider == "openai" and api_key:
-        return openai_client.generate(prompt, api_key, model)
+        return await openai_client.generate(prompt, api_key, model)
     elif provider == "anthropic" and api_key:
-        return anthropic_client.generate(prompt, api_key, model)
+        return await anthropic_client.generate(prompt, api_key, model)
     else:
-        return ollama_client.generate(prompt, model=model)
+        return await ollama_client.generate(prompt, model=model)
+
+
+async def format_long_text_as_markdown(
+    text: str,
+    provider: str,
+    api_key: str,
+    language: str,
+    model: Optional[str] = None
+) -> str:
+    """
+    긴 추출 텍스트를 청크로 나누어 제한된 동시성으로 마크다운 형식화한 뒤 이어 붙임
+    청크 수가 EXTRACT_MAX_CHUNKS를 넘으면 나머지는 형식화 없이 원문으로 덧붙입니다.
+    """
+    budget = PromptBudget(provider, api_key, model)
+    budget.spend(_markdown_format_prompt("", language))
+    chunks = split_markdown(text, budget.chars_for(text, budget.available(OUTPUT_RATIOS["format"])))
+    if len(chunks) == 1:
+        return await format_text_as_markdown(text, provider, api_key, language, model)
+
+    formatted_chunks, rest = chunks[:EXTRACT_MAX_CHUNKS], chunks[EXTRACT_MAX_CHUNKS:]
+    logger.info(f"Formatting extracted text in {len(formatted_chunks)} chunks ({len(text)} chars)")
+    parts = await map_bounded(
+        formatted_chunks,
+        lambda chunk: format_text_as_markdown(chunk, provider, api_key, language, model)
+    )
+    if rest:
+        logger.warning(f"Extracted text exceeds {EXTRACT_MAX_CHUNKS} chunks, appending {len(rest)} chunks unformatted")
+        parts.append("".join(rest).strip())
+    return "\n\n".join(part.strip() for part in parts)
 
 
 @router.post("/extract", response_model=DocumentExtractResponse)
@@ -757,11 +1155,6 @@ async def extract_document(payload: DocumentExtractPayload):
                         detail="PDF에서 텍스트를 추출할 수 없습니다."
                     )
             
-            # 텍스트가 너무 길면 잘라내기
-            if len(raw_text) > MAX_INPUT_CHARS * 2:
-                raw_text = raw_text[:MAX_INPUT_CHARS * 2]
-                logger.warning(f"PDF text truncated to {MAX_INPUT_CHARS * 2} chars")
-            
             # raw_text_only 옵션: AI 없이 텍스트만 반환
             if payload.raw_text_only:
                 # 기본적인 마크다운 형식화 (줄바꿈 유지)
@@ -773,7 +1166,7 @@ async def extract_document(payload: DocumentExtractPayload):
                 )
             
             # LLM으로 마크다운 형식화
-            markdown = format_text_as_markdown(
+            markdown = await format_long_text_as_markdown(
                 raw_text,
                 payload.provider,
                 payload.api_key,
@@ -814,11 +1207,6 @@ async def extract_document(payload: DocumentExtractPayload):
                     detail="이미지에서 텍스트를 추출할 수 없습니다."
                 )
             
-            # 텍스트가 너무 길면 잘라내기
-            if len(raw_text) > MAX_INPUT_CHARS * 2:
-                raw_text = raw_text[:MAX_INPUT_CHARS * 2]
-                logger.warning(f"Image text truncated to {MAX_INPUT_CHARS * 2} chars")
-            
             # raw_text_only 옵션: AI 없이 텍스트만 반환
             if payload.raw_text_only:
                 markdown = raw_text.strip()
@@ -829,7 +1217,7 @@ async def extract_document(payload: DocumentExtractPayload):
                 )
             
             # LLM으로 마크다운 형식화
-            markdown = format_text_as_markdown(
+            markdown = await format_long_text_as_markdown(
                 raw_text,
                 payload.provider,
                 payload.api_key,
@@ -914,7 +1302,7 @@ async def extract_url(payload: URLExtractPayload):
             raw_markdown = web_extractor.build_markdown(
                 title, text, images, url
             )
-            markdown_result = format_text_as_markdown(
+            markdown_result = await format_long_text_as_markdown(
                 raw_markdown,
                 payload.provider,
                 payload.api_key,
@@ -6,7 +6,7 @@ import json
 import re
 import shutil
 from datetime import datetime, date
-from typing import Optional
+from typing import AsyncIterator, Optional
 from pathlib import Path
 
 from fastapi import APIRouter, HTTPException
@@ -14,7 +14,13 @@ from pydantic import BaseModel, Field
 from sse_starlette.sse import EventSourceResponse
 
 from ..config import logger
+from .. import note_index
+from ..vault_context import get_current_vault_path, get_trash_path
+from ..token_budget import PromptBudget
+from ..db import run_db
 from .. import ollama_client, gemini_client, openai_client, anthropic_client
+from .. import llm_cache
+from ..json_extract import loads_lenient
 
 try:
     from duckduckgo_search import DDGS
@@ -42,6 +48,7 @@ class ChatPayload(BaseModel):
     history: list[ChatMessage] = Field(default_factory=list, description="대화 히스토리")
     active_note_path: str = Field(default="", description="현재 열려있는 노트 경로")
     active_note_content: str = Field(default="", description="현재 열려있는 노트 내용")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -226,8 +233,6 @@ async def execute_tool(tool_name: str, args: dict, provider: str = "", api_key:
 
 async def _create_note(args: dict) -> dict:
     """노트 생성"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     title = args.get("title", "")
     content = args.get("content", "")
@@ -254,6 +259,7 @@ async def _create_note(args: dict) -> dict:
     
     file_path.write_text(content, encoding="utf-8")
     rel_path = str(file_path.relative_to(vault_path)).replace("\\", "/")
+    await run_db(note_index.update_note, vault_path, rel_path, content)
     
     return {
         "success": True,
@@ -264,23 +270,16 @@ async def _create_note(args: dict) -> dict:
 
 async def _list_notes() -> dict:
     """노트 목록 조회"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
-    notes = []
-    
-    for md_file in sorted(vault_path.rglob("*.md")):
-        rel_path = str(md_file.relative_to(vault_path)).replace("\\", "/")
-        if rel_path.startswith(".trash/") or "/.trash/" in rel_path:
-            continue
-        
-        stat = md_file.stat()
-        notes.append({
-            "path": rel_path,
-            "title": rel_path.replace(".md", ""),
-            "size": stat.st_size,
-            "modified": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M")
-        })
+    notes = [
+        {
+            "path": note["path"],
+            "title": note["path"].replace(".md", ""),
+            "size": note["size"],
+            "modified": datetime.fromtimestamp(note["mtime"]).strftime("%Y-%m-%d %H:%M")
+        }
+        for note in await run_db(note_index.list_notes, vault_path)
+    ]
     
     return {
         "notes": notes,
@@ -291,8 +290,6 @@ async def _list_notes() -> dict:
 
 async def _read_note(args: dict) -> dict:
     """노트 읽기"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     path = args.get("path", "")
     if not path:
@@ -313,8 +310,6 @@ async def _read_note(args: dict) -> dict:
 
 async def _save_note(args: dict) -> dict:
     """노트 저장"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     path = args.get("path", "")
     content = args.get("content", "")
@@ -325,6 +320,7 @@ async def _save_note(args: dict) -> dict:
     file_path = vault_path / path
     file_path.parent.mkdir(parents=True, exist_ok=True)
     file_path.write_text(content, encoding="utf-8")
+    await run_db(note_index.update_note, vault_path, Path(path).as_posix(), content)
     
     return {
         "success": True,
@@ -335,7 +331,6 @@ async def _save_note(args: dict) -> dict:
 
 async def _delete_note(args: dict) -> dict:
     """노트 삭제 (휴지통으로)"""
-    from .vault import get_current_vault_path, get_trash_path
     import shutil
     
     vault_path = get_current_vault_path()
@@ -352,6 +347,7 @@ async def _delete_note(args: dict) -> dict:
     trash_path.mkdir(parents=True, exist_ok=True)
     dest = trash_path / file_path.name
     shutil.move(str(file_path), str(dest))
+    await run_db(note_index.remove_note, vault_path, Path(path).as_posix())
     
     return {
         "success": True,
@@ -362,55 +358,34 @@ async def _delete_note(args: dict) -> dict:
 
 async def _search_notes(args: dict) -> dict:
     """노트 검색"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     query = args.get("query", "").lower()
     if not query:
         return {"error": "검색어가 필요합니다."}
     
-    results = []
-    for md_file in vault_path.rglob("*.md"):
-        rel_path = str(md_file.relative_to(vault_path)).replace("\\", "/")
-        if rel_path.startswith(".trash/") or "/.trash/" in rel_path:
-            continue
-        
-        title = rel_path.replace(".md", "")
-        title_match = query in title.lower()
-        
-        content_match = False
-        snippet = ""
-        try:
-            content = md_file.read_text(encoding="utf-8")
-            idx = content.lower().find(query)
-            if idx >= 0:
-                content_match = True
-                start = max(0, idx - 50)
-                end = min(len(content), idx + len(query) + 50)
-                snippet = "..." + content[start:end] + "..."
-        except Exception:
-            pass
-        
-        if title_match or content_match:
-            results.append({
-                "path": rel_path,
-                "title": title,
-                "match": "title" if title_match else "content",
-                "snippet": snippet if content_match else ""
-            })
+    matches, total = await run_db(note_index.search_notes, vault_path, query, limit=20)
+    results = [
+        {
+            "path": note["path"],
+            "title": note["path"].replace(".md", ""),
+            "match": note["match"],
+            "snippet": note["snippet"]
+        }
+        for note in matches
+    ]
     
     return {
-        "results": results[:20],
-        "count": len(results),
+        "results": results,
+        "count": total,
         "query": query,
-        "message": f"'{query}' 검색 결과: {len(results)}건"
+        "message": f"'{query}' 검색 결과: {total}건"
     }
 
 
 async def _create_schedule(args: dict) -> dict:
     """일정 생성"""
     import uuid
-    from ..db import get_conn
+    from ..db import execute
     
     title = args.get("title", "")
     schedule_date = args.get("date", "")
@@ -427,16 +402,11 @@ async def _create_schedule(args: dict) -> dict:
     end_time = args.get("endTime", "")
     description = args.get("description", "")
     
-    conn = get_conn()
-    try:
-        conn.execute(
-            """INSERT INTO schedules (id, title, description, date, start_time, end_time, color, completed, created_at, updated_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (schedule_id, title, description, schedule_date, start_time, end_time, "#c9a76c", 0, now, now)
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    await execute(
+        """INSERT INTO schedules (id, title, description, date, start_time, end_time, color, completed, created_at, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (schedule_id, title, description, schedule_date, start_time, end_time, "#c9a76c", 0, now, now)
+    )
     
     return {
         "success": True,
@@ -451,28 +421,24 @@ async def _create_schedule(args: dict) -> dict:
 
 async def _list_schedules(args: dict) -> dict:
     """일정 목록 조회"""
-    from ..db import get_conn
+    from ..db import fetch_all, prefix_range
     
     schedule_date = args.get("date", "")
     month = args.get("month", "")
     
-    conn = get_conn()
-    try:
-        if schedule_date:
-            rows = conn.execute(
-                "SELECT * FROM schedules WHERE date = ? ORDER BY start_time", (schedule_date,)
-            ).fetchall()
-        elif month:
-            rows = conn.execute(
-                "SELECT * FROM schedules WHERE date LIKE ? ORDER BY date, start_time", (f"{month}%",)
-            ).fetchall()
-        else:
-            today = date.today().isoformat()
-            rows = conn.execute(
-                "SELECT * FROM schedules WHERE date >= ? ORDER BY date, start_time LIMIT 50", (today,)
-            ).fetchall()
-    finally:
-        conn.close()
+    if schedule_date:
+        rows = await fetch_all(
+            "SELECT * FROM schedules WHERE date = ? ORDER BY start_time", (schedule_date,)
+        )
+    elif month:
+        rows = await fetch_all(
+            "SELECT * FROM schedules WHERE date >= ? AND date < ? ORDER BY date, start_time", prefix_range(month)
+        )
+    else:
+        today = date.today().isoformat()
+        rows = await fetch_all(
+            "SELECT * FROM schedules WHERE date >= ? ORDER BY date, start_time LIMIT 50", (today,)
+        )
     
     schedules = []
     for row in rows:
@@ -496,20 +462,15 @@ async def _list_schedules(args: dict) -> dict:
 
 async def _delete_schedule(args: dict) -> dict:
     """일정 삭제"""
-    from ..db import get_conn
+    from ..db import execute
     
     schedule_id = args.get("schedule_id", "")
     if not schedule_id:
         return {"error": "삭제할 일정 ID가 필요합니다."}
     
-    conn = get_conn()
-    try:
-        cursor = conn.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
-        conn.commit()
-    finally:
-        conn.close()
+    deleted = await execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
     
-    if cursor.rowcount == 0:
+    if deleted == 0:
         return {"error": f"일정 '{schedule_id}'를 찾을 수 없습니다."}
     
     return {
@@ -521,8 +482,6 @@ async def _delete_schedule(args: dict) -> dict:
 
 async def _list_todos() -> dict:
     """TODO 목록 조회"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     todo_pattern = re.compile(r"^\s*-\s*\[(?P<checked>[ xX])\]\s+(?P<text>.+)\s*$")
     
@@ -588,8 +547,6 @@ async def _translate_text(args: dict) -> dict:
 
 async def _create_folder(args: dict) -> dict:
     """폴더 생성"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     path = args.get("path", "")
     if not path:
@@ -649,28 +606,20 @@ async def _web_search(args: dict) -> dict:
 
 async def _smart_search_notes(args: dict, provider: str = "", api_key: str = "", model: str = "") -> dict:
     """AI 기반 스마트 노트 검색"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     query = args.get("query", "")
     if not query:
         return {"error": "검색할 정보를 입력해주세요."}
     
     # 모든 노트 수집 (제목 + 내용 앞부분)
-    notes_info = []
-    for md_file in sorted(vault_path.rglob("*.md")):
-        rel_path = str(md_file.relative_to(vault_path)).replace("\\", "/")
-        if rel_path.startswith(".trash/") or "/.trash/" in rel_path:
-            continue
-        try:
-            content = md_file.read_text(encoding="utf-8")[:1000]
-            notes_info.append({
-                "path": rel_path,
-                "title": rel_path.replace(".md", ""),
-                "preview": content
-            })
-        except Exception:
-            pass
+    notes_info = [
+        {
+            "path": note["path"],
+            "title": note["path"].replace(".md", ""),
+            "preview": note["content"]
+        }
+        for note in await run_db(note_index.list_notes, vault_path, content_chars=1000)
+    ]
     
     if not notes_info:
         return {"results": [], "count": 0, "message": "노트가 없습니다."}
@@ -689,7 +638,7 @@ async def _smart_search_notes(args: dict, provider: str = "", api_key: str = "",
 인덱스 번호만 포함된 JSON 배열만 출력하세요."""
     
     try:
-        llm_result = call_llm_text(search_prompt, provider, api_key, model)
+        llm_result = await call_llm_text(search_prompt, provider, api_key, model)
         # JSON 배열 파싱
         match = re.search(r'\[([\d,\s]*)\]', llm_result)
         if match:
@@ -713,8 +662,6 @@ async def _smart_search_notes(args: dict, provider: str = "", api_key: str = "",
 
 async def _organize_notes(args: dict, provider: str = "", api_key: str = "", model: str = "") -> dict:
     """AI 기반 노트 자동 정리"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     
     # 루트 레벨 노트만 수집 (이미 폴더에 있는 건 제외)
@@ -760,7 +707,7 @@ async def _organize_notes(args: dict, provider: str = "", api_key: str = "", mod
 - JSON만 출력하세요"""
     
     try:
-        llm_result = call_llm_text(organize_prompt, provider, api_key, model)
+        llm_result = await call_llm_text(organize_prompt, provider, api_key, model)
         
         # JSON 파싱
         json_match = re.search(r'\{.*"categories".*\}', llm_result, re.DOTALL)
@@ -786,6 +733,7 @@ async def _organize_notes(args: dict, provider: str = "", api_key: str = "", mod
                     dst = folder_path / note["path"]
                     if src.exists() and not dst.exists():
                         shutil.move(str(src), str(dst))
+                        await run_db(note_index.rename_note, vault_path, note["path"], f"{folder}/{note['path']}")
                         moved.append({"note": note["title"], "folder": folder, "label": label})
         
         return {
@@ -803,8 +751,6 @@ async def _organize_notes(args: dict, provider: str = "", api_key: str = "", mod
 
 async def _move_note(args: dict) -> dict:
     """노트 이동"""
-    from .vault import get_current_vault_path
-    
     vault_path = get_current_vault_path()
     path = args.get("path", "")
     destination = args.get("destination", "")
@@ -827,6 +773,7 @@ async def _move_note(args: dict) -> dict:
     
     shutil.move(str(src), str(dst))
     new_path = str(dst.relative_to(vault_path)).replace("\\", "/")
+    await run_db(note_index.rename_note, vault_path, Path(path).as_posix(), new_path)
     
     return {
         "success": True,
@@ -856,67 +803,27 @@ def build_tool_descriptions() -> str:
     return "\n".join(lines)
 
 
+# 프롬프트에 넣을 최근 대화 메시지 수
+CHAT_HISTORY_MESSAGES = 10
+
+
 def build_chat_prompt(
     user_message: str,
     history: list[ChatMessage],
     today: str,
     active_note_path: str = "",
     active_note_content: str = "",
+    budget: Optional[PromptBudget] = None,
 ) -> str:
-    """챗봇 시스템 프롬프트 생성"""
+    """
+    챗봇 시스템 프롬프트 생성
+    고정 규칙/도구 설명/사용자 메시지를 뺀 남은 컨텍스트를 현재 노트 → 직전 응답 → 이전 대화 순으로 채웁니다.
+    """
+    budget = budget or PromptBudget("ollama")
     tools_desc = build_tool_descriptions()
-    
-    # 대화 히스토리 포맷 (더 명확하게)
-    history_block = ""
-    last_assistant_content = ""
-    if history:
-        hist_lines = []
-        for msg in history[-10:]:
-            if msg.role == "user":
-                hist_lines.append(f"[사용자]: {msg.content}")
-            elif msg.role == "assistant":
-                content = msg.content
-                if len(content) > 2000:
-                    content = content[:2000] + "\n... (이하 생략)"
-                hist_lines.append(f"[어시스턴트]: {content}")
-                last_assistant_content = msg.content
-        history_block = "\n\n".join(hist_lines)
-    
-    # 마지막 어시스턴트 응답이 있으면 명시적으로 표시
-    context_hint = ""
-    if last_assistant_content:
-        truncated = last_assistant_content[:3000]
-        if len(last_assistant_content) > 3000:
-            truncated += "\n... (이하 생략)"
-        context_hint = f"""
 
-## 직전 어시스턴트 응답 (가장 최근에 내가 답변한 내용):
-\"\"\"
-{truncated}
-\"\"\"
-"""
-    
-    # 현재 노트 컨텍스트
-    active_note_section = ""
-    if active_note_path:
-        note_title = active_note_path.replace(".md", "")
-        note_preview = ""
-        if active_note_content:
-            note_preview = active_note_content[:3000]
-            if len(active_note_content) > 3000:
-                note_preview += "\n... (이하 생략)"
-        active_note_section = f"""
-
-## 현재 사용자가 보고 있는 노트:
-파일경로: {active_note_path}
-제목: {note_title}
-내용:
-\"\"\"
-{note_preview}
-\"\"\"
-"""
-    
-    return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
+    def render(active_note_section: str, context_hint: str, history_block: str) -> str:
+        return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
 사용자의 요청에 따라 앱 기능을 실행하고, 친절하게 결과를 안내합니다.
 
 오늘 날짜: {today}
@@ -956,6 +863,59 @@ def build_chat_prompt(
 
 [어시스턴트]:"""
 
+    budget.spend(render("", "", ""))
+
+    # 현재 노트 컨텍스트
+    active_note_section = ""
+    if active_note_path:
+        note_title = active_note_path.replace(".md", "")
+        note_preview = ""
+        if active_note_content:
+            note_preview, truncated = budget.fit(active_note_content, share=0.5)
+            if truncated:
+                note_preview += "\n... (이하 생략)"
+        active_note_section = f"""
+
+## 현재 사용자가 보고 있는 노트:
+파일경로: {active_note_path}
+제목: {note_title}
+내용:
+\"\"\"
+{note_preview}
+\"\"\"
+"""
+
+    # 마지막 어시스턴트 응답이 있으면 명시적으로 표시
+    recent = history[-CHAT_HISTORY_MESSAGES:]
+    last_assistant_content = next((m.content for m in reversed(recent) if m.role == "assistant"), "")
+    context_hint = ""
+    if last_assistant_content:
+        hint, truncated = budget.fit(last_assistant_content, share=0.4)
+        if truncated:
+            hint += "\n... (이하 생략)"
+        context_hint = f"""
+
+## 직전 어시스턴트 응답 (가장 최근에 내가 답변한 내용):
+\"\"\"
+{hint}
+\"\"\"
+"""
+
+    # 대화 히스토리 (최신 메시지부터 남은 예산 안에서)
+    hist_lines = []
+    for msg in reversed(recent):
+        if msg.role not in ("user", "assistant"):
+            continue
+        if budget.available() <= 0:
+            break
+        content, truncated = budget.fit(msg.content, share=0.5)
+        if truncated:
+            content += "\n... (이하 생략)"
+        speaker = "사용자" if msg.role == "user" else "어시스턴트"
+        hist_lines.append(f"[{speaker}]: {content}")
+    history_block = "\n\n".join(reversed(hist_lines))
+
+    return render(active_note_section, context_hint, history_block)
 
 
 def build_result_prompt(
@@ -963,11 +923,13 @@ def build_result_prompt(
     tool_name: str,
     tool_result: dict,
     history: list[ChatMessage],
+    budget: Optional[PromptBudget] = None,
 ) -> str:
-    """도구 실행 결과를 바탕으로 자연어 응답 생성"""
-    result_json = json.dumps(tool_result, ensure_ascii=False, indent=2)
-    
-    return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
+    """도구 실행 결과를 바탕으로 자연어 응답 생성 (결과 JSON은 남은 컨텍스트만큼)"""
+    budget = budget or PromptBudget("ollama")
+
+    def render(result_json: str) -> str:
+        return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
 사용자의 요청에 대해 도구를 실행한 결과입니다. 이 결과를 바탕으로 친절하고 자연스러운 응답을 생성하세요.
 
 사용자 요청: {user_message}
@@ -985,23 +947,25 @@ def build_result_prompt(
 
 응답:"""
 
+    budget.spend(render(""))
+    result_json, truncated = budget.fit(json.dumps(tool_result, ensure_ascii=False, indent=2))
+    if truncated:
+        result_json += "\n... (truncated)"
+    return render(result_json)
+
 
 def build_continuation_prompt(
     user_message: str,
     tool_history: list[dict],
-    today: str
+    today: str,
+    budget: Optional[PromptBudget] = None,
 ) -> str:
-    """멀티스텝 도구 호출을 위한 연속 프롬프트"""
+    """멀티스텝 도구 호출을 위한 연속 프롬프트 (단계별 결과가 남은 컨텍스트를 나눠 씀)"""
+    budget = budget or PromptBudget("ollama")
     tools_desc = build_tool_descriptions()
-    
-    history_text = ""
-    for i, th in enumerate(tool_history, 1):
-        result_str = json.dumps(th["result"], ensure_ascii=False)
-        if len(result_str) > 1000:
-            result_str = result_str[:1000] + "..."
-        history_text += f"\n단계 {i}: {th['name']}({json.dumps(th['args'], ensure_ascii=False)})\n결과: {result_str}\n"
-    
-    return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
+
+    def render(history_text: str) -> str:
+        return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
 사용자의 원래 요청을 완전히 수행하기 위해, 추가 도구 호출이 필요한지 판단하세요.
 
 오늘 날짜: {today}
@@ -1024,21 +988,33 @@ def build_continuation_prompt(
 
 응답:"""
 
+    steps = [
+        f"\n단계 {i}: {th['name']}({json.dumps(th['args'], ensure_ascii=False)})\n결과: "
+        for i, th in enumerate(tool_history, 1)
+    ]
+    budget.spend(render("".join(steps)))
+    history_text = ""
+    for i, (step, th) in enumerate(zip(steps, tool_history)):
+        result_str, truncated = budget.fit(
+            json.dumps(th["result"], ensure_ascii=False), share=1 / (len(steps) - i)
+        )
+        if truncated:
+            result_str += "..."
+        history_text += f"{step}{result_str}\n"
+    return render(history_text)
+
 
 def build_multistep_result_prompt(
     user_message: str,
     tool_history: list[dict],
     history: list[ChatMessage],
+    budget: Optional[PromptBudget] = None,
 ) -> str:
-    """멀티스텝 도구 실행 결과를 바탕으로 자연어 응답 생성"""
-    steps_text = ""
-    for i, th in enumerate(tool_history, 1):
-        result_str = json.dumps(th["result"], ensure_ascii=False, indent=2)
-        if len(result_str) > 2000:
-            result_str = result_str[:2000] + "\n... (truncated)"
-        steps_text += f"\n### 단계 {i}: {th['name']}\n인자: {json.dumps(th['args'], ensure_ascii=False)}\n결과:\n{result_str}\n"
-    
-    return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
+    """멀티스텝 도구 실행 결과를 바탕으로 자연어 응답 생성 (단계별 결과가 남은 컨텍스트를 나눠 씀)"""
+    budget = budget or PromptBudget("ollama")
+
+    def render(steps_text: str) -> str:
+        return f"""당신은 CueNote 노트 앱의 AI 어시스턴트입니다.
 사용자의 요청에 대해 도구를 실행한 결과입니다. 이 결과를 바탕으로 친절하고 자연스러운 응답을 생성하세요.
 
 사용자 요청: {user_message}
@@ -1056,23 +1032,74 @@ def build_multistep_result_prompt(
 
 응답:"""
 
+    steps = [
+        f"\n### 단계 {i}: {th['name']}\n인자: {json.dumps(th['args'], ensure_ascii=False)}\n결과:\n"
+        for i, th in enumerate(tool_history, 1)
+    ]
+    budget.spend(render("".join(steps)))
+    steps_text = ""
+    for i, (step, th) in enumerate(zip(steps, tool_history)):
+        result_str, truncated = budget.fit(
+            json.dumps(th["result"], ensure_ascii=False, indent=2), share=1 / (len(steps) - i)
+        )
+        if truncated:
+            result_str += "\n... (truncated)"
+        steps_text += f"{step}{result_str}\n"
+    return render(steps_text)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # LLM 호출
 # ─────────────────────────────────────────────────────────────────────────────
 
-def call_llm_text(prompt: str, provider: str, api_key: str, model: str) -> str:
-    """LLM으로 텍스트 생성 (동기)"""
+async def call_llm_text(
+    prompt: str, provider: str, api_key: str, model: str, use_cache: bool = True
+) -> str:
+    """LLM으로 텍스트 생성 (공용 비동기 전송 계층 + 응답 캐시 사용)"""
     model_or_none = model if model else None
-    
-    if provider == "gemini" and api_key:
-        return gemini_client.generate(prompt, api_key, model_or_none)
-    elif provider == "openai" and api_key:
-        return openai_client.generate(prompt, api_key, model_or_none)
-    elif provider == "anthropic" and api_key:
-        return anthropic_client.generate(prompt, api_key, model_or_none)
+    if not (provider in ("gemini", "openai", "anthropic") and api_key):
+        provider = "ollama"
+    cache_key = llm_cache.make_key(provider, model_or_none, prompt)
+    if use_cache:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    if provider == "gemini":
+        text = await gemini_client.generate(prompt, api_key, model_or_none)
+    elif provider == "openai":
+        text = await openai_client.generate(prompt, api_key, model_or_none)
+    elif provider == "anthropic":
+        text = await anthropic_client.generate(prompt, api_key, model_or_none)
     else:
-        return ollama_client.generate(prompt, model=model_or_none)
+        text = await ollama_client.generate(prompt, model=model_or_none)
+    
+    if text:
+        await llm_cache.put(cache_key, text, provider, model_or_none)
+    return text
+
+
+async def stream_llm_text(
+    prompt: str, provider: str, api_key: str, model: str, use_cache: bool = True
+) -> AsyncIterator[str]:
+    """LLM 텍스트를 스트리밍으로 생성 (call_llm_text와 같은 응답 캐시 사용, 끝까지 받은 응답만 저장)"""
+    model_or_none = model if model else None
+    cache_provider = provider if provider in ("gemini", "openai", "anthropic") and api_key else "ollama"
+    cache_key = llm_cache.make_key(cache_provider, model_or_none, prompt)
+    if use_cache:
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts: list[str] = []
+    async for chunk in get_stream_func(prompt, provider, api_key, model):
+        parts.append(chunk)
+        yield chunk
+
+    text = "".join(parts)
+    if text:
+        await llm_cache.put(cache_key, text, cache_provider, model_or_none)
 
 
 def get_stream_func(prompt: str, provider: str, api_key: str, model: str):
@@ -1159,6 +1186,88 @@ def parse_tool_call(text: str) -> Optional[dict]:
     return None
 
 
+# tool_call JSON 응답의 시작 (공백/작은따옴표 차이는 무시하고 비교)
+TOOL_CALL_HEAD = '{"tool_call"'
+
+_FENCE_OPEN = re.compile(r"```[A-Za-z]*")
+
+
+def _tool_call_verdict(text: str) -> Optional[bool]:
+    """
+    '{' 또는 '`'로 시작하는 텍스트가 tool_call JSON의 시작인지
+    Returns: True(tool_call) / False(아님) / None(아직 판단할 수 없음)
+    """
+    fence = _FENCE_OPEN.match(text)
+    if text.startswith("`"):
+        if not fence:
+            # ``` 가 덜 들어왔거나 인라인 코드
+            return None if text == "`" * len(text) and len(text) < 3 else False
+        if fence.end() == len(text):
+            return None
+        text = text[fence.end():]
+        if not text.strip():
+            return None
+    compact = re.sub(r"\s+", "", text[:len(TOOL_CALL_HEAD) * 4]).replace("'", '"')
+    if compact.startswith(TOOL_CALL_HEAD):
+        return True
+    if TOOL_CALL_HEAD.startswith(compact):
+        return None
+    return False
+
+
+class ToolCallDetector:
+    """
+    첫 응답 스트림을 조각 단위로 훑어, tool_call JSON이 시작되면 그 뒤는 모으고
+    그 외 텍스트는 바로 내보냄 (판단이 필요한 '{' / '```' 부분만 잠시 보류)
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.tool_start: Optional[int] = None
+        self._sent = 0
+
+    def feed(self, chunk: str) -> str:
+        """응답 조각 추가 → 지금 사용자에게 보내도 되는 텍스트"""
+        self.text += chunk
+        start = self._sent
+        while self.tool_start is None:
+            pending = self.text[self._sent:]
+            marks = [pos for pos in (pending.find("{"), pending.find("`")) if pos != -1]
+            if not marks:
+                self._sent = len(self.text)
+                break
+            self._sent += min(marks)
+            verdict = _tool_call_verdict(self.text[self._sent:])
+            if verdict is None:
+                break
+            if verdict:
+                self.tool_start = self._sent
+                break
+            self._sent += 1
+        return self.text[start:self._sent]
+
+    def tool_call(self) -> Optional[dict]:
+        """응답이 끝난 뒤: 모은 tool_call JSON 파싱 (실패하면 None)"""
+        if self.tool_start is None:
+            return None
+        candidate = self.text[self.tool_start:]
+        tool_call = parse_tool_call(candidate)
+        if tool_call is None:
+            try:
+                parsed = loads_lenient(candidate)
+            except ValueError:
+                return None
+            if isinstance(parsed, dict) and isinstance(parsed.get("tool_call"), dict):
+                tool_call = parsed["tool_call"]
+        return tool_call
+
+    def finish(self) -> str:
+        """응답이 끝난 뒤: 아직 보내지 않은 나머지 텍스트"""
+        rest = self.text[self._sent:]
+        self._sent = len(self.text)
+        return rest
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # API 엔드포인트
 # ─────────────────────────────────────────────────────────────────────────────
@@ -1190,16 +1299,24 @@ async def chat(payload: ChatPayload):
                 user_message, history, today,
                 active_note_path=payload.active_note_path,
                 active_note_content=payload.active_note_content,
+                budget=PromptBudget(provider, api_key, model),
             )
             
             yield {"event": "thinking", "data": "메시지를 분석하고 있습니다..."}
             
-            # 동기 호출로 도구 판단
-            llm_response = call_llm_text(chat_prompt, provider, api_key, model)
-            logger.info(f"Chatbot LLM response: {llm_response[:200]}")
+            # 도구 판단: 응답을 스트리밍으로 받으며 tool_call JSON이 시작되는지 확인하고,
+            # 일반 대화 응답은 받는 즉시 전달
+            detector = ToolCallDetector()
+            async for chunk in stream_llm_text(
+                chat_prompt, provider, api_key, model, use_cache=not payload.no_cache
+            ):
+                text = detector.feed(chunk)
+                if text:
+                    yield {"event": "message", "data": text.replace('\n', '\\n')}
+            logger.info(f"Chatbot LLM response: {detector.text[:200]}")
             
             # 2단계: tool_call 파싱
-            tool_call_data = parse_tool_call(llm_response)
+            tool_call_data = detector.tool_call()
             
             if tool_call_data:
                 # ─── 멀티스텝 도구 실행 루프 (최대 3단계) ───
@@ -1240,9 +1357,13 @@ async def chat(payload: ChatPayload):
                     # 다음 단계 판단: LLM에게 추가 도구 호출이 필요한지 확인
                     if step < MAX_STEPS - 1:
                         continuation_prompt = build_continuation_prompt(
-                            user_message, tool_history, today
+                            user_message, tool_history, today,
+                            budget=PromptBudget(provider, api_key, model),
+                        )
+                        cont_response = await call_llm_text(
+                            continuation_prompt, provider, api_key, model,
+                            use_cache=not payload.no_cache
                         )
-                        cont_response = call_llm_text(continuation_prompt, provider, api_key, model)
                         logger.info(f"Chatbot continuation [{step+1}]: {cont_response[:150]}")
                         
                         next_tool = parse_tool_call(cont_response)
@@ -1256,7 +1377,8 @@ async def chat(payload: ChatPayload):
                 
                 # 최종 결과 기반 자연어 응답 (스트리밍)
                 result_prompt = build_multistep_result_prompt(
-                    user_message, tool_history, history
+                    user_message, tool_history, history,
+                    budget=PromptBudget(provider, api_key, model),
                 )
                 
                 stream_func = get_stream_func(result_prompt, provider, api_key, model)
@@ -1264,14 +1386,10 @@ async def chat(payload: ChatPayload):
                     escaped_chunk = chunk.replace('\n', '\\n')
                     yield {"event": "message", "data": escaped_chunk}
             else:
-                # 도구 호출 없이 직접 응답 — 이미 생성된 텍스트를 그대로 스트리밍
-                logger.info("Chatbot: no tool call, streaming existing response")
-                
-                chunk_size = 8
-                for i in range(0, len(llm_response), chunk_size):
-                    chunk = llm_response[i:i + chunk_size]
-                    escaped_chunk = chunk.replace('\n', '\\n')
-                    yield {"event": "message", "data": escaped_chunk}
+                # 도구 호출 없이 직접 응답 — 보류했던 나머지 텍스트 전달
+                rest = detector.finish()
+                if rest:
+                    yield {"event": "message", "data": rest.replace('\n', '\\n')}
             
             yield {"event": "done", "data": ""}
             
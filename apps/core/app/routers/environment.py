@@ -9,13 +9,12 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from ..config import PROJECT_ROOT, DATA_DIR, VAULT_PATH, logger
+from ..config import VAULT_PATH, logger
+from .. import vault_context
+from ..vault_context import ENV_CONFIG_PATH
 
 router = APIRouter(prefix="/environment", tags=["environment"])
 
-# 환경 설정 파일 경로 (앱 데이터 폴더에 저장)
-ENV_CONFIG_PATH = DATA_DIR / "environments.json"
-
 
 class Environment(BaseModel):
     """환경 정보"""
@@ -51,25 +50,24 @@ class RemoveEnvironmentPayload(BaseModel):
 
 
 def load_config() -> EnvironmentConfig:
-    """환경 설정 로드"""
-    if not ENV_CONFIG_PATH.exists():
-        return EnvironmentConfig()
-    
+    """환경 설정 로드 (vault_context 캐시 사용)"""
     try:
-        data = json.loads(ENV_CONFIG_PATH.read_text(encoding="utf-8"))
-        return EnvironmentConfig(**data)
+        return EnvironmentConfig(**vault_context.get_env_config_data())
     except Exception as e:
         logger.error("Failed to load environment config: %s", e)
         return EnvironmentConfig()
 
 
 def save_config(config: EnvironmentConfig):
-    """환경 설정 저장"""
+    """환경 설정 저장 (현재 Vault 컨텍스트 캐시 무효화)"""
     ENV_CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
-    ENV_CONFIG_PATH.write_text(
-        json.dumps(config.model_dump(), ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
+    try:
+        ENV_CONFIG_PATH.write_text(
+            json.dumps(config.model_dump(), ensure_ascii=False, indent=2),
+            encoding="utf-8"
+        )
+    finally:
+        vault_context.invalidate()
 
 
 def generate_env_id(name: str) -> str:
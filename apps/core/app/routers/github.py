@@ -182,6 +182,7 @@ class GenerateCommitMsgPayload(BaseModel):
     provider: str = "ollama"
     api_key: str = ""
     model: str = ""
+    no_cache: bool = False  # LLM 응답 캐시 사용 안 함
 
 
 class DeleteFilePayload(BaseModel):
@@ -1423,11 +1424,12 @@ async def generate_commit_message(payload: GenerateCommitMsgPayload):
 
 커밋 메시지:"""
         
-        commit_msg = call_llm_text(
+        commit_msg = await call_llm_text(
             prompt,
             payload.provider,
             payload.api_key,
-            payload.model
+            payload.model,
+            use_cache=not payload.no_cache
         )
         
         # 불필요한 마크다운 코드블록 제거
@@ -2,10 +2,17 @@
 CueNote Core - Graph API 라우터 (간소화)
 AI 기반 노트 클러스터링 및 관련 노트 탐색
 """
+import asyncio
+import hashlib
+import json
 import time
 from pathlib import Path
+from typing import AsyncIterator
 
-from fastapi import APIRouter, HTTPException, Query
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sse_starlette.sse import EventSourceResponse
 
 from ..config import logger
 from ..schemas import (
@@ -14,169 +21,364 @@ from ..schemas import (
 )
 
 # 분리된 모듈에서 import
-from .graph_cache import GraphCache, CLUSTER_COLORS
+from .graph_cache import get_graph_cache, GraphCache, CLUSTER_COLORS
 from .graph_utils import (
     get_current_vault_path,
     get_all_notes,
-    get_embeddings_batch_optimized,
-    compute_similarity_matrix,
-    perform_clustering,
-    generate_cluster_labels_optimized,
-    get_note_preview,
-    search_notes_in_graph
+    normalize_embeddings,
+    build_similarity_edges,
+    update_clusters,
+    store_cluster_labels,
+    stream_cluster_labels,
+    default_cluster_label,
+    StoredClusters,
 )
+from .graph_embeddings import DEFAULT_EMBEDDING_BACKEND, embedding_namespace, get_note_embeddings
+from .graph_ann import get_ann_index
+from .. import note_index
+from ..db import run_db
 
 router = APIRouter(prefix="/graph", tags=["graph"])
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# API 엔드포인트 (5개)
+# 그래프 생성 파이프라인 (단계별 결과를 순서대로 전달)
 # ─────────────────────────────────────────────────────────────────────────────
 
-@router.post("/data", response_model=GraphDataResponse)
-async def get_graph_data(payload: GraphDataPayload):
+UNCLUSTERED_COLOR = "#888888"
+
+
+def _snapshot_key(vault_path: Path, payload: GraphDataPayload) -> str:
+    """그래프 스냅샷 키 / ETag (Vault 리비전 + 결과에 영향을 주는 요청 옵션)"""
+    raw = json.dumps([
+        str(vault_path),
+        note_index.get_revision(vault_path),
+        payload.maxClusters,
+        payload.minSimilarity,
+        payload.topK,
+        payload.provider,
+        payload.model,
+        payload.embeddingBackend,
+        payload.embeddingModel,
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _snapshot_stages(snapshot: dict) -> list[tuple[str, dict]]:
+    """저장된 그래프 응답을 스트리밍 단계 형태로 변환"""
+    response = GraphDataResponse.model_validate(snapshot)
+    return [
+        ("nodes", {"nodes": response.nodes, "totalNotes": response.totalNotes}),
+        ("edges", {"edges": response.edges}),
+        ("clusters", {
+            "assignments": {node.id: node.cluster for node in response.nodes},
+            "clusters": response.clusters,
+        }),
+        *[
+            ("label", {"id": c.id, "label": c.label, "keywords": c.keywords, "status": "cached"})
+            for c in response.clusters
+        ],
+    ]
+
+
+def _build_response(
+    notes: list[dict],
+    cluster_labels: list[int],
+    label_map: dict[int, tuple[str, list[str]]],
+    sources, targets, weights
+) -> dict:
+    """완성된 그래프 응답 (스냅샷 저장용 JSON)"""
+    counts: dict[int, int] = {}
+    for cluster_id in cluster_labels:
+        counts[cluster_id] = counts.get(cluster_id, 0) + 1
+    response = GraphDataResponse(
+        nodes=[
+            GraphNode(
+                id=note["path"],
+                label=note["title"],
+                cluster=cluster_labels[i],
+                clusterLabel=label_map[cluster_labels[i]][0],
+                size=max(1, note["wordCount"] // 100),
+                color=CLUSTER_COLORS[cluster_labels[i] % len(CLUSTER_COLORS)],
+                preview=note["preview"]
+            )
+            for i, note in enumerate(notes)
+        ],
+        edges=[
+            GraphEdge(source=notes[i]["path"], target=notes[j]["path"], weight=float(w), type="similarity")
+            for i, j, w in zip(sources.tolist(), targets.tolist(), weights.tolist())
+        ],
+        clusters=[
+            ClusterInfo(
+                id=cluster_id,
+                label=label_map[cluster_id][0],
+                color=CLUSTER_COLORS[cluster_id % len(CLUSTER_COLORS)],
+                noteCount=count,
+                keywords=label_map[cluster_id][1] or []
+            )
+            for cluster_id, count in counts.items()
+        ],
+        totalNotes=len(notes)
+    )
+    return response.model_dump()
+
+
+def _index_embeddings(
+    cache: GraphCache, namespace: str, source: str, notes: list[dict], embeddings: np.ndarray
+) -> np.ndarray:
+    """임베딩 정규화 + 관련 노트용 ANN 인덱스 갱신 (스레드 풀에서 실행)"""
+    matrix = normalize_embeddings(embeddings)
+    get_ann_index(cache, namespace).sync(source, notes, matrix)
+    return matrix
+
+
+async def _graph_stages(payload: GraphDataPayload) -> AsyncIterator[tuple[str, dict]]:
     """
-    그래프 뷰 데이터 생성
-    - 캐싱을 통한 증분 업데이트
-    - 변경된 노트만 재계산
-    - 클러스터 라벨 캐싱
+    그래프 데이터를 단계별로 생성
+    - nodes: 노트 인덱스만으로 만든 노드 (클러스터 미정)
+    - edges: 임베딩 후 유사도 엣지
+    - clusters: 클러스터 배정과 클러스터 정보 (라벨은 캐시 또는 기본값)
+    - label: AI 클러스터 라벨 (준비되는 순서대로, 클러스터마다 하나)
+    - done: 처리 통계
+    Vault 리비전과 옵션이 같은 완성된 결과가 있으면 재계산 없이 그대로 전달합니다.
+    행렬 계산, 엣지 생성, 클러스터링은 스레드 풀에서 실행해 이벤트 루프를 막지 않습니다.
     """
-    try:
-        start_time = time.time()
+    start_time = time.time()
+    loop = asyncio.get_running_loop()
 
-        # 1. 모든 노트 읽기
-        vault_path = get_current_vault_path()
-        notes = get_all_notes()
-
-        if not notes:
-            return GraphDataResponse(
-                nodes=[],
-                edges=[],
-                clusters=[],
-                totalNotes=0
+    vault_path = get_current_vault_path()
+    cache = get_graph_cache(vault_path)
+    snapshot_key = await run_db(_snapshot_key, vault_path, payload)
+    snapshot = cache.get_snapshot(snapshot_key)
+    if snapshot is not None:
+        for stage in _snapshot_stages(snapshot):
+            yield stage
+        yield "done", {"elapsed": round(time.time() - start_time, 3), "snapshot": True}
+        return
+
+    # 1. 모든 노트 읽기 (노트 인덱스)
+    notes = await run_db(get_all_notes)
+
+    yield "nodes", {
+        "nodes": [
+            GraphNode(
+                id=note["path"],
+                label=note["title"],
+                size=max(1, note["wordCount"] // 100),
+                color=UNCLUSTERED_COLOR,
+                preview=note["preview"]
             )
+            for note in notes
+        ],
+        "totalNotes": len(notes),
+    }
+    if not notes:
+        yield "done", {"elapsed": round(time.time() - start_time, 3)}
+        return
 
-        logger.info(f"Processing {len(notes)} notes for graph view")
+    logger.info(f"Processing {len(notes)} notes for graph view")
 
-        # 2. 캐시 초기화
-        cache = GraphCache(vault_path)
-    
-        # 오래된 캐시 정리
-        current_paths = {n["path"] for n in notes}
-        cache.cleanup_old_entries(current_paths)
-    
-        # 3. 임베딩 생성 (캐시 활용)
-        embeddings, emb_cached, emb_computed = get_embeddings_batch_optimized(notes, cache)
-    
-        # 4. 클러스터링
+    # 2. 오래된 캐시 정리
+    try:
+        await loop.run_in_executor(None, cache.cleanup_old_entries, {n["path"] for n in notes})
+
+        # 3. 임베딩 생성 (캐시 활용) + 관련 노트용 ANN 인덱스 갱신
+        namespace = embedding_namespace(payload.embeddingBackend, payload.embeddingModel)
+        embeddings, emb_cached, emb_computed, source = await get_note_embeddings(
+            notes, cache, payload.embeddingBackend, payload.embeddingModel
+        )
+        matrix = await loop.run_in_executor(
+            None, _index_embeddings, cache, namespace, source, notes, embeddings
+        )
+
+        # 4. 엣지 생성 (노드별 상위 k개 유사 이웃, 블록 단위 계산)
+        sources, targets, weights = await loop.run_in_executor(
+            None, build_similarity_edges, matrix, payload.minSimilarity, payload.topK
+        )
+        yield "edges", {
+            "edges": [
+                GraphEdge(
+                    source=notes[i]["path"],
+                    target=notes[j]["path"],
+                    weight=float(w),
+                    type="similarity"
+                )
+                for i, j, w in zip(sources.tolist(), targets.tolist(), weights.tolist())
+            ]
+        }
+
+        # 5. 클러스터링 (저장된 중심점 기준 증분 배정, 드리프트 시에만 전체 재계산)
         num_clusters = min(payload.maxClusters, max(2, len(notes) // 3))
-        cluster_labels = perform_clustering(embeddings, num_clusters)
-    
-        # 5. 유사도 행렬 계산
-        similarity_matrix = compute_similarity_matrix(embeddings)
-    
-        # 6. 클러스터별 컨텐츠 수집 (라벨 생성용)
+        cluster_labels, reclustered = await loop.run_in_executor(
+            None, update_clusters, cache, namespace, source, notes, matrix, num_clusters
+        )
+
         cluster_contents: dict[int, list[str]] = {}
         for i, label in enumerate(cluster_labels):
             if label not in cluster_contents:
                 cluster_contents[label] = []
             cluster_contents[label].append(notes[i]["content"])
-    
-        # 7. AI로 클러스터 라벨 생성 (캐싱 포함)
+
+        yield "clusters", {
+            "assignments": {note["path"]: cluster_labels[i] for i, note in enumerate(notes)},
+            "clusters": [
+                ClusterInfo(
+                    id=cluster_id,
+                    label=default_cluster_label(cluster_id),
+                    color=CLUSTER_COLORS[cluster_id % len(CLUSTER_COLORS)],
+                    noteCount=len(contents),
+                    keywords=[]
+                )
+                for cluster_id, contents in cluster_contents.items()
+            ],
+        }
+
+        # 6. AI로 클러스터 라벨 생성 (캐시된 라벨 먼저, 이후 도착 순서대로)
+        cluster_label_map: dict[int, tuple[str, list[str]]] = {}
+        label_cached = label_generated = label_fallback = 0
         try:
-            cluster_label_map, label_cached, label_generated = await generate_cluster_labels_optimized(
+            async for cluster_id, label, keywords, status in stream_cluster_labels(
                 cluster_contents,
                 payload.provider,
                 payload.api_key,
                 payload.model,
-                cache
-            )
+                cache,
+                payload.labelConcurrency
+            ):
+                cluster_label_map[cluster_id] = (label, keywords)
+                if status == "cached":
+                    label_cached += 1
+                else:
+                    label_generated += 1
+                    label_fallback += status == "fallback"
+                yield "label", {"id": cluster_id, "label": label, "keywords": keywords, "status": status}
         except Exception as e:
             logger.warning(f"Failed to generate AI labels, using defaults: {e}")
-            cluster_label_map = {
-                cluster_id: (f"주제 {cluster_id + 1}", [])
-                for cluster_id in cluster_contents.keys()
-            }
-            label_cached, label_generated = 0, 0
-    
-        # 8. 캐시 저장
-        cache.save()
-    
-        # 9. 노드 생성
-        nodes = []
-        for i, note in enumerate(notes):
-            cluster_id = cluster_labels[i]
-            label, _ = cluster_label_map.get(cluster_id, (f"주제 {cluster_id + 1}", []))
-            color = CLUSTER_COLORS[cluster_id % len(CLUSTER_COLORS)]
-        
-            nodes.append(GraphNode(
-                id=note["path"],
-                label=note["title"],
-                cluster=cluster_id,
-                clusterLabel=label,
-                size=max(1, note["wordCount"] // 100),
-                color=color,
-                preview=get_note_preview(note["content"])
-            ))
-    
-        # 10. 엣지 생성 (유사도 기반)
-        edges = []
-        for i in range(len(notes)):
-            for j in range(i + 1, len(notes)):
-                similarity = similarity_matrix[i][j]
-                if similarity >= payload.minSimilarity:
-                    edges.append(GraphEdge(
-                        source=notes[i]["path"],
-                        target=notes[j]["path"],
-                        weight=similarity,
-                        type="similarity"
-                    ))
-    
-        # 11. 클러스터 정보 생성
-        clusters = []
-        for cluster_id, contents in cluster_contents.items():
-            label, keywords = cluster_label_map.get(cluster_id, (f"주제 {cluster_id + 1}", []))
-            color = CLUSTER_COLORS[cluster_id % len(CLUSTER_COLORS)]
-        
-            clusters.append(ClusterInfo(
-                id=cluster_id,
-                label=label,
-                color=color,
-                noteCount=len(contents),
-                keywords=keywords or []
-            ))
-    
+            label_fallback += len(cluster_contents) - len(cluster_label_map)
+
+        final_labels = {
+            cluster_id: cluster_label_map.get(cluster_id, (default_cluster_label(cluster_id), []))
+            for cluster_id in cluster_contents
+        }
+        store_cluster_labels(cache, namespace, final_labels)
+
+        # 7. 스냅샷 저장 (기본 라벨로 대체된 클러스터가 있으면 다음 요청에서 다시 시도하도록 저장하지 않음)
+        if not label_fallback:
+            snapshot = await loop.run_in_executor(
+                None, _build_response, notes, cluster_labels, final_labels, sources, targets, weights
+            )
+            cache.set_snapshot(snapshot_key, snapshot)
+
         elapsed = time.time() - start_time
         logger.info(
             f"Graph generated in {elapsed:.2f}s: "
-            f"{len(nodes)} nodes, {len(edges)} edges, {len(clusters)} clusters | "
+            f"{len(notes)} nodes, {len(sources)} edges, {len(cluster_contents)} clusters | "
             f"Embeddings: {emb_cached} cached, {emb_computed} computed | "
+            f"Clusters: {'reclustered' if reclustered else 'incremental'} | "
             f"Labels: {label_cached} cached, {label_generated} generated"
         )
+        yield "done", {
+            "elapsed": round(elapsed, 3),
+            "embeddings": {"cached": emb_cached, "computed": emb_computed},
+            "labels": {"cached": label_cached, "generated": label_generated},
+            "reclustered": reclustered,
+        }
+    finally:
+        # 중간에 연결이 끊겨도 계산된 임베딩/라벨은 저장
+        cache.save()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# API 엔드포인트
+# ─────────────────────────────────────────────────────────────────────────────
+
+@router.post("/data", response_model=GraphDataResponse)
+async def get_graph_data(payload: GraphDataPayload, request: Request, response: Response):
+    """
+    그래프 뷰 데이터 생성
+    - 캐싱을 통한 증분 업데이트
+    - 변경된 노트만 재계산
+    - 클러스터 라벨 캐싱
+    - Vault가 바뀌지 않았으면 저장된 스냅샷 반환 (ETag 일치 시 304)
+    - ETag는 스냅샷이 저장된 응답에만 붙임 (기본 라벨로 대체된 응답은 다음 요청에서 다시 계산)
+    """
+    try:
+        vault_path = get_current_vault_path()
+        cache = get_graph_cache(vault_path)
+        snapshot_key = await run_db(_snapshot_key, vault_path, payload)
+        etag = f'"{snapshot_key}"'
+        if cache.get_snapshot(snapshot_key) is not None:
+            if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+                return Response(status_code=304, headers={"ETag": etag})
+
+        nodes: list[GraphNode] = []
+        edges: list[GraphEdge] = []
+        clusters: dict[int, ClusterInfo] = {}
+        assignments: dict[str, int] = {}
+
+        async for stage, data in _graph_stages(payload):
+            if stage == "nodes":
+                nodes = data["nodes"]
+            elif stage == "edges":
+                edges = data["edges"]
+            elif stage == "clusters":
+                assignments = data["assignments"]
+                clusters = {cluster.id: cluster for cluster in data["clusters"]}
+            elif stage == "label" and data["id"] in clusters:
+                clusters[data["id"]].label = data["label"]
+                clusters[data["id"]].keywords = data["keywords"] or []
+
+        for node in nodes:
+            cluster = clusters.get(assignments.get(node.id, -1))
+            if cluster is not None:
+                node.cluster = cluster.id
+                node.clusterLabel = cluster.label
+                node.color = cluster.color
+
+        if cache.get_snapshot(snapshot_key) is not None:
+            response.headers["ETag"] = etag
 
         return GraphDataResponse(
             nodes=nodes,
             edges=edges,
-            clusters=clusters,
-            totalNotes=len(notes)
+            clusters=list(clusters.values()),
+            totalNotes=len(nodes)
         )
     except Exception as e:
         logger.error(f"Failed to generate graph data: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"그래프 데이터 생성 중 오류 발생: {str(e)}")
 
 
+@router.post("/data/stream")
+async def stream_graph_data(payload: GraphDataPayload):
+    """
+    그래프 뷰 데이터 스트리밍 (SSE)
+    단계가 끝날 때마다 이벤트를 보내 노드를 먼저 그리고 엣지/클러스터/라벨을 차례로 반영할 수 있습니다.
+    이벤트: nodes → edges → clusters → label(클러스터마다) → done (실패 시 error)
+    """
+    async def event_generator():
+        try:
+            async for stage, data in _graph_stages(payload):
+                yield {"event": stage, "data": json.dumps(jsonable_encoder(data), ensure_ascii=False)}
+        except Exception as e:
+            logger.error(f"Graph streaming error: {e}", exc_info=True)
+            yield {"event": "error", "data": str(e)}
+
+    return EventSourceResponse(event_generator())
+
+
 @router.get("/stats")
 async def get_graph_stats():
     """그래프 통계 조회"""
-    notes = get_all_notes()
+    notes = await run_db(get_all_notes)
     
     total_words = sum(n["wordCount"] for n in notes)
     avg_words = total_words // len(notes) if notes else 0
     
     # 캐시 상태도 반환
     vault_path = get_current_vault_path()
-    cache = GraphCache(vault_path)
-    cached_embeddings = len(cache.cache_data.get("embeddings", {}))
+    cache = get_graph_cache(vault_path)
+    cached_embeddings = cache.embedding_count()
     cached_labels = len(cache.cache_data.get("cluster_labels", {}))
     
     return {
@@ -195,13 +397,10 @@ async def get_graph_stats():
 async def clear_cache():
     """캐시 초기화"""
     vault_path = get_current_vault_path()
-    cache = GraphCache(vault_path)
+    cache = get_graph_cache(vault_path)
     
     try:
-        if cache.cache_file.exists():
-            cache.cache_file.unlink()
-        
-        cache.cache_data = {}
+        cache.clear()
         logger.info("Graph cache cleared")
         
         return {"status": "ok", "message": "캐시가 초기화되었습니다"}
@@ -211,86 +410,71 @@ async def clear_cache():
 
 
 @router.get("/related/{note_path:path}")
-async def get_related_notes(note_path: str, top_n: int = Query(default=8, ge=1, le=20)):
+async def get_related_notes(
+    note_path: str,
+    top_n: int = Query(default=8, ge=1, le=20),
+    embedding_backend: str = Query(default=DEFAULT_EMBEDDING_BACKEND),
+    embedding_model: str = Query(default="")
+):
     """
     특정 노트와 관련된 노트 추천 (유사도 기반 Top N)
+    - ANN 인덱스에서 후보 목록만 탐색 (전체 임베딩/클러스터링 재계산 없음)
+    - 대상 노트가 바뀌었거나 색인 전이면 임베딩을 갱신한 뒤 탐색
+    - 클러스터 라벨은 /graph/data에서 저장한 배정을 사용
     """
     try:
         vault_path = get_current_vault_path()
-        notes = get_all_notes()
-        
-        if not notes:
-            return {"relatedNotes": [], "notePath": note_path}
         
-        # 대상 노트 인덱스 찾기
-        target_idx = None
+        # 대상 노트 찾기
         normalized_path = note_path.replace("\\", "/")
         if not normalized_path.endswith(".md"):
             normalized_path += ".md"
-        
-        for i, note in enumerate(notes):
-            if note["path"] == normalized_path or note["path"] == note_path:
-                target_idx = i
-                break
-        
-        if target_idx is None:
+        found = await run_db(note_index.get_notes, vault_path, [normalized_path, note_path])
+        target = found.get(normalized_path) or found.get(note_path)
+        if target is None:
             return {"relatedNotes": [], "notePath": note_path}
         
-        # 캐시 활용 임베딩
-        cache = GraphCache(vault_path)
-        embeddings, _, _ = get_embeddings_batch_optimized(notes, cache)
-        cache.save()
-        
-        # 유사도 계산
-        similarity_matrix = compute_similarity_matrix(embeddings)
-        
-        # 자기 자신 제외하고 유사도 순 정렬
-        similarities = []
-        for i, note in enumerate(notes):
-            if i == target_idx:
-                continue
-            sim = similarity_matrix[target_idx][i]
-            if sim > 0.05:  # 최소 유사도 임계값
-                similarities.append((i, sim))
-        
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        cache = get_graph_cache(vault_path)
+        namespace = embedding_namespace(embedding_backend, embedding_model)
+        index = get_ann_index(cache, namespace)
+        clusters = StoredClusters(cache, namespace)
         
-        # 클러스터 정보가 필요하므로 클러스터링 수행
-        num_clusters = min(8, max(2, len(notes) // 3))
-        cluster_labels = perform_clustering(embeddings, num_clusters)
-        
-        # 클러스터 라벨 생성은 캐시에서 가져오기 시도
-        cluster_contents: dict[int, list[str]] = {}
-        for i, label in enumerate(cluster_labels):
-            if label not in cluster_contents:
-                cluster_contents[label] = []
-            cluster_contents[label].append(notes[i]["content"])
+        # 색인되지 않은(또는 바뀐) 노트면 임베딩 갱신 (변경된 노트만 다시 계산됨)
+        if not index.is_current(target["path"], target["hash"]):
+            notes = await run_db(get_all_notes)
+            embeddings, _, _, source = await get_note_embeddings(
+                notes, cache, embedding_backend, embedding_model
+            )
+            index.sync(source, notes, embeddings)
+            update_clusters(cache, namespace, source, notes, embeddings)
+            clusters = StoredClusters(cache, namespace)
+            cache.save()
         
-        # 기본 라벨 (AI 호출 없이 빠르게 응답)
-        cluster_label_map = {}
-        for cluster_id, contents in cluster_contents.items():
-            cluster_hash = cache.get_cluster_content_hash(contents)
-            cached = cache.get_cached_cluster_label(cluster_hash)
-            if cached:
-                cluster_label_map[cluster_id] = cached
-            else:
-                cluster_label_map[cluster_id] = (f"주제 {cluster_id + 1}", [])
+        # 삭제된 노트가 섞여 있을 수 있으므로 여유 있게 탐색
+        neighbours = [
+            (path, sim) for path, sim in index.search(target["path"], top_n * 2)
+            if sim > 0.05  # 최소 유사도 임계값
+        ]
+        infos = await run_db(note_index.get_notes, vault_path, [path for path, _ in neighbours])
         
         # Top N 관련 노트 반환
         related = []
-        for idx, sim in similarities[:top_n]:
-            note = notes[idx]
-            cluster_id = cluster_labels[idx]
-            cluster_label, _ = cluster_label_map.get(cluster_id, (f"주제 {cluster_id + 1}", []))
+        for path, sim in neighbours:
+            note = infos.get(path)
+            if note is None:
+                continue
+            cluster_id, cluster_label = clusters.lookup(path, index.vector(path))
             
             related.append(RelatedNoteItem(
                 path=note["path"],
                 title=note["title"],
                 similarity=round(sim, 3),
                 clusterLabel=cluster_label,
-                color=CLUSTER_COLORS[cluster_id % len(CLUSTER_COLORS)],
-                preview=get_note_preview(note["content"])
+                color=CLUSTER_COLORS[cluster_id % len(CLUSTER_COLORS)] if cluster_id >= 0 else "#888888",
+                preview=note["preview"]
             ))
+            if len(related) >= top_n:
+                break
         
         return {"relatedNotes": related, "notePath": note_path}
         
@@ -302,26 +486,27 @@ async def get_related_notes(note_path: str, top_n: int = Query(default=8, ge=1,
 @router.get("/search")
 async def search_graph_notes(q: str = Query(default="", min_length=0)):
     """
-    그래프 내 노트 검색 (제목/내용/경로 매칭)
+    그래프 내 노트 검색 (FTS5 전문 검색, BM25 순위)
     매칭된 노트 ID 목록을 반환하여 프론트엔드에서 하이라이트
     """
     try:
         if not q.strip():
             return {"matches": [], "query": q}
         
-        notes = get_all_notes()
-        results = search_notes_in_graph(notes, q)
+        results, total = await run_db(note_index.search_notes, get_current_vault_path(), q, limit=20)
         
         matches = [
             {
                 "path": note["path"],
                 "title": note["title"],
-                "preview": get_note_preview(note["content"])
+                "preview": note["preview"],
+                "snippet": note["snippet"],
+                "score": note["score"]
             }
-            for note in results[:20]  # 최대 20개
+            for note in results
         ]
         
-        return {"matches": matches, "query": q, "totalMatches": len(results)}
+        return {"matches": matches, "query": q, "totalMatches": total}
         
     except Exception as e:
         logger.error(f"Failed to search notes: {e}", exc_info=True)
@@ -0,0 +1,268 @@
+"""
+CueNote Core - Graph 근사 최근접 이웃(ANN) 인덱스
+정규화된 노트 임베딩에 대한 IVF(Inverted File) 인덱스 (순수 NumPy)
+
+벡터를 구형 K-Means 중심점(√n개)으로 나눈 역색인 목록에 넣어 두고, 질의 시에는
+가장 가까운 nprobe개 목록의 벡터와만 내적을 계산합니다.
+벡터는 GraphCache의 "ann:<임베딩 네임스페이스>" 저장소에, 중심점은 보조 행렬로 저장되어
+재시작 후에도 다시 임베딩하지 않고, 바뀐 노트의 행만 증분으로 갱신됩니다.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+from ..config import logger
+from .graph_cache import GraphCache
+
+# 이보다 노트가 적으면 목록 없이 전체 내적 (정확 검색이 더 빠름)
+IVF_MIN_SIZE = 512
+
+# 질의 시 탐색할 목록 수
+IVF_NPROBE = 8
+
+# 목록 수 상한 / 중심점 학습 설정
+IVF_MAX_LISTS = 256
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLES_PER_LIST = 64
+
+# 학습 시점 대비 노트 수가 이 배수만큼 늘거나 줄면 중심점 재학습
+IVF_RETRAIN_GROWTH = 2.0
+
+
+class IVFIndex:
+    """임베딩 네임스페이스 하나에 대한 IVF 인덱스 (메모리 + GraphCache 영속화)"""
+
+    def __init__(self, cache: GraphCache, namespace: str):
+        self.cache = cache
+        self.namespace = namespace
+        self.store_namespace = f"ann:{namespace}"
+        self.source = ""
+        self.trained_size = 0
+        self.paths: list[str] = []
+        self.hashes: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists: list[set[int]] = []
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 로드 / 저장
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _load(self) -> None:
+        meta = self.cache.get_metadata(self.store_namespace) or {}
+        paths, hashes, matrix = self.cache.get_embedding_rows(self.store_namespace)
+        if not meta.get("source") or not paths:
+            return
+        self.source = meta["source"]
+        self.trained_size = int(meta.get("trained_size", 0))
+        self.paths = paths
+        self.hashes = hashes
+        self.rows = {path: i for i, path in enumerate(paths)}
+        self.vectors = matrix
+
+        centroids = self.cache.load_array(self.store_namespace) if len(paths) >= IVF_MIN_SIZE else None
+        if centroids is not None and centroids.ndim == 2 and centroids.shape[1] == matrix.shape[1]:
+            self._set_centroids(centroids)
+        logger.info(f"ANN index loaded ({self.namespace}): {len(paths)} vectors")
+
+    def _save_meta(self) -> None:
+        self.cache.set_metadata(self.store_namespace, {
+            "source": self.source,
+            "trained_size": self.trained_size,
+        })
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 갱신
+    # ─────────────────────────────────────────────────────────────────────
+
+    def is_current(self, path: str, content_hash: str) -> bool:
+        """경로의 벡터가 현재 내용으로 색인되어 있는지"""
+        row = self.rows.get(path)
+        return row is not None and self.hashes[row] == content_hash
+
+    def sync(self, source: str, notes: list[dict], matrix: np.ndarray) -> None:
+        """
+        전체 노트 임베딩(정규화 행렬)과 인덱스를 맞춤
+        source(임베딩 백엔드/어휘)가 같으면 내용이 바뀐 노트의 행만 갱신합니다.
+        TF-IDF의 IDF 변동처럼 내용이 같은 노트의 작은 벡터 변화는 다음 재구축까지 무시합니다.
+        """
+        if source != self.source or (len(self) and self.vectors.shape[1] != matrix.shape[1]):
+            self._reset(source, matrix.shape[1])
+
+        current = {note["path"] for note in notes}
+        for path in [p for p in self.paths if p not in current]:
+            self._remove(path)
+
+        added: list[int] = []
+        changed = 0
+        for i, note in enumerate(notes):
+            if note["path"] not in self.rows:
+                added.append(i)
+            elif not self.is_current(note["path"], note["hash"]):
+                self._update(note["path"], note["hash"], matrix[i])
+                changed += 1
+        if added:
+            self._append([notes[i] for i in added], matrix[added])
+            changed += len(added)
+
+        if self._needs_training():
+            self._train()
+        self._save_meta()
+        if changed:
+            logger.info(f"ANN index synced ({self.namespace}): {changed} updated, {len(self)} total")
+
+    def _reset(self, source: str, dim: int) -> None:
+        for path in self.paths:
+            self.cache.remove_embedding(path, self.store_namespace)
+        self.source = source
+        self.trained_size = 0
+        self.paths, self.hashes, self.rows = [], [], {}
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists = []
+
+    def _update(self, path: str, content_hash: str, vector: np.ndarray) -> None:
+        row = self.rows[path]
+        self.hashes[row] = content_hash
+        self.vectors[row] = vector
+        self._assign(row)
+        self.cache.set_embedding(path, content_hash, self.vectors[row], self.store_namespace)
+
+    def _append(self, notes: list[dict], matrix: np.ndarray) -> None:
+        """새 노트를 한 번에 추가 (행렬 복사는 한 번만)"""
+        start = len(self.paths)
+        matrix = np.asarray(matrix, dtype=np.float32)
+        self.vectors = np.vstack([self.vectors, matrix]) if start else matrix.copy()
+        self.assignments = np.concatenate([self.assignments, np.full(len(notes), -1, dtype=np.int32)])
+        for offset, note in enumerate(notes):
+            row = start + offset
+            self.paths.append(note["path"])
+            self.hashes.append(note["hash"])
+            self.rows[note["path"]] = row
+            self._assign(row)
+            self.cache.set_embedding(note["path"], note["hash"], matrix[offset], self.store_namespace)
+
+    def _remove(self, path: str) -> None:
+        """마지막 행을 빈 자리로 옮겨 행렬을 연속으로 유지"""
+        row = self.rows.pop(path)
+        last = len(self.paths) - 1
+        self._unassign(row)
+        if row != last:
+            self._unassign(last)
+            moved = self.paths[last]
+            self.paths[row] = moved
+            self.hashes[row] = self.hashes[last]
+            self.vectors[row] = self.vectors[last]
+            self.rows[moved] = row
+            self._assign(row)
+        self.paths.pop()
+        self.hashes.pop()
+        self.vectors = self.vectors[:last]
+        self.assignments = self.assignments[:last]
+        self.cache.remove_embedding(path, self.store_namespace)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 역색인 목록 (coarse quantizer)
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _assign(self, row: int) -> None:
+        if self.centroids is None:
+            return
+        self._unassign(row)
+        list_id = int(np.argmax(self.centroids @ self.vectors[row]))
+        self.assignments[row] = list_id
+        self.lists[list_id].add(row)
+
+    def _unassign(self, row: int) -> None:
+        if self.centroids is None or self.assignments[row] < 0:
+            return
+        self.lists[self.assignments[row]].discard(row)
+        self.assignments[row] = -1
+
+    def _set_centroids(self, centroids: np.ndarray) -> None:
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = np.argmax(self.vectors @ self.centroids.T, axis=1).astype(np.int32)
+        self.lists = [set() for _ in range(len(centroids))]
+        for row, list_id in enumerate(self.assignments.tolist()):
+            self.lists[list_id].add(row)
+
+    def _needs_training(self) -> bool:
+        n = len(self)
+        if n < IVF_MIN_SIZE:
+            self.centroids = None
+            return False
+        if self.centroids is None or not self.trained_size:
+            return True
+        return n > self.trained_size * IVF_RETRAIN_GROWTH or n * IVF_RETRAIN_GROWTH < self.trained_size
+
+    def _train(self) -> None:
+        """구형 K-Means(내적 기준)로 목록 중심점 학습"""
+        n = len(self)
+        n_lists = max(1, min(IVF_MAX_LISTS, int(math.sqrt(n))))
+        rng = np.random.default_rng(42)
+        sample_size = min(n, n_lists * IVF_TRAIN_SAMPLES_PER_LIST)
+        sample = self.vectors[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+
+        self._set_centroids(centroids)
+        self.trained_size = n
+        self.cache.save_array(self.store_namespace, centroids)
+        logger.info(f"ANN index trained ({self.namespace}): {n_lists} lists over {n} vectors")
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 질의
+    # ─────────────────────────────────────────────────────────────────────
+
+    def vector(self, path: str) -> Optional[np.ndarray]:
+        row = self.rows.get(path)
+        return self.vectors[row] if row is not None else None
+
+    def search(self, path: str, k: int, nprobe: int = IVF_NPROBE) -> list[tuple[str, float]]:
+        """경로의 노트와 가장 유사한 노트 k개 (자기 자신 제외, 유사도 내림차순)"""
+        row = self.rows.get(path)
+        if row is None or k <= 0:
+            return []
+        query = self.vectors[row]
+
+        if self.centroids is None:
+            candidates = np.arange(len(self))
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            candidates = np.fromiter(
+                (r for list_id in probe.tolist() for r in self.lists[list_id]), dtype=np.int64
+            )
+        candidates = candidates[candidates != row]
+        if candidates.size == 0:
+            return []
+
+        sims = self.vectors[candidates] @ query
+        k = min(k, candidates.size)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        return [(self.paths[candidates[i]], float(sims[i])) for i in top.tolist()]
+
+
+def get_ann_index(cache: GraphCache, namespace: str) -> IVFIndex:
+    """캐시의 임베딩 네임스페이스별 공유 ANN 인덱스 (최초 호출 시 디스크에서 로드)"""
+    with cache.lock:
+        index = cache.ann_indexes.get(namespace)
+        if index is None:
+            index = IVFIndex(cache, namespace)
+            cache.ann_indexes[namespace] = index
+        return index
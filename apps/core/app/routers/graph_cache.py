@@ -1,18 +1,43 @@
 """
-CueNote Core - Graph 캐시 시스템 (간소화)
-노트 임베딩 및 클러스터 라벨 캐싱만 관리
+CueNote Core - Graph 캐시 시스템
+노트 임베딩(바이너리 float32 행렬, 메모리 매핑) 및 클러스터 라벨 캐싱 관리
+
+저장 구조 (Vault별 디렉토리):
+    vectors.<세대>.f32  - 헤더 없는 float32 행렬 (행 = 노트 하나의 임베딩)
+    emb-<해시>/         - 기본(TF-IDF) 외 임베딩 백엔드+모델별 행렬 (같은 형식)
+    array-<해시>.npy    - 작은 보조 행렬 (ANN 중심점, 클러스터 중심점 등)
+    snapshot.json       - 마지막으로 완성된 그래프 응답 (Vault 리비전 + 요청 옵션 키)
+    index.json          - 경로 → [행 번호, 콘텐츠 해시], 빈 행 목록, 클러스터 라벨 등 메타데이터
+
+임베딩 갱신은 새 행에 먼저 기록하고(copy-on-write) index.json을 원자적으로 교체한 뒤에야
+이전 행을 재사용하므로, 저장 도중 중단되어도 인덱스가 가리키는 행은 항상 온전합니다.
+행렬 압축/차원 변경 시에는 새 세대 파일을 만들고, 인덱스 교체 후 이전 파일을 삭제합니다.
 """
-import json
 import hashlib
+import json
+import os
+import shutil
+import threading
 import time
-from typing import Optional
 from pathlib import Path
+from typing import Optional
+
+import numpy as np
 
-from ..config import logger, DATA_DIR
+from ..config import DATA_DIR, logger
 
 # 캐시 파일 경로
 CACHE_DIR = DATA_DIR / ".graph_cache"
 
+# 캐시 저장 형식 버전
+CACHE_VERSION = 2
+
+# 빈 행이 이 개수 이상이면서 전체의 절반을 넘으면 행렬 압축
+COMPACT_MIN_FREE_ROWS = 1024
+
+# 메모리에 유지할 그래프 스냅샷 수 (옵션 조합별)
+SNAPSHOT_MEMORY_LIMIT = 4
+
 # 클러스터 색상 팔레트 (최대 12개)
 CLUSTER_COLORS = [
     "#8b5cf6",  # Purple
@@ -30,116 +55,538 @@ CLUSTER_COLORS = [
 ]
 
 
+def _atomic_write_json(path: Path, data: dict) -> None:
+    """임시 파일에 쓴 뒤 os.replace로 교체"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class EmbeddingStore:
+    """
+    경로별 임베딩 벡터 저장소 (float32 행렬 파일 + 행 인덱스)
+    읽기는 np.memmap 뷰를 사용하므로 로딩 시 행렬 전체를 메모리로 읽지 않습니다.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.generation = 0
+        self.dim = 0
+        self.rows: dict[str, tuple[int, str]] = {}
+        self.free: list[int] = []
+        self._pending_free: list[int] = []
+        self._view: Optional[np.memmap] = None
+        self._row_count = 0
+        self._stale_files: list[Path] = []
+        self.dirty = False
+
+    @property
+    def vectors_file(self) -> Path:
+        return self.directory / f"vectors.{self.generation}.f32"
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 인덱스 직렬화
+    # ─────────────────────────────────────────────────────────────────────
+
+    def load_index(self, data: dict) -> None:
+        self.generation = int(data.get("generation", 0))
+        self.dim = int(data.get("dim", 0))
+        self.rows = {path: (int(entry[0]), entry[1]) for path, entry in data.get("rows", {}).items()}
+        self.free = [int(row) for row in data.get("free", [])]
+        self._row_count = self._file_rows()
+        # 파일보다 큰 행 번호를 가리키는 항목은 버림 (손상 방지)
+        if any(row >= self._row_count for row, _ in self.rows.values()):
+            self.rows = {p: e for p, e in self.rows.items() if e[0] < self._row_count}
+            self.dirty = True
+        self.free = [row for row in self.free if row < self._row_count]
+
+    def dump_index(self) -> dict:
+        return {
+            "generation": self.generation,
+            "dim": self.dim,
+            "rows": {path: [row, content_hash] for path, (row, content_hash) in self.rows.items()},
+            "free": self.free,
+        }
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 행렬 파일
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _file_rows(self) -> int:
+        if not self.dim or not self.vectors_file.exists():
+            return 0
+        return self.vectors_file.stat().st_size // (self.dim * 4)
+
+    def _close_view(self) -> None:
+        if self._view is not None:
+            mm = getattr(self._view, "_mmap", None)
+            self._view = None
+            if mm is not None:
+                try:
+                    mm.close()
+                except (BufferError, ValueError):
+                    pass
+
+    def _get_view(self) -> Optional[np.memmap]:
+        if self._row_count == 0:
+            return None
+        if self._view is None or self._view.shape[0] != self._row_count:
+            self._close_view()
+            self._view = np.memmap(
+                self.vectors_file, dtype=np.float32, mode="r", shape=(self._row_count, self.dim)
+            )
+        return self._view
+
+    def _new_generation(self) -> None:
+        """새 세대 행렬 파일로 전환 (이전 파일은 인덱스 커밋 후 삭제)"""
+        self._close_view()
+        if self.vectors_file.exists():
+            self._stale_files.append(self.vectors_file)
+        self.generation += 1
+
+    def _reset(self, dim: int) -> None:
+        """차원이 바뀌면 기존 벡터는 모두 무효"""
+        self._new_generation()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.vectors_file, "wb"):
+            pass
+        self.dim = dim
+        self.rows = {}
+        self.free = []
+        self._pending_free = []
+        self._row_count = 0
+        self.dirty = True
+
+    def _write_row(self, row: int, vector: np.ndarray) -> None:
+        mode = "r+b" if self.vectors_file.exists() else "w+b"
+        with open(self.vectors_file, mode) as f:
+            f.seek(row * self.dim * 4)
+            f.write(vector.tobytes())
+        self._row_count = max(self._row_count, row + 1)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 조회 / 갱신
+    # ─────────────────────────────────────────────────────────────────────
+
+    def get(self, path: str, content_hash: str) -> Optional[np.ndarray]:
+        entry = self.rows.get(path)
+        if entry is None or entry[1] != content_hash:
+            return None
+        view = self._get_view()
+        if view is None:
+            return None
+        return np.array(view[entry[0]])
+
+    def set(self, path: str, content_hash: str, vector) -> None:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if vector.shape[0] != self.dim:
+            self._reset(vector.shape[0])
+
+        # 커밋된 행은 덮어쓰지 않고 항상 빈 행(또는 끝)에 기록
+        previous = self.rows.get(path)
+        row = self.free.pop() if self.free else self._row_count
+        self._write_row(row, vector)
+        if previous is not None:
+            self._pending_free.append(previous[0])
+        self.rows[path] = (row, content_hash)
+        self.dirty = True
+
+    def remove(self, path: str) -> bool:
+        entry = self.rows.pop(path, None)
+        if entry is None:
+            return False
+        self._pending_free.append(entry[0])
+        self.dirty = True
+        return True
+
+    def snapshot(self) -> tuple[list[str], list[str], np.ndarray]:
+        """저장된 모든 벡터 (경로 목록, 해시 목록, 행렬)"""
+        view = self._get_view()
+        if view is None:
+            return [], [], np.zeros((0, self.dim), dtype=np.float32)
+        paths = [path for path, (row, _) in self.rows.items() if row < view.shape[0]]
+        if not paths:
+            return [], [], np.zeros((0, self.dim), dtype=np.float32)
+        matrix = np.asarray(view[[self.rows[p][0] for p in paths]], dtype=np.float32)
+        return paths, [self.rows[p][1] for p in paths], matrix
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # 저장
+    # ─────────────────────────────────────────────────────────────────────
+
+    def flush(self) -> None:
+        """인덱스 저장 전 벡터 파일을 디스크에 기록"""
+        if self.vectors_file.exists():
+            with open(self.vectors_file, "r+b") as f:
+                os.fsync(f.fileno())
+
+    def after_commit(self) -> None:
+        """인덱스가 저장된 뒤에야 이전 행(파일)을 재사용(삭제) 가능"""
+        self.free.extend(self._pending_free)
+        self._pending_free = []
+        for path in self._stale_files:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self._stale_files = []
+        self.dirty = False
+
+    def needs_compaction(self) -> bool:
+        return len(self.free) >= COMPACT_MIN_FREE_ROWS and len(self.free) * 2 > self._row_count
+
+    def compact(self) -> None:
+        """사용 중인 행만 남기도록 행렬 파일 재작성"""
+        view = self._get_view()
+        paths = sorted(self.rows, key=lambda p: self.rows[p][0])
+        if view is not None and paths:
+            matrix = np.asarray(view[[self.rows[p][0] for p in paths]], dtype=np.float32)
+        else:
+            matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._new_generation()
+        with open(self.vectors_file, "wb") as f:
+            f.write(matrix.tobytes())
+        self.rows = {path: (i, self.rows[path][1]) for i, path in enumerate(paths)}
+        self.free = []
+        self._pending_free = []
+        self._row_count = len(paths)
+        self.dirty = True
+        logger.info(f"Graph embedding store compacted to {len(paths)} rows")
+
+    def close(self) -> None:
+        self._close_view()
+
+
 class GraphCache:
-    """그래프 데이터 캐싱 관리 (간소화)"""
-    
+    """그래프 데이터 캐싱 관리 (임베딩 저장소 + 클러스터 라벨)"""
+
     def __init__(self, vault_path: Path):
         self.vault_path = vault_path
-        self.cache_file = CACHE_DIR / f"{self._get_vault_hash()}.json"
+        self.cache_dir = CACHE_DIR / self._get_vault_hash()
+        self.index_file = self.cache_dir / "index.json"
+        self.snapshot_file = self.cache_dir / "snapshot.json"
+        self._snapshots: dict[str, dict] = {}
+        self.legacy_cache_file = CACHE_DIR / f"{self._get_vault_hash()}.json"
         self.cache_data: dict = {}
+        self.embeddings = EmbeddingStore(self.cache_dir)
+        # 임베딩 백엔드+모델별 저장소 (기본 네임스페이스 ""는 self.embeddings)
+        self.stores: dict[str, EmbeddingStore] = {"": self.embeddings}
+        # 캐시 위에 만들어지는 메모리 인덱스 (graph_ann) - clear() 시 함께 버림
+        self.ann_indexes: dict = {}
+        self.lock = threading.RLock()
+        self._dirty = False
         self._load_cache()
-    
+
     def _get_vault_hash(self) -> str:
         """Vault 경로의 해시 (캐시 파일명용)"""
         return hashlib.md5(str(self.vault_path).encode()).hexdigest()[:12]
-    
+
+    def _store_dir(self, namespace: str) -> Path:
+        if not namespace:
+            return self.cache_dir
+        return self.cache_dir / f"emb-{hashlib.md5(namespace.encode()).hexdigest()[:12]}"
+
+    def _get_store(self, namespace: str) -> EmbeddingStore:
+        """네임스페이스의 임베딩 저장소 (없으면 생성)"""
+        store = self.stores.get(namespace)
+        if store is None:
+            store = EmbeddingStore(self._store_dir(namespace))
+            self.stores[namespace] = store
+        return store
+
     def _load_cache(self):
-        """캐시 파일 로드"""
-        CACHE_DIR.mkdir(parents=True, exist_ok=True)
-        
-        if self.cache_file.exists():
+        """캐시 인덱스 로드 (이전 JSON 형식이면 변환)"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        if self.index_file.exists():
             try:
-                self.cache_data = json.loads(self.cache_file.read_text(encoding="utf-8"))
-                logger.info(f"Graph cache loaded: {len(self.cache_data.get('embeddings', {}))} cached notes")
+                data = json.loads(self.index_file.read_text(encoding="utf-8"))
+                self.embeddings.load_index(data.pop("embeddings", {}))
+                for namespace, index in data.pop("embedding_stores", {}).items():
+                    self._get_store(namespace).load_index(index)
+                self.cache_data = data
+                logger.info(f"Graph cache loaded: {len(self.embeddings)} cached notes")
             except Exception as e:
                 logger.warning(f"Failed to load cache: {e}")
                 self.cache_data = {}
-        else:
-            self.cache_data = {}
-    
+
+        # 커밋되지 않았거나 이전 세대의 행렬 파일, 더 이상 쓰지 않는 네임스페이스 정리
+        live_files = {store.vectors_file for store in self.stores.values()}
+        for path in [*self.cache_dir.glob("vectors.*.f32"), *self.cache_dir.glob("emb-*/vectors.*.f32")]:
+            if path not in live_files:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+        if self.legacy_cache_file.exists():
+            self._migrate_legacy_cache()
+
+    def _migrate_legacy_cache(self):
+        """이전 형식(JSON 리스트 임베딩) 캐시를 바이너리 저장소로 변환"""
+        try:
+            legacy = json.loads(self.legacy_cache_file.read_text(encoding="utf-8"))
+            for path, entry in legacy.get("embeddings", {}).items():
+                if entry.get("embedding"):
+                    self.embeddings.set(path, entry.get("hash", ""), entry["embedding"])
+            labels = self.cache_data.setdefault("cluster_labels", {})
+            for cluster_hash, entry in legacy.get("cluster_labels", {}).items():
+                labels.setdefault(cluster_hash, entry)
+            self._dirty = True
+            self.save()
+            logger.info(f"Migrated legacy graph cache: {len(self.embeddings)} embeddings")
+        except Exception as e:
+            logger.warning(f"Failed to migrate legacy cache: {e}")
+        try:
+            self.legacy_cache_file.unlink()
+        except OSError:
+            pass
+
     def _save_cache(self):
-        """캐시 파일 저장"""
+        """캐시 저장 (변경이 있을 때만, 벡터 기록 후 인덱스 원자적 교체)"""
+        if not self._dirty and not any(store.dirty for store in self.stores.values()):
+            return
         try:
+            for store in self.stores.values():
+                if store.needs_compaction():
+                    store.compact()
+                store.flush()
+            self.cache_data["version"] = CACHE_VERSION
             self.cache_data["last_updated"] = time.time()
-            self.cache_file.write_text(
-                json.dumps(self.cache_data, ensure_ascii=False, indent=2),
-                encoding="utf-8"
-            )
+            _atomic_write_json(self.index_file, {
+                **self.cache_data,
+                "embeddings": self.embeddings.dump_index(),
+                "embedding_stores": {
+                    namespace: store.dump_index()
+                    for namespace, store in self.stores.items() if namespace
+                },
+            })
+            for store in self.stores.values():
+                store.after_commit()
+            self._dirty = False
         except Exception as e:
             logger.warning(f"Failed to save cache: {e}")
-    
+
     # ─────────────────────────────────────────────────────────────────────────
     # 임베딩 캐시
     # ─────────────────────────────────────────────────────────────────────────
-    
+
     def get_content_hash(self, content: str) -> str:
         """콘텐츠 해시 계산"""
         return hashlib.sha256(content.encode()).hexdigest()[:16]
-    
-    def get_cached_embedding(self, note_path: str, content_hash: str) -> Optional[list[float]]:
-        """캐시된 임베딩 가져오기"""
-        embeddings = self.cache_data.get("embeddings", {})
-        cached = embeddings.get(note_path)
-        
-        if cached and cached.get("hash") == content_hash:
-            return cached.get("embedding")
-        return None
-    
-    def set_embedding(self, note_path: str, content_hash: str, embedding: list[float]):
+
+    def get_cached_embedding(
+        self, note_path: str, content_hash: str, namespace: str = ""
+    ) -> Optional[np.ndarray]:
+        """캐시된 임베딩 가져오기 (namespace: 임베딩 백엔드+모델)"""
+        with self.lock:
+            store = self.stores.get(namespace)
+            return store.get(note_path, content_hash) if store is not None else None
+
+    def set_embedding(self, note_path: str, content_hash: str, embedding, namespace: str = ""):
         """임베딩 캐시에 저장"""
-        if "embeddings" not in self.cache_data:
-            self.cache_data["embeddings"] = {}
-        
-        self.cache_data["embeddings"][note_path] = {
-            "hash": content_hash,
-            "embedding": embedding
-        }
-    
+        with self.lock:
+            self._get_store(namespace).set(note_path, content_hash, embedding)
+
+    def remove_embedding(self, note_path: str, namespace: str = "") -> bool:
+        """임베딩 캐시에서 제거"""
+        with self.lock:
+            store = self.stores.get(namespace)
+            return store.remove(note_path) if store is not None else False
+
+    def get_embedding_rows(self, namespace: str) -> tuple[list[str], list[str], np.ndarray]:
+        """네임스페이스에 저장된 모든 임베딩 (경로, 해시, 행렬)"""
+        with self.lock:
+            store = self.stores.get(namespace)
+            if store is None:
+                return [], [], np.zeros((0, 0), dtype=np.float32)
+            return store.snapshot()
+
+    def embedding_count(self, namespace: Optional[str] = None) -> int:
+        """캐시된 임베딩 개수 (namespace를 생략하면 전체)"""
+        if namespace is not None:
+            store = self.stores.get(namespace)
+            return len(store) if store is not None else 0
+        return sum(len(store) for store in self.stores.values())
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # 메타데이터 (임베딩 엔진 상태 등)
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def get_metadata(self, key: str) -> Optional[dict]:
+        """캐시 메타데이터 항목 가져오기"""
+        return self.cache_data.get("meta", {}).get(key)
+
+    def set_metadata(self, key: str, value: dict):
+        """캐시 메타데이터 항목 저장"""
+        with self.lock:
+            self.cache_data.setdefault("meta", {})[key] = value
+            self._dirty = True
+
+    def _array_file(self, name: str) -> Path:
+        return self.cache_dir / f"array-{hashlib.md5(name.encode()).hexdigest()[:12]}.npy"
+
+    def load_array(self, name: str) -> Optional[np.ndarray]:
+        """보조 행렬 읽기 (없으면 None)"""
+        path = self._array_file(name)
+        if not path.exists():
+            return None
+        try:
+            return np.load(path)
+        except Exception as e:
+            logger.warning(f"Failed to load cache array {name}: {e}")
+            return None
+
+    def save_array(self, name: str, array: np.ndarray):
+        """보조 행렬 저장 (원자적 교체)"""
+        path = self._array_file(name)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with self.lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.asarray(array, dtype=np.float32))
+            os.replace(tmp_path, path)
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # 그래프 스냅샷 (완성된 응답)
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def get_snapshot(self, key: str) -> Optional[dict]:
+        """키(리비전 + 옵션)에 해당하는 그래프 응답 (메모리 → 디스크 순)"""
+        with self.lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                return snapshot
+            if not self.snapshot_file.exists():
+                return None
+            try:
+                data = json.loads(self.snapshot_file.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.warning(f"Failed to load graph snapshot: {e}")
+                return None
+            if data.get("key") != key:
+                return None
+            self._snapshots[key] = data["response"]
+            return data["response"]
+
+    def set_snapshot(self, key: str, response: dict):
+        """그래프 응답 저장 (메모리에는 최근 몇 개, 디스크에는 마지막 하나)"""
+        with self.lock:
+            self._snapshots.pop(key, None)
+            self._snapshots[key] = response
+            while len(self._snapshots) > SNAPSHOT_MEMORY_LIMIT:
+                self._snapshots.pop(next(iter(self._snapshots)))
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                _atomic_write_json(self.snapshot_file, {"key": key, "response": response})
+            except Exception as e:
+                logger.warning(f"Failed to save graph snapshot: {e}")
+
     # ─────────────────────────────────────────────────────────────────────────
     # 클러스터 라벨 캐시
     # ─────────────────────────────────────────────────────────────────────────
-    
+
     def get_cached_cluster_label(self, cluster_hash: str) -> Optional[tuple[str, list[str]]]:
         """캐시된 클러스터 라벨 가져오기"""
         labels = self.cache_data.get("cluster_labels", {})
         cached = labels.get(cluster_hash)
-        
+
         if cached:
             return (cached.get("label", ""), cached.get("keywords", []))
         return None
-    
+
     def set_cluster_label(self, cluster_hash: str, label: str, keywords: list[str]):
         """클러스터 라벨 캐시에 저장"""
-        if "cluster_labels" not in self.cache_data:
-            self.cache_data["cluster_labels"] = {}
-        
-        self.cache_data["cluster_labels"][cluster_hash] = {
-            "label": label,
-            "keywords": keywords
-        }
-    
+        with self.lock:
+            if "cluster_labels" not in self.cache_data:
+                self.cache_data["cluster_labels"] = {}
+
+            self.cache_data["cluster_labels"][cluster_hash] = {
+                "label": label,
+                "keywords": keywords
+            }
+            self._dirty = True
+
     def get_cluster_content_hash(self, contents: list[str]) -> str:
         """클러스터 컨텐츠들의 해시 (라벨 캐싱용)"""
         combined = "||".join(sorted([c[:200] for c in contents]))
         return hashlib.sha256(combined.encode()).hexdigest()[:16]
-    
+
     # ─────────────────────────────────────────────────────────────────────────
     # 캐시 관리
     # ─────────────────────────────────────────────────────────────────────────
-    
+
     def cleanup_old_entries(self, current_paths: set[str]):
         """더 이상 존재하지 않는 노트의 캐시 정리"""
-        embeddings = self.cache_data.get("embeddings", {})
-        removed = []
-        
-        for path in list(embeddings.keys()):
-            if path not in current_paths:
-                del embeddings[path]
-                removed.append(path)
-        
+        with self.lock:
+            removed = [
+                path
+                for store in self.stores.values()
+                for path in list(store.rows)
+                if path not in current_paths and store.remove(path)
+            ]
+
         if removed:
             logger.info(f"Cleaned up {len(removed)} old cache entries")
-    
+
+    def invalidate_paths(self, paths: set[str], prefixes: tuple[str, ...] = ()) -> int:
+        """변경/삭제된 노트(또는 폴더 하위)의 임베딩 캐시 무효화"""
+        with self.lock:
+            removed = [
+                path
+                for store in self.stores.values()
+                for path in list(store.rows)
+                if (path in paths or (prefixes and path.startswith(prefixes))) and store.remove(path)
+            ]
+        return len(removed)
+
+    def exists(self) -> bool:
+        """디스크에 저장된 캐시가 있는지"""
+        return self.index_file.exists()
+
+    def clear(self):
+        """캐시 전체 삭제"""
+        with self.lock:
+            for store in self.stores.values():
+                store.close()
+            for path in [
+                self.index_file, self.snapshot_file,
+                *self.cache_dir.glob("vectors.*.f32"), *self.cache_dir.glob("array-*.npy"),
+            ]:
+                if path.exists():
+                    path.unlink()
+            for directory in self.cache_dir.glob("emb-*"):
+                shutil.rmtree(directory, ignore_errors=True)
+            self.cache_data = {}
+            self.embeddings = EmbeddingStore(self.cache_dir)
+            self.stores = {"": self.embeddings}
+            self.ann_indexes = {}
+            self._snapshots = {}
+            self._dirty = False
+
     def save(self):
         """캐시 저장"""
-        self._save_cache()
+        with self.lock:
+            self._save_cache()
+
+
+# Vault별 공유 인스턴스 (요청마다 인덱스를 다시 읽지 않도록)
+_instances: dict[str, GraphCache] = {}
+_instances_lock = threading.Lock()
+
+
+def get_graph_cache(vault_path: Path) -> GraphCache:
+    """Vault의 공유 GraphCache 인스턴스 반환"""
+    key = str(vault_path)
+    with _instances_lock:
+        cache = _instances.get(key)
+        if cache is None:
+            cache = GraphCache(vault_path)
+            _instances[key] = cache
+        return cache
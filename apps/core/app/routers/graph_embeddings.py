@@ -0,0 +1,262 @@
+"""
+CueNote Core - Graph 임베딩 백엔드
+노트 임베딩 생성 방식을 선택할 수 있도록 추상화합니다.
+
+    tfidf  - 기본값. scikit-learn TF-IDF (graph_utils.get_embeddings_batch_optimized)
+    ollama - 로컬 Ollama /api/embed 엔드포인트 (bge-m3 등 다국어 임베딩 모델)
+    onnx   - DATA_DIR/models/<모델>/ 아래 model.onnx + tokenizer.json (CPU 추론)
+
+밀집 벡터는 GraphCache에 백엔드+모델별 네임스페이스로 저장되므로
+백엔드를 바꿔도 서로 다른 벡터가 섞이지 않고, 되돌아가면 이전 캐시를 그대로 사용합니다.
+"""
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .. import http_transport
+from ..config import DATA_DIR, logger
+from ..ollama_client import OLLAMA_BASE_URL
+from .graph_cache import GraphCache
+from .graph_utils import get_embeddings_batch_optimized, normalize_embeddings
+
+# 한 번의 요청(추론)에 넣을 노트 수
+EMBEDDING_BATCH_SIZE = 32
+
+# 동시에 처리할 배치 수 (Ollama는 http_transport의 제공자별 제한도 함께 적용)
+EMBEDDING_CONCURRENCY = 2
+
+# 임베딩 입력 최대 길이 (문자)
+EMBEDDING_MAX_CHARS = 2000
+
+# Ollama 임베딩 요청 타임아웃 (초)
+OLLAMA_EMBED_TIMEOUT = 120.0
+
+# ONNX 모델 디렉토리
+ONNX_MODELS_DIR = DATA_DIR / "models"
+ONNX_MAX_TOKENS = 512
+
+DEFAULT_EMBEDDING_BACKEND = "tfidf"
+DEFAULT_EMBEDDING_MODELS = {
+    "ollama": "bge-m3",
+    "onnx": "multilingual-e5-small",
+}
+
+
+def _embedding_input(note: dict) -> str:
+    content = note["content"].strip()
+    text = f"{note['title']}\n{content}" if content else note["title"]
+    return text[:EMBEDDING_MAX_CHARS] or "empty"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 백엔드
+# ─────────────────────────────────────────────────────────────────────────────
+
+class EmbeddingBackend(ABC):
+    """밀집 임베딩 백엔드 기본 클래스"""
+
+    name = ""
+
+    def __init__(self, model: str = ""):
+        self.model = model or DEFAULT_EMBEDDING_MODELS.get(self.name, "")
+
+    @property
+    def namespace(self) -> str:
+        """캐시 네임스페이스 (백엔드 + 모델)"""
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """텍스트 배치 하나를 (len(texts), dim) float32 행렬로 변환"""
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """로컬 Ollama /api/embed (배치 입력 지원)"""
+
+    name = "ollama"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        data = await http_transport.post_json(
+            "ollama",
+            f"{OLLAMA_BASE_URL}/api/embed",
+            {"model": self.model, "input": texts, "truncate": True},
+            timeout=OLLAMA_EMBED_TIMEOUT,
+        )
+        vectors = data.get("embeddings") or []
+        if len(vectors) != len(texts):
+            raise RuntimeError(f"Ollama returned {len(vectors)} embeddings for {len(texts)} inputs")
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """ONNX Runtime CPU 추론 (평균 풀링)"""
+
+    name = "onnx"
+
+    # 모델별 세션은 프로세스 전체에서 공유
+    _sessions: dict[str, tuple] = {}
+    _sessions_lock = threading.Lock()
+
+    @property
+    def model_dir(self) -> Path:
+        return ONNX_MODELS_DIR / self.model
+
+    def _load(self) -> tuple:
+        with self._sessions_lock:
+            loaded = self._sessions.get(self.model)
+            if loaded is not None:
+                return loaded
+            try:
+                import onnxruntime
+                from tokenizers import Tokenizer
+            except ImportError as exc:
+                logger.error(
+                    "ONNX embedding requires onnxruntime and tokenizers. "
+                    "Run: pip install onnxruntime tokenizers"
+                )
+                raise ImportError("onnxruntime / tokenizers가 설치되어 있지 않습니다.") from exc
+
+            model_file = self.model_dir / "model.onnx"
+            tokenizer_file = self.model_dir / "tokenizer.json"
+            if not model_file.exists() or not tokenizer_file.exists():
+                raise FileNotFoundError(f"ONNX 임베딩 모델을 찾을 수 없습니다: {self.model_dir}")
+
+            tokenizer = Tokenizer.from_file(str(tokenizer_file))
+            tokenizer.enable_truncation(max_length=ONNX_MAX_TOKENS)
+            tokenizer.enable_padding()
+            session = onnxruntime.InferenceSession(
+                str(model_file), providers=["CPUExecutionProvider"]
+            )
+            loaded = (tokenizer, session)
+            self._sessions[self.model] = loaded
+            logger.info(f"ONNX embedding model loaded: {self.model}")
+            return loaded
+
+    def _embed_sync(self, texts: list[str]) -> np.ndarray:
+        tokenizer, session = self._load()
+        encodings = tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        input_names = {i.name for i in session.get_inputs()}
+        if "token_type_ids" in input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        feeds = {name: value for name, value in feeds.items() if name in input_names}
+
+        hidden = session.run(None, feeds)[0]
+        if hidden.ndim == 2:
+            return hidden.astype(np.float32)
+        # 패딩을 제외한 토큰 평균
+        mask = attention_mask[:, :, None].astype(np.float32)
+        return ((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)).astype(np.float32)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._embed_sync, texts)
+
+
+EMBEDDING_BACKENDS: dict[str, type[EmbeddingBackend]] = {
+    OllamaEmbeddingBackend.name: OllamaEmbeddingBackend,
+    OnnxEmbeddingBackend.name: OnnxEmbeddingBackend,
+}
+
+
+def get_embedding_backend(name: str, model: str = "") -> Optional[EmbeddingBackend]:
+    """밀집 임베딩 백엔드 반환 (tfidf 또는 알 수 없는 이름이면 None)"""
+    backend_class = EMBEDDING_BACKENDS.get((name or "").lower())
+    return backend_class(model) if backend_class else None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 캐시 + 배치 임베딩
+# ─────────────────────────────────────────────────────────────────────────────
+
+async def _embed_dense(
+    notes: list[dict],
+    cache: GraphCache,
+    backend: EmbeddingBackend
+) -> tuple[np.ndarray, int, int]:
+    namespace = backend.namespace
+    vectors: list[Optional[np.ndarray]] = [None] * len(notes)
+    cache_keys: list[str] = []
+    to_compute_indices: list[int] = []
+
+    # 1. 캐시 확인 (백엔드 + 모델 + 콘텐츠 해시)
+    for i, note in enumerate(notes):
+        key = f"{namespace}:{cache.get_content_hash(note['content'])}"
+        cache_keys.append(key)
+        cached = cache.get_cached_embedding(note["path"], key, namespace)
+        if cached is not None:
+            vectors[i] = cached
+        else:
+            to_compute_indices.append(i)
+
+    # 2. 변경/신규 노트만 배치로 나누어 제한된 동시성으로 계산
+    if to_compute_indices:
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+        batches = [
+            to_compute_indices[start:start + EMBEDDING_BATCH_SIZE]
+            for start in range(0, len(to_compute_indices), EMBEDDING_BATCH_SIZE)
+        ]
+
+        async def run_batch(indices: list[int]) -> tuple[list[int], np.ndarray]:
+            async with semaphore:
+                return indices, await backend.embed([_embedding_input(notes[i]) for i in indices])
+
+        for indices, matrix in await asyncio.gather(*(run_batch(b) for b in batches)):
+            for row, i in enumerate(indices):
+                vectors[i] = matrix[row]
+                cache.set_embedding(notes[i]["path"], cache_keys[i], matrix[row], namespace)
+
+    # 같은 이름의 모델이 교체되면 차원이 달라질 수 있음
+    # (저장소는 새 차원으로 초기화되어 다음 요청부터 일관됨)
+    dims = {v.shape[0] for v in vectors if v is not None}
+    if len(dims) > 1:
+        raise RuntimeError(f"Inconsistent embedding dimensions for {namespace}: {sorted(dims)}")
+
+    computed_count = len(to_compute_indices)
+    return normalize_embeddings(vectors), len(notes) - computed_count, computed_count
+
+
+def embedding_namespace(backend: str = DEFAULT_EMBEDDING_BACKEND, model: str = "") -> str:
+    """요청한 백엔드+모델의 네임스페이스 (ANN 인덱스, 저장된 클러스터 구분용)"""
+    dense_backend = get_embedding_backend(backend, model)
+    return dense_backend.namespace if dense_backend is not None else DEFAULT_EMBEDDING_BACKEND
+
+
+async def get_note_embeddings(
+    notes: list[dict],
+    cache: GraphCache,
+    backend: str = DEFAULT_EMBEDDING_BACKEND,
+    model: str = ""
+) -> tuple[np.ndarray, int, int, str]:
+    """
+    선택한 백엔드로 노트 임베딩 생성 (캐시 활용, 정규화된 행렬)
+    밀집 임베딩 백엔드를 사용할 수 없으면 TF-IDF로 대체합니다.
+    Returns: (embeddings 행렬, cached_count, computed_count, source)
+        source는 실제로 사용된 벡터 공간 (백엔드+모델 또는 TF-IDF 어휘 ID)
+    """
+    dense_backend = get_embedding_backend(backend, model)
+    if dense_backend is not None and notes:
+        try:
+            embeddings, cached_count, computed_count = await _embed_dense(
+                notes, cache, dense_backend
+            )
+            return embeddings, cached_count, computed_count, dense_backend.namespace
+        except Exception as e:
+            logger.warning(
+                f"{dense_backend.namespace} embedding failed, falling back to TF-IDF: {e}"
+            )
+
+    # TF-IDF 행렬 계산은 CPU 작업이므로 이벤트 루프 밖에서 실행
+    loop = asyncio.get_running_loop()
+    embeddings, cached_count, computed_count = await loop.run_in_executor(
+        None, get_embeddings_batch_optimized, notes, cache
+    )
+    state = cache.get_metadata("tfidf") or {}
+    return embeddings, cached_count, computed_count, f"tfidf:{state.get('id', '')}"
@@ -2,220 +2,228 @@
 CueNote Core - Graph 유틸리티 함수
 임베딩, 클러스터링, AI 라벨 생성 등
 """
-import json
-import os
-import re
-import sys
-from typing import Optional
+import asyncio
+import hashlib
+from typing import AsyncIterator, Optional
 from pathlib import Path
 
-from ..config import logger, DATA_DIR, VAULT_PATH
-from .graph_cache import GraphCache
+import numpy as np
 
-# 환경 설정 파일 경로 (vault.py와 동일)
-ENV_CONFIG_PATH = DATA_DIR / "environments.json"
-DEFAULT_VAULT_PATH = VAULT_PATH
+from ..config import logger
+from .. import note_index
+from ..note_index import build_preview
+from ..vault_context import get_current_vault_path
+from .graph_cache import GraphCache
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 유틸리티 함수
 # ─────────────────────────────────────────────────────────────────────────────
 
-def get_git_repos_dir() -> Path:
-    """GitHub 리포지토리 클론 디렉토리 경로 반환 (vault.py, github.py와 동일)"""
-    if os.name == 'nt':
-        base = Path(os.environ.get('APPDATA', '')) / 'cuenote'
-    elif os.name == 'posix':
-        if 'darwin' in sys.platform:
-            base = Path.home() / 'Library' / 'Application Support' / 'cuenote'
-        else:
-            base = Path.home() / '.local' / 'share' / 'cuenote'
-    else:
-        base = Path.home() / '.cuenote'
-    return base / 'git-repos'
+def get_all_notes() -> list[dict]:
+    """모든 노트 읽기 (노트 인덱스 기반)"""
+    vault_path = get_current_vault_path()
+    # 임베딩용 앞부분만
+    return note_index.list_notes(vault_path, content_chars=3000)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 임베딩 & 클러스터링 (최적화)
+# ─────────────────────────────────────────────────────────────────────────────
+
+# TF-IDF 어휘 설정
+TFIDF_MAX_FEATURES = 200
+TFIDF_NGRAM_RANGE = (1, 2)
+
+# 어휘 학습 이후 변경된 노트 비율이 이 값을 넘으면 어휘 재학습
+VOCAB_DRIFT_RATIO = 0.3
+VOCAB_DRIFT_MIN_CHANGES = 20
+
+
+def _embedding_text(note: dict) -> str:
+    return note["content"] if note["content"].strip() else "empty"
 
 
-def get_current_vault_path() -> Path:
-    """현재 선택된 환경의 Vault 경로 반환 (GitHub 환경 포함)"""
-    if not ENV_CONFIG_PATH.exists():
-        return DEFAULT_VAULT_PATH
+def _fit_vocabulary(texts: list[str]) -> list[str]:
+    """전체 코퍼스로 TF-IDF 어휘(상위 특성) 학습"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
     
+    vectorizer = TfidfVectorizer(
+        max_features=TFIDF_MAX_FEATURES,
+        stop_words=None,
+        ngram_range=TFIDF_NGRAM_RANGE,
+        min_df=1,
+        max_df=0.95
+    )
     try:
-        data = json.loads(ENV_CONFIG_PATH.read_text(encoding="utf-8"))
-        current_id = data.get("current_id")
-        if not current_id:
-            return DEFAULT_VAULT_PATH
-        
-        for env in data.get("environments", []):
-            if env.get("id") == current_id:
-                env_type = env.get("type", "local")
-                
-                # GitHub 환경인 경우 로컬 클론 경로 반환
-                if env_type == "github":
-                    github_info = env.get("github", {})
-                    owner = github_info.get("owner")
-                    repo = github_info.get("repo")
-                    if owner and repo:
-                        git_path = get_git_repos_dir() / f"{owner}_{repo}"
-                        if git_path.exists():
-                            return git_path
-                    return DEFAULT_VAULT_PATH
-                
-                # 로컬 환경
-                env_path = Path(env.get("path", ""))
-                if env_path.exists():
-                    return env_path
-        
-        return DEFAULT_VAULT_PATH
-    except Exception as e:
-        logger.error("Failed to get current vault path: %s", e)
-        return DEFAULT_VAULT_PATH
+        vectorizer.fit(texts)
+    except ValueError:
+        # 문서가 너무 적어 max_df로 모든 단어가 제외되는 경우
+        vectorizer.set_params(max_df=1.0)
+        vectorizer.fit(texts)
+    vocabulary = vectorizer.vocabulary_
+    return sorted(vocabulary, key=lambda term: vocabulary[term])
 
 
-def get_all_notes() -> list[dict]:
-    """모든 노트 파일 읽기"""
-    vault_path = get_current_vault_path()
-    notes = []
-    
-    for md_file in vault_path.rglob("*.md"):
-        rel_path = md_file.relative_to(vault_path)
-        rel_path_str = str(rel_path).replace("\\", "/")
-        
-        # .trash 폴더 제외
-        if rel_path_str.startswith(".trash/") or "/.trash/" in rel_path_str:
-            continue
-        
-        try:
-            content = md_file.read_text(encoding="utf-8")
-            title = rel_path_str.replace(".md", "")
-            
-            # 마크다운에서 제목 추출 시도
-            first_heading = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-            if first_heading:
-                title = first_heading.group(1).strip()
-            
-            # 단어 수 계산
-            word_count = len(content.split())
-            
-            notes.append({
-                "path": rel_path_str,
-                "title": title,
-                "content": content[:3000],  # 임베딩용 앞부분만
-                "wordCount": word_count
-            })
-        except Exception as e:
-            logger.warning(f"Failed to read note {rel_path_str}: {e}")
+def _get_vocabulary_state(notes: list[dict], cache: GraphCache) -> tuple[dict, bool]:
+    """
+    저장된 어휘 상태 반환 (없거나 드리프트가 임계값을 넘으면 재학습)
+    Returns: (state, refitted)
+    """
+    state = cache.get_metadata("tfidf")
+    if state and state.get("vocab"):
+        threshold = max(VOCAB_DRIFT_MIN_CHANGES, state.get("fitted_docs", 0) * VOCAB_DRIFT_RATIO)
+        if state.get("changes", 0) <= threshold:
+            return state, False
     
-    return notes
-
+    vocab = _fit_vocabulary([_embedding_text(n) for n in notes])
+    state = {
+        "id": hashlib.sha256("\n".join(vocab).encode()).hexdigest()[:12],
+        "vocab": vocab,
+        "fitted_docs": len(notes),
+        "changes": 0,
+    }
+    cache.set_metadata("tfidf", state)
+    logger.info(f"TF-IDF vocabulary fitted: {len(vocab)} features from {len(notes)} notes")
+    return state, True
 
-# ─────────────────────────────────────────────────────────────────────────────
-# 임베딩 & 클러스터링 (최적화)
-# ─────────────────────────────────────────────────────────────────────────────
 
 def get_embeddings_batch_optimized(
     notes: list[dict], 
     cache: GraphCache
-) -> tuple[list[list[float]], int, int]:
+) -> tuple[np.ndarray, int, int]:
     """
-    캐시를 활용한 배치 임베딩 생성
-    Returns: (embeddings, cached_count, computed_count)
+    캐시를 활용한 배치 임베딩 생성 (TF-IDF)
+    고정 어휘에 대한 단어 빈도(TF) 벡터를 노트별로 캐시하고, IDF는 현재 전체 노트의
+    문서 빈도로 매번 벡터 연산하여 적용합니다. 변경된 노트만 토큰화하면 됩니다.
+    Returns: (embeddings 행렬, cached_count, computed_count)
     """
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
     
     if not notes:
-        return [], 0, 0
+        return np.zeros((0, TFIDF_MAX_FEATURES), dtype=np.float32), 0, 0
+    
+    try:
+        state, refitted = _get_vocabulary_state(notes, cache)
+    except Exception as e:
+        logger.error(f"Embedding generation failed: {e}")
+        return np.zeros((len(notes), TFIDF_MAX_FEATURES), dtype=np.float32), 0, len(notes)
     
-    embeddings: list[Optional[list[float]]] = [None] * len(notes)
+    vocab = state["vocab"]
+    tf_rows: list[Optional[np.ndarray]] = [None] * len(notes)
     to_compute_indices: list[int] = []
-    to_compute_texts: list[str] = []
-    cached_count = 0
+    cache_keys: list[str] = []
     
-    # 1. 캐시에서 가져올 수 있는 것들 확인
+    # 1. 캐시된 TF 벡터 (어휘 ID + 콘텐츠 해시가 같아야 유효)
     for i, note in enumerate(notes):
-        content_hash = cache.get_content_hash(note["content"])
-        cached_emb = cache.get_cached_embedding(note["path"], content_hash)
-        
-        if cached_emb is not None:
-            embeddings[i] = cached_emb
-            cached_count += 1
+        key = f"tfidf:{state['id']}:{cache.get_content_hash(note['content'])}"
+        cache_keys.append(key)
+        cached_tf = cache.get_cached_embedding(note["path"], key)
+        if cached_tf is not None and cached_tf.shape[0] == len(vocab):
+            tf_rows[i] = cached_tf
         else:
             to_compute_indices.append(i)
-            to_compute_texts.append(note["content"] if note["content"].strip() else "empty")
     
-    # 2. 캐시에 없는 것들 계산
+    cached_count = len(notes) - len(to_compute_indices)
     computed_count = len(to_compute_indices)
     
-    if to_compute_texts:
-        try:
-            # 모든 텍스트(캐시 포함)로 TF-IDF 학습해야 일관성 유지
-            all_texts = [n["content"] if n["content"].strip() else "empty" for n in notes]
-            
-            vectorizer = TfidfVectorizer(
-                max_features=200,
-                stop_words=None,
-                ngram_range=(1, 2),
-                min_df=1,
-                max_df=0.95
-            )
-            
-            # 전체 코퍼스로 fit
-            vectorizer.fit(all_texts)
-            
-            # 필요한 것들만 transform
-            transform_result = vectorizer.transform(to_compute_texts)
-            new_embeddings_matrix = transform_result.toarray()  # type: ignore
-            
-            for idx, global_idx in enumerate(to_compute_indices):
-                emb = new_embeddings_matrix[idx].tolist()
-                embeddings[global_idx] = emb
-                
-                # 캐시에 저장
-                note = notes[global_idx]
-                content_hash = cache.get_content_hash(note["content"])
-                cache.set_embedding(note["path"], content_hash, emb)
-            
-            # 캐시된 것들도 새 vectorizer로 재계산 (일관성)
-            if cached_count > 0:
-                for i, note in enumerate(notes):
-                    if i not in to_compute_indices:
-                        text = note["content"] if note["content"].strip() else "empty"
-                        single_result = vectorizer.transform([text])
-                        emb = single_result.toarray()[0].tolist()  # type: ignore
-                        embeddings[i] = emb
-                        content_hash = cache.get_content_hash(note["content"])
-                        cache.set_embedding(note["path"], content_hash, emb)
-                        
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
-            # 실패 시 0 벡터로 대체
-            for idx in to_compute_indices:
-                embeddings[idx] = [0.0] * 200
+    # 2. 변경/신규 노트만 배치로 TF 계산
+    if to_compute_indices:
+        counter = CountVectorizer(vocabulary=vocab, ngram_range=TFIDF_NGRAM_RANGE)
+        counts = counter.transform([_embedding_text(notes[i]) for i in to_compute_indices])
+        counts = counts.toarray().astype(np.float32)  # type: ignore
+        for row, i in enumerate(to_compute_indices):
+            tf_rows[i] = counts[row]
+            cache.set_embedding(notes[i]["path"], cache_keys[i], counts[row])
+        if not refitted:
+            state["changes"] = state.get("changes", 0) + computed_count
+            cache.set_metadata("tfidf", state)
+    
+    # 3. 현재 코퍼스 기준 IDF 적용 (sklearn smooth_idf와 동일) + L2 정규화
+    filled_rows = [row for row in tf_rows if row is not None]
+    assert len(filled_rows) == len(notes)  # 캐시 적중 + 새로 계산한 행이 모든 노트를 채움
+    tf_matrix = np.vstack(filled_rows).astype(np.float32)
+    n_docs = tf_matrix.shape[0]
+    df = np.count_nonzero(tf_matrix, axis=0)
+    idf = np.log((1 + n_docs) / (1 + df)).astype(np.float32) + 1.0
+    embeddings = tf_matrix * idf
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    
+    return embeddings / norms, cached_count, computed_count
+
+
+def normalize_embeddings(embeddings) -> np.ndarray:
+    """임베딩 목록/행렬을 L2 정규화된 float32 행렬로 변환 (내적 = 코사인 유사도)"""
+    from scipy import sparse
     
-    return [e if e else [0.0] * 200 for e in embeddings], cached_count, computed_count
+    if sparse.issparse(embeddings):
+        embeddings = embeddings.toarray()
+    matrix = np.asarray(np.vstack(embeddings) if isinstance(embeddings, list) else embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
 
 
-def compute_similarity_matrix(embeddings: list[list[float]]) -> list[list[float]]:
-    """코사인 유사도 행렬 계산"""
-    from sklearn.metrics.pairwise import cosine_similarity
-    import numpy as np
+# 유사도 블록 하나의 최대 원소 수 (float32 기준 약 64MB)
+SIMILARITY_BLOCK_ELEMENTS = 16_000_000
+
+
+def build_similarity_edges(
+    matrix: np.ndarray,
+    min_similarity: float,
+    top_k: int = 10
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    노드별 상위 k개 이웃 중 min_similarity 이상인 쌍을 엣지로 반환
+    전체 n×n 행렬 대신 행 블록 단위로 유사도를 계산합니다.
+    matrix는 normalize_embeddings()로 정규화된 행렬이어야 합니다.
+    Returns: (source 인덱스, target 인덱스, 유사도) - source < target, 중복 없음
+    """
+    n = matrix.shape[0]
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+    if n < 2:
+        return empty
     
-    if not embeddings:
-        return []
+    k = min(top_k, n - 1)
+    block_size = max(1, min(n, SIMILARITY_BLOCK_ELEMENTS // n))
+    sources, targets, weights = [], [], []
     
-    embedding_array = np.array(embeddings)
-    similarity_matrix = cosine_similarity(embedding_array)
-    return similarity_matrix.tolist()
+    for start in range(0, n, block_size):
+        end = min(n, start + block_size)
+        block = matrix[start:end] @ matrix.T
+        rows = np.arange(end - start)
+        block[rows, rows + start] = -np.inf  # 자기 자신 제외
+        
+        # 행별 상위 k개 (정렬 없이 분할)
+        top = np.argpartition(block, -k, axis=1)[:, -k:]
+        top_sims = np.take_along_axis(block, top, axis=1)
+        keep = top_sims >= min_similarity
+        
+        src = np.repeat(rows + start, k).reshape(-1, k)[keep]
+        sources.append(src)
+        targets.append(top[keep])
+        weights.append(top_sims[keep])
+    
+    if not sources:
+        return empty
+    src = np.concatenate(sources)
+    dst = np.concatenate(targets)
+    sim = np.concatenate(weights)
+    
+    # 무방향 쌍 중복 제거 (i→j, j→i 모두 상위 k인 경우)
+    lo = np.minimum(src, dst)
+    hi = np.maximum(src, dst)
+    _, unique_idx = np.unique(lo * n + hi, return_index=True)
+    return lo[unique_idx], hi[unique_idx], sim[unique_idx]
 
 
-def perform_clustering(embeddings: list[list[float]], num_clusters: int) -> list[int]:
-    """K-Means 클러스터링 수행"""
+def perform_clustering(embeddings: np.ndarray, num_clusters: int) -> list[int]:
+    """K-Means 전체 클러스터링 수행 (증분 갱신은 update_clusters 사용)"""
     from sklearn.cluster import KMeans
-    import numpy as np
     
-    if not embeddings or len(embeddings) < 2:
-        return [0] * len(embeddings) if embeddings else []
+    if len(embeddings) < 2:
+        return [0] * len(embeddings)
     
     # 클러스터 수 조정 (노트 수보다 클 수 없음)
     actual_clusters = min(num_clusters, len(embeddings))
@@ -232,39 +240,215 @@ def perform_clustering(embeddings: list[list[float]], num_clusters: int) -> list
     return labels.tolist()
 
 
+def default_cluster_label(cluster_id: int) -> str:
+    return f"주제 {cluster_id + 1}"
+
+
+# 클러스터 전체 재계산 기준: 마지막 전체 클러스터링 이후 바뀐 노트 비율 / 응집도 하락폭
+RECLUSTER_DRIFT_RATIO = 0.3
+RECLUSTER_MIN_CHANGES = 20
+RECLUSTER_COHESION_DROP = 0.1
+
+
+def _cluster_centroids(matrix: np.ndarray, labels: np.ndarray, cluster_ids: list[int]) -> np.ndarray:
+    return normalize_embeddings(
+        np.vstack([matrix[labels == cluster_id].mean(axis=0) for cluster_id in cluster_ids])
+    )
+
+
+def _match_cluster_ids(old_ids: list[int], old_centroids: Optional[np.ndarray], new_centroids: np.ndarray) -> list[int]:
+    """
+    새 클러스터를 가장 비슷한 이전 클러스터 ID에 일대일 대응 (헝가리안 알고리즘)
+    ID가 유지되어야 색상과 라벨 캐시가 재클러스터링 후에도 그대로 유지됩니다.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    new_ids: list[Optional[int]] = [None] * len(new_centroids)
+    if old_ids and old_centroids is not None and old_centroids.shape[1] == new_centroids.shape[1]:
+        rows, cols = linear_sum_assignment(-(new_centroids @ old_centroids.T))
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            new_ids[row] = old_ids[col]
+
+    used = {cluster_id for cluster_id in new_ids if cluster_id is not None}
+    next_id = 0
+    for i, cluster_id in enumerate(new_ids):
+        if cluster_id is None:
+            while next_id in used:
+                next_id += 1
+            new_ids[i] = next_id
+            used.add(next_id)
+    return new_ids  # type: ignore
+
+
+def update_clusters(
+    cache: GraphCache,
+    namespace: str,
+    source: str,
+    notes: list[dict],
+    matrix: np.ndarray,
+    num_clusters: Optional[int] = None
+) -> tuple[list[int], bool]:
+    """
+    저장된 중심점을 기준으로 클러스터 배정 갱신 (결과는 캐시에 저장)
+    - 내용이 그대로인 노트는 기존 배정 유지
+    - 신규/변경 노트는 가장 가까운 중심점에 배정하고, 중심점은 배정 횟수 기반 학습률로
+      조금씩 이동 (MiniBatchKMeans partial_fit과 같은 방식)
+    - 벡터 공간이나 클러스터 수가 바뀌었거나, 변경 누적/응집도 하락이 임계값을 넘으면 전체 재클러스터링
+    matrix는 정규화된 행렬이어야 하며, num_clusters가 없으면 저장된 값을 사용합니다.
+    Returns: (노트별 클러스터 ID, 전체 재클러스터링 여부)
+    """
+    state = cache.get_metadata(f"clusters:{namespace}") or {}
+    old_ids: list[int] = state.get("ids", [])
+    old_centroids = cache.load_array(f"clusters:{namespace}") if old_ids else None
+    if num_clusters is None:
+        num_clusters = state.get("k") or min(8, max(2, len(notes) // 3))
+    if not notes:
+        return [], False
+
+    incremental = (
+        old_ids
+        and old_centroids is not None
+        and state.get("source") == source
+        and state.get("k") == num_clusters
+        and old_centroids.shape == (len(old_ids), matrix.shape[1])
+    )
+
+    if incremental:
+        centroids = old_centroids.astype(np.float32)
+        counts = np.asarray(state.get("counts", [1] * len(old_ids)), dtype=np.float32)
+        id_to_row = {cluster_id: row for row, cluster_id in enumerate(old_ids)}
+        previous: dict[str, list] = state.get("assignments", {})
+        current = {note["path"] for note in notes}
+
+        # 삭제된 노트는 배정 횟수에서만 제외
+        for path, (cluster_id, _) in previous.items():
+            if path not in current and cluster_id in id_to_row:
+                counts[id_to_row[cluster_id]] = max(1.0, counts[id_to_row[cluster_id]] - 1)
+
+        labels = np.empty(len(notes), dtype=np.int64)
+        changed = []
+        for i, note in enumerate(notes):
+            entry = previous.get(note["path"])
+            if entry and entry[1] == note["hash"] and entry[0] in id_to_row:
+                labels[i] = id_to_row[entry[0]]
+            else:
+                changed.append(i)
+
+        # 신규/변경 노트: 최근접 중심점 배정 + 중심점 이동 (학습률 = 1 / 누적 배정 수)
+        if changed:
+            nearest = np.argmax(matrix[changed] @ centroids.T, axis=1)
+            for i, row in zip(changed, nearest.tolist()):
+                labels[i] = row
+                counts[row] += 1
+                centroids[row] += (matrix[i] - centroids[row]) / counts[row]
+            centroids = normalize_embeddings(centroids)
+
+        changes = state.get("changes", 0) + len(changed)
+        cohesion = float(np.mean(np.sum(matrix * centroids[labels], axis=1)))
+        threshold = max(RECLUSTER_MIN_CHANGES, state.get("fitted_size", 0) * RECLUSTER_DRIFT_RATIO)
+        drifted = changes > threshold or cohesion < state.get("fit_cohesion", 0.0) - RECLUSTER_COHESION_DROP
+        if not drifted:
+            assignments = [old_ids[row] for row in labels.tolist()]
+            state.update(
+                counts=counts.tolist(),
+                changes=changes,
+                cohesion=cohesion,
+                assignments={note["path"]: [cid, note["hash"]] for note, cid in zip(notes, assignments)},
+            )
+            cache.set_metadata(f"clusters:{namespace}", state)
+            if changed:
+                cache.save_array(f"clusters:{namespace}", centroids)
+            return assignments, False
+        logger.info(f"Cluster drift detected ({namespace}): {changes} changes, cohesion {cohesion:.3f}")
+
+    # 전체 재클러스터링 (ID는 이전 중심점과 최대한 일치시킴)
+    labels = np.asarray(perform_clustering(matrix, num_clusters))
+    fitted = sorted(set(labels.tolist()))
+    centroids = _cluster_centroids(matrix, labels, fitted)
+    cluster_ids = _match_cluster_ids(old_ids, old_centroids, centroids)
+    id_of = {label: cluster_ids[i] for i, label in enumerate(fitted)}
+    assignments = [id_of[label] for label in labels.tolist()]
+    rows = np.asarray([fitted.index(label) for label in labels.tolist()])
+    cohesion = float(np.mean(np.sum(matrix * centroids[rows], axis=1)))
+
+    cache.set_metadata(f"clusters:{namespace}", {
+        "source": source,
+        "k": num_clusters,
+        "ids": cluster_ids,
+        "counts": [int(np.sum(labels == label)) for label in fitted],
+        "labels": state.get("labels", {}) if state.get("source") == source else {},
+        "assignments": {note["path"]: [cid, note["hash"]] for note, cid in zip(notes, assignments)},
+        "fitted_size": len(notes),
+        "changes": 0,
+        "fit_cohesion": cohesion,
+        "cohesion": cohesion,
+    })
+    cache.save_array(f"clusters:{namespace}", centroids)
+    logger.info(f"Clustered {len(notes)} notes into {len(cluster_ids)} clusters ({namespace})")
+    return assignments, True
+
+
+def store_cluster_labels(cache: GraphCache, namespace: str, label_map: dict[int, tuple[str, list[str]]]) -> None:
+    """클러스터 ID별 라벨 저장 (/graph/related에서 사용)"""
+    state = cache.get_metadata(f"clusters:{namespace}")
+    if not state:
+        return
+    state["labels"] = {str(cluster_id): list(label) for cluster_id, label in label_map.items()}
+    cache.set_metadata(f"clusters:{namespace}", state)
+
+
+class StoredClusters:
+    """저장된 클러스터 배정 조회 (배정 이후 추가된 노트는 가장 가까운 중심점으로)"""
+
+    def __init__(self, cache: GraphCache, namespace: str):
+        data = cache.get_metadata(f"clusters:{namespace}") or {}
+        self.ids: list[int] = data.get("ids", [])
+        self.labels: dict[str, list] = data.get("labels", {})
+        self.assignments: dict[str, list] = data.get("assignments", {})
+        self.centroids = cache.load_array(f"clusters:{namespace}") if self.ids else None
+
+    def __bool__(self) -> bool:
+        return bool(self.ids)
+
+    def lookup(self, path: str, vector: Optional[np.ndarray] = None) -> tuple[int, str]:
+        """Returns: (클러스터 ID, 라벨) - 알 수 없으면 (-1, "")"""
+        entry = self.assignments.get(path)
+        cluster_id = entry[0] if isinstance(entry, list) else entry
+        if (
+            cluster_id is None and vector is not None and self.centroids is not None
+            and self.centroids.shape == (len(self.ids), vector.shape[0])
+        ):
+            cluster_id = self.ids[int(np.argmax(self.centroids @ vector))]
+        if cluster_id is None:
+            return -1, ""
+        label = self.labels.get(str(cluster_id), [default_cluster_label(cluster_id)])[0]
+        return cluster_id, label
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # AI 클러스터 라벨 생성 (캐싱 포함)
 # ─────────────────────────────────────────────────────────────────────────────
 
-async def generate_cluster_labels_optimized(
-    cluster_contents: dict[int, list[str]],
-    provider: str,
-    api_key: str,
-    model: str,
-    cache: GraphCache
-) -> tuple[dict[int, tuple[str, list[str]]], int, int]:
-    """
-    AI를 사용하여 클러스터 라벨 및 키워드 생성 (캐싱 포함)
-    Returns: (labels, cached_count, generated_count)
-    """
-    labels = {}
-    cached_count = 0
-    generated_count = 0
-    
-    for cluster_id, contents in cluster_contents.items():
-        # 클러스터 컨텐츠 해시로 캐시 확인
-        cluster_hash = cache.get_cluster_content_hash(contents)
-        cached_label = cache.get_cached_cluster_label(cluster_hash)
-        
-        if cached_label:
-            labels[cluster_id] = cached_label
-            cached_count += 1
-            continue
-        
-        # 캐시에 없으면 AI로 생성
-        sample_text = "\n---\n".join([c[:500] for c in contents[:5]])
-        
-        prompt = f"""다음은 같은 주제의 노트들입니다. 이 노트들의 공통 주제를 분석해주세요.
+# 제공자별 클러스터 라벨 동시 생성 수 (http_transport의 제공자별 연결 제한 안에서 동작)
+LABEL_CONCURRENCY = {
+    "ollama": 2,
+    "gemini": 6,
+    "openai": 6,
+    "anthropic": 4,
+}
+DEFAULT_LABEL_CONCURRENCY = 4
+
+# 클러스터 하나의 라벨 생성 제한 시간 / 전체 제한 시간 (초)
+# 전체 시간이 지나면 남은 클러스터는 기본 라벨로 대체하고 부분 결과를 반환
+LABEL_TIMEOUT_SECONDS = 30.0
+LABEL_TOTAL_TIMEOUT_SECONDS = 60.0
+
+LABEL_SCHEMA_HINT = '{"label": "", "keywords": []}'
+
+
+def _cluster_label_prompt(contents: list[str]) -> str:
+    sample_text = "\n---\n".join([c[:500] for c in contents[:5]])
+    return f"""다음은 같은 주제의 노트들입니다. 이 노트들의 공통 주제를 분석해주세요.
 
 노트 내용:
 {sample_text}
@@ -277,79 +461,102 @@ async def generate_cluster_labels_optimized(
 
 JSON만 출력하세요:"""
 
+
+def _label_provider(provider: str, api_key: str) -> str:
+    """API 키가 없으면 로컬 Ollama 사용"""
+    return provider if provider in ("gemini", "openai", "anthropic") and api_key else "ollama"
+
+
+async def _request_cluster_label(prompt: str, provider: str, api_key: str, model: str) -> dict:
+    if provider == "gemini":
+        from .. import gemini_client
+        return await gemini_client.call_json(prompt, LABEL_SCHEMA_HINT, api_key, model or None)
+    if provider == "openai":
+        from .. import openai_client
+        return await openai_client.call_json(prompt, LABEL_SCHEMA_HINT, api_key, model or None)
+    if provider == "anthropic":
+        from .. import anthropic_client
+        return await anthropic_client.call_json(prompt, LABEL_SCHEMA_HINT, api_key, model or None)
+    from .. import ollama_client
+    return await ollama_client.call_json(prompt, LABEL_SCHEMA_HINT, model or None)
+
+
+async def stream_cluster_labels(
+    cluster_contents: dict[int, list[str]],
+    provider: str,
+    api_key: str,
+    model: str,
+    cache: GraphCache,
+    concurrency: int = 0,
+    timeout: float = LABEL_TIMEOUT_SECONDS,
+    total_timeout: float = LABEL_TOTAL_TIMEOUT_SECONDS
+) -> AsyncIterator[tuple[int, str, list[str], str]]:
+    """
+    클러스터 라벨을 준비되는 순서대로 생성 (캐시된 라벨 먼저, 이후 AI 응답 순)
+    캐시에 없는 클러스터는 제공자별 동시성 제한 안에서 동시에 요청하고,
+    실패하거나 제한 시간을 넘긴 클러스터는 기본 라벨로 대체합니다 (기본 라벨은 캐시하지 않음).
+    Yields: (cluster_id, label, keywords, status) - status: "cached" | "generated" | "fallback"
+    """
+    pending: list[tuple[int, str, list[str]]] = []
+    for cluster_id, contents in cluster_contents.items():
+        cluster_hash = cache.get_cluster_content_hash(contents)
+        cached_label = cache.get_cached_cluster_label(cluster_hash)
+        if cached_label:
+            yield cluster_id, cached_label[0], cached_label[1], "cached"
+        else:
+            pending.append((cluster_id, cluster_hash, contents))
+    if not pending:
+        return
+
+    provider = _label_provider(provider, api_key)
+    semaphore = asyncio.Semaphore(concurrency or LABEL_CONCURRENCY.get(provider, DEFAULT_LABEL_CONCURRENCY))
+
+    async def generate(
+        cluster_id: int, cluster_hash: str, contents: list[str]
+    ) -> tuple[int, str, list[str], Optional[Exception]]:
         try:
-            if provider == "gemini" and api_key:
-                from .. import gemini_client
-                result = gemini_client.call_json(prompt, '{"label": "", "keywords": []}', api_key, model or None)
-            elif provider == "openai" and api_key:
-                from .. import openai_client
-                result = openai_client.call_json(prompt, '{"label": "", "keywords": []}', api_key, model or None)
-            elif provider == "anthropic" and api_key:
-                from .. import anthropic_client
-                result = anthropic_client.call_json(prompt, '{"label": "", "keywords": []}', api_key, model or None)
-            else:
-                from .. import ollama_client
-                result = ollama_client.call_json(prompt, '{"label": "", "keywords": []}', model or None)
-            
-            label = result.get("label", f"주제 {cluster_id + 1}")
-            keywords = result.get("keywords", [])
-            
-            # 캐시에 저장
+            async with semaphore:
+                result = await asyncio.wait_for(
+                    _request_cluster_label(_cluster_label_prompt(contents), provider, api_key, model),
+                    timeout,
+                )
+            label = result.get("label") if isinstance(result, dict) else None
+            if not isinstance(label, str) or not label:
+                raise ValueError("empty label")
+            keywords = result.get("keywords") or []
             cache.set_cluster_label(cluster_hash, label, keywords)
-            labels[cluster_id] = (label, keywords)
-            generated_count += 1
-            
+            return cluster_id, label, keywords, None
         except Exception as e:
-            logger.warning(f"Failed to generate label for cluster {cluster_id}: {e}")
-            labels[cluster_id] = (f"주제 {cluster_id + 1}", [])
-            generated_count += 1
-    
-    return labels, cached_count, generated_count
+            return cluster_id, "", [], e
+
+    tasks = [asyncio.create_task(generate(*item)) for item in pending]
+    remaining = {cluster_id for cluster_id, _, _ in pending}
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=total_timeout):
+            try:
+                cluster_id, label, keywords, error = await next_done
+            except asyncio.TimeoutError:
+                break
+            remaining.discard(cluster_id)
+            if error is None:
+                yield cluster_id, label, keywords, "generated"
+            else:
+                logger.warning(f"Failed to generate label for cluster {cluster_id}: {error!r}")
+                yield cluster_id, default_cluster_label(cluster_id), [], "fallback"
+
+        if remaining:
+            logger.warning(f"Cluster label generation timed out, using defaults for {len(remaining)} clusters")
+        for cluster_id in sorted(remaining):
+            yield cluster_id, default_cluster_label(cluster_id), [], "fallback"
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 노트 미리보기 & 검색
+# 노트 미리보기
 # ─────────────────────────────────────────────────────────────────────────────
 
 def get_note_preview(content: str, max_length: int = 150) -> str:
     """노트 내용에서 미리보기 텍스트 추출"""
-    # 마크다운 문법 제거
-    text = re.sub(r'^#+\s+', '', content, flags=re.MULTILINE)  # 헤딩
-    text = re.sub(r'!\[.*?\]\(.*?\)', '', text)  # 이미지
-    text = re.sub(r'\[([^\]]+)\]\(.*?\)', r'\1', text)  # 링크
-    text = re.sub(r'[*_~`>]', '', text)  # 강조/인용 등
-    text = re.sub(r'\n{2,}', '\n', text)  # 빈 줄 정리
-    text = text.strip()
-    
-    if len(text) > max_length:
-        return text[:max_length].rsplit(' ', 1)[0] + '…'
-    return text
-
-
-def search_notes_in_graph(notes: list[dict], query: str) -> list[dict]:
-    """노트 목록에서 제목/내용으로 검색"""
-    if not query or not query.strip():
-        return notes
-    
-    query_lower = query.lower().strip()
-    results = []
-    
-    for note in notes:
-        title = note.get("title", "").lower()
-        content = note.get("content", "").lower()
-        path = note.get("path", "").lower()
-        
-        # 매칭 점수 계산
-        score = 0
-        if query_lower in title:
-            score += 3  # 제목 매칭 높은 점수
-        if query_lower in path:
-            score += 2  # 경로 매칭
-        if query_lower in content:
-            score += 1  # 내용 매칭
-        
-        if score > 0:
-            results.append({**note, "_score": score})
-    
-    results.sort(key=lambda x: x["_score"], reverse=True)
-    return results
+    return build_preview(content, max_length)
@@ -10,6 +10,8 @@ from .. import gemini_client
 from .. import ollama_client
 from .. import openai_client
 from .. import anthropic_client
+from .. import llm_cache
+from .. import json_extract
 
 router = APIRouter(prefix="/llm", tags=["llm"])
 
@@ -131,3 +133,27 @@ async def validate_anthropic_key(payload: ValidateApiKeyPayload):
     """Anthropic API 키 유효성 검사"""
     is_valid = anthropic_client.validate_api_key(payload.api_key)
     return {"valid": is_valid}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# LLM 응답 캐시
+# ─────────────────────────────────────────────────────────────────────────────
+
+@router.get("/cache/stats")
+async def get_llm_cache_stats():
+    """LLM 응답 캐시 통계 (적중/실패 횟수, 항목 수, 크기)"""
+    return await llm_cache.stats()
+
+
+@router.get("/json/stats")
+async def get_json_repair_stats():
+    """JSON 응답 처리 통계 (그대로 파싱 / 로컬 복구 / 실패 / 재요청 횟수, 로컬 복구 성공률)"""
+    return json_extract.repair_stats()
+
+
+@router.delete("/cache")
+async def clear_llm_cache():
+    """LLM 응답 캐시 전체 삭제"""
+    removed = await llm_cache.clear()
+    logger.info("LLM cache cleared: %d entries", removed)
+    return {"status": "ok", "removed": removed}
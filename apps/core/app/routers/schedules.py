@@ -8,13 +8,11 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Query
+from sse_starlette.sse import EventSourceResponse
 
 from ..config import logger
-from ..db import get_conn
-from ..ollama_client import call_json as ollama_call_json
-from ..gemini_client import call_json as gemini_call_json
-from ..openai_client import call_json as openai_call_json
-from ..anthropic_client import call_json as anthropic_call_json
+from ..db import fetch_all, fetch_one, execute, execute_many, prefix_range, run_db, transaction
+from .ai import call_json_with_provider, stream_json_with_provider, sse_json
 from ..schemas import (
     ScheduleItem,
     ScheduleCreatePayload,
@@ -51,57 +49,53 @@ async def get_schedules(
     end_date: Optional[str] = Query(default=None, description="끝 날짜 (YYYY-MM-DD)"),
 ):
     """일정 목록을 조회합니다."""
-    conn = get_conn()
-    try:
-        if start_date and end_date:
-            # 날짜 범위 조회 (주간/일간 뷰용)
-            rows = conn.execute(
-                """
-                SELECT id, title, description, date, start_time, end_time,
-                       color, completed, created_at, updated_at
-                FROM schedules
-                WHERE date BETWEEN ? AND ?
-                ORDER BY date ASC, start_time ASC, created_at ASC
-                """,
-                (start_date, end_date),
-            ).fetchall()
-        elif date:
-            # 특정 날짜의 일정
-            rows = conn.execute(
-                """
-                SELECT id, title, description, date, start_time, end_time, 
-                       color, completed, created_at, updated_at
-                FROM schedules
-                WHERE date = ?
-                ORDER BY start_time ASC, created_at ASC
-                """,
-                (date,),
-            ).fetchall()
-        elif month:
-            # 월별 일정
-            rows = conn.execute(
-                """
-                SELECT id, title, description, date, start_time, end_time,
-                       color, completed, created_at, updated_at
-                FROM schedules
-                WHERE date LIKE ?
-                ORDER BY date ASC, start_time ASC
-                """,
-                (f"{month}%",),
-            ).fetchall()
-        else:
-            # 전체 일정
-            rows = conn.execute(
-                """
-                SELECT id, title, description, date, start_time, end_time,
-                       color, completed, created_at, updated_at
-                FROM schedules
-                ORDER BY date DESC, start_time ASC
-                LIMIT 100
-                """
-            ).fetchall()
-    finally:
-        conn.close()
+    if start_date and end_date:
+        # 날짜 범위 조회 (주간/일간 뷰용)
+        rows = await fetch_all(
+            """
+            SELECT id, title, description, date, start_time, end_time,
+                   color, completed, created_at, updated_at
+            FROM schedules
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date ASC, start_time ASC, created_at ASC
+            """,
+            (start_date, end_date),
+        )
+    elif date:
+        # 특정 날짜의 일정
+        rows = await fetch_all(
+            """
+            SELECT id, title, description, date, start_time, end_time, 
+                   color, completed, created_at, updated_at
+            FROM schedules
+            WHERE date = ?
+            ORDER BY start_time ASC, created_at ASC
+            """,
+            (date,),
+        )
+    elif month:
+        # 월별 일정
+        rows = await fetch_all(
+            """
+            SELECT id, title, description, date, start_time, end_time,
+                   color, completed, created_at, updated_at
+            FROM schedules
+            WHERE date >= ? AND date < ?
+            ORDER BY date ASC, start_time ASC
+            """,
+            prefix_range(month),
+        )
+    else:
+        # 전체 일정
+        rows = await fetch_all(
+            """
+            SELECT id, title, description, date, start_time, end_time,
+                   color, completed, created_at, updated_at
+            FROM schedules
+            ORDER BY date DESC, start_time ASC
+            LIMIT 100
+            """
+        )
 
     schedules = [_row_to_schedule(row) for row in rows]
     return {"schedules": schedules}
@@ -112,22 +106,18 @@ async def get_schedule_counts(
     month: str = Query(..., description="월별 조회 (YYYY-MM)"),
 ):
     """월별 날짜별 일정 개수를 조회합니다."""
-    conn = get_conn()
-    try:
-        rows = conn.execute(
-            """
-            SELECT date, 
-                   COUNT(*) as total,
-                   SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END) as completed
-            FROM schedules
-            WHERE date LIKE ?
-            GROUP BY date
-            ORDER BY date ASC
-            """,
-            (f"{month}%",),
-        ).fetchall()
-    finally:
-        conn.close()
+    rows = await fetch_all(
+        """
+        SELECT date, 
+               COUNT(*) as total,
+               SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END) as completed
+        FROM schedules
+        WHERE date >= ? AND date < ?
+        GROUP BY date
+        ORDER BY date ASC
+        """,
+        prefix_range(month),
+    )
 
     counts = [
         {"date": row[0], "count": row[1], "completedCount": row[2]}
@@ -139,19 +129,15 @@ async def get_schedule_counts(
 @router.get("/schedules/{schedule_id}")
 async def get_schedule(schedule_id: str):
     """특정 일정을 조회합니다."""
-    conn = get_conn()
-    try:
-        row = conn.execute(
-            """
-            SELECT id, title, description, date, start_time, end_time,
-                   color, completed, created_at, updated_at
-            FROM schedules
-            WHERE id = ?
-            """,
-            (schedule_id,),
-        ).fetchone()
-    finally:
-        conn.close()
+    row = await fetch_one(
+        """
+        SELECT id, title, description, date, start_time, end_time,
+               color, completed, created_at, updated_at
+        FROM schedules
+        WHERE id = ?
+        """,
+        (schedule_id,),
+    )
 
     if not row:
         raise HTTPException(status_code=404, detail="일정을 찾을 수 없습니다")
@@ -165,28 +151,23 @@ async def create_schedule(payload: ScheduleCreatePayload):
     schedule_id = str(uuid.uuid4())
     now = datetime.now().isoformat()
 
-    conn = get_conn()
-    try:
-        conn.execute(
-            """
-            INSERT INTO schedules (id, title, description, date, start_time, end_time, color, completed, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
-            """,
-            (
-                schedule_id,
-                payload.title,
-                payload.description,
-                payload.date,
-                payload.startTime,
-                payload.endTime,
-                payload.color,
-                now,
-                now,
-            ),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    await execute(
+        """
+        INSERT INTO schedules (id, title, description, date, start_time, end_time, color, completed, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
+        """,
+        (
+            schedule_id,
+            payload.title,
+            payload.description,
+            payload.date,
+            payload.startTime,
+            payload.endTime,
+            payload.color,
+            now,
+            now,
+        ),
+    )
 
     logger.info(f"일정 생성: {schedule_id} - {payload.title}")
 
@@ -206,57 +187,24 @@ async def create_schedule(payload: ScheduleCreatePayload):
     }
 
 
-@router.put("/schedules/{schedule_id}")
-async def update_schedule(schedule_id: str, payload: ScheduleUpdatePayload):
-    """일정을 수정합니다."""
-    conn = get_conn()
-    try:
+def _update_schedule(schedule_id: str, updates: list[str], values: list) -> Optional[tuple]:
+    """일정 수정 후 수정된 행 반환 (없으면 None) - DB 스레드에서 실행"""
+    with transaction() as conn:
         # 기존 일정 확인
         existing = conn.execute(
             "SELECT id FROM schedules WHERE id = ?", (schedule_id,)
         ).fetchone()
         if not existing:
-            raise HTTPException(status_code=404, detail="일정을 찾을 수 없습니다")
-
-        # 업데이트할 필드만 설정
-        updates = []
-        values = []
-        
-        if payload.title is not None:
-            updates.append("title = ?")
-            values.append(payload.title)
-        if payload.description is not None:
-            updates.append("description = ?")
-            values.append(payload.description)
-        if payload.date is not None:
-            updates.append("date = ?")
-            values.append(payload.date)
-        if payload.startTime is not None:
-            updates.append("start_time = ?")
-            values.append(payload.startTime)
-        if payload.endTime is not None:
-            updates.append("end_time = ?")
-            values.append(payload.endTime)
-        if payload.color is not None:
-            updates.append("color = ?")
-            values.append(payload.color)
-        if payload.completed is not None:
-            updates.append("completed = ?")
-            values.append(1 if payload.completed else 0)
+            return None
 
         if updates:
-            updates.append("updated_at = ?")
-            values.append(datetime.now().isoformat())
-            values.append(schedule_id)
-
             conn.execute(
-                f"UPDATE schedules SET {', '.join(updates)} WHERE id = ?",
-                tuple(values),
+                f"UPDATE schedules SET {', '.join(updates)}, updated_at = ? WHERE id = ?",
+                (*values, datetime.now().isoformat(), schedule_id),
             )
-            conn.commit()
 
         # 업데이트된 일정 조회
-        row = conn.execute(
+        return conn.execute(
             """
             SELECT id, title, description, date, start_time, end_time,
                    color, completed, created_at, updated_at
@@ -265,8 +213,40 @@ async def update_schedule(schedule_id: str, payload: ScheduleUpdatePayload):
             """,
             (schedule_id,),
         ).fetchone()
-    finally:
-        conn.close()
+
+
+@router.put("/schedules/{schedule_id}")
+async def update_schedule(schedule_id: str, payload: ScheduleUpdatePayload):
+    """일정을 수정합니다."""
+    # 업데이트할 필드만 설정
+    updates = []
+    values = []
+    
+    if payload.title is not None:
+        updates.append("title = ?")
+        values.append(payload.title)
+    if payload.description is not None:
+        updates.append("description = ?")
+        values.append(payload.description)
+    if payload.date is not None:
+        updates.append("date = ?")
+        values.append(payload.date)
+    if payload.startTime is not None:
+        updates.append("start_time = ?")
+        values.append(payload.startTime)
+    if payload.endTime is not None:
+        updates.append("end_time = ?")
+        values.append(payload.endTime)
+    if payload.color is not None:
+        updates.append("color = ?")
+        values.append(payload.color)
+    if payload.completed is not None:
+        updates.append("completed = ?")
+        values.append(1 if payload.completed else 0)
+
+    row = await run_db(_update_schedule, schedule_id, updates, values)
+    if not row:
+        raise HTTPException(status_code=404, detail="일정을 찾을 수 없습니다")
 
     return {"schedule": _row_to_schedule(row)}
 
@@ -274,26 +254,19 @@ async def update_schedule(schedule_id: str, payload: ScheduleUpdatePayload):
 @router.delete("/schedules/{schedule_id}")
 async def delete_schedule(schedule_id: str):
     """일정을 삭제합니다."""
-    conn = get_conn()
-    try:
-        result = conn.execute(
-            "DELETE FROM schedules WHERE id = ?", (schedule_id,)
-        )
-        conn.commit()
-        
-        if result.rowcount == 0:
-            raise HTTPException(status_code=404, detail="일정을 찾을 수 없습니다")
-    finally:
-        conn.close()
+    deleted = await execute("DELETE FROM schedules WHERE id = ?", (schedule_id,))
+    if deleted == 0:
+        raise HTTPException(status_code=404, detail="일정을 찾을 수 없습니다")
 
     logger.info(f"일정 삭제: {schedule_id}")
     return {"success": True, "message": "일정이 삭제되었습니다"}
 
 
-@router.post("/ai/extract-schedules")
-async def extract_schedules_from_note(payload: AIExtractSchedulePayload):
-    """노트 내용에서 AI로 일정을 추출합니다."""
-    
+EXTRACT_SCHEMA_HINT = "ExtractedSchedules with fields schedules (array of schedule objects) and confidence (float)"
+
+
+def _build_extract_prompt(content: str) -> str:
+    """일정 추출 프롬프트 (상대 날짜 표현을 풀 수 있도록 이번주/다음주 날짜 포함)"""
     # 현재 날짜/요일 정보 계산
     now = datetime.now()
     today_str = now.strftime('%Y-%m-%d')
@@ -324,7 +297,7 @@ async def extract_schedules_from_note(payload: AIExtractSchedulePayload):
     prompt = f"""당신은 일정 추출 전문가입니다. 아래 텍스트에서 모든 일정, 약속, 할 일, 마감일을 찾아 추출하세요.
 
 ## 분석할 텍스트:
-{payload.content}
+{content}
 
 ## 현재 날짜 정보:
 - 오늘: {today_str} ({today_weekday})
@@ -359,14 +332,35 @@ async def extract_schedules_from_note(payload: AIExtractSchedulePayload):
 }}
 
 JSON만 출력하세요:"""
+    return prompt
+
+
+def _normalize_schedule(schedule: dict) -> dict:
+    """추출된 일정에 ID/기본값 부여 및 필드명 정규화"""
+    schedule["id"] = str(uuid.uuid4())
+    schedule["color"] = "#c9a76c"
+    schedule["completed"] = False
+    schedule["createdAt"] = ""
+    schedule["updatedAt"] = ""
+    # 필드명 정규화
+    if "startTime" not in schedule:
+        schedule["startTime"] = schedule.pop("start_time", "")
+    if "endTime" not in schedule:
+        schedule["endTime"] = schedule.pop("end_time", "")
+    return schedule
+
 
-    schema_hint = "ExtractedSchedules with fields schedules (array of schedule objects) and confidence (float)"
+@router.post("/ai/extract-schedules")
+async def extract_schedules_from_note(payload: AIExtractSchedulePayload):
+    """노트 내용에서 AI로 일정을 추출합니다."""
+    prompt = _build_extract_prompt(payload.content)
+    schema_hint = EXTRACT_SCHEMA_HINT
 
     # ===== 디버깅 로그 =====
     logger.info("=" * 60)
     logger.info("[AI 일정 추출] 디버깅 시작")
     logger.info("=" * 60)
-    logger.info(f"오늘 날짜: {today_str} ({today_weekday})")
+    logger.info(f"오늘 날짜: {datetime.now().strftime('%Y-%m-%d')}")
     logger.info(f"Provider: {payload.provider}")
     logger.info(f"Model: {payload.model or '기본값'}")
     logger.info(f"API Key: {'있음' if payload.api_key else '없음'}")
@@ -379,33 +373,15 @@ JSON만 출력하세요:"""
     logger.info("=" * 60)
 
     try:
-        if payload.provider == "gemini" and payload.api_key:
-            logger.info("Gemini API 호출 중...")
-            result = gemini_call_json(
-                prompt,
-                schema_hint,
-                api_key=payload.api_key,
-                model=payload.model or None
-            )
-        elif payload.provider == "openai" and payload.api_key:
-            logger.info("OpenAI API 호출 중...")
-            result = openai_call_json(
-                prompt,
-                schema_hint,
-                api_key=payload.api_key,
-                model=payload.model or None
-            )
-        elif payload.provider == "anthropic" and payload.api_key:
-            logger.info("Anthropic API 호출 중...")
-            result = anthropic_call_json(
-                prompt,
-                schema_hint,
-                api_key=payload.api_key,
-                model=payload.model or None
-            )
-        else:
-            logger.info("Ollama API 호출 중...")
-            result = ollama_call_json(prompt, schema_hint, model=payload.model or None)
+        logger.info(f"{payload.provider} API 호출 중...")
+        result = await call_json_with_provider(
+            prompt,
+            schema_hint,
+            provider=payload.provider,
+            api_key=payload.api_key,
+            model=payload.model or None,
+            use_cache=not payload.no_cache
+        )
 
         # ===== 결과 디버깅 =====
         logger.info("=" * 60)
@@ -420,17 +396,7 @@ JSON만 출력하세요:"""
         logger.info(f"추출된 일정 개수: {len(schedules)}개")
         
         for i, schedule in enumerate(schedules):
-            schedule["id"] = str(uuid.uuid4())
-            schedule["color"] = "#c9a76c"
-            schedule["completed"] = False
-            schedule["createdAt"] = ""
-            schedule["updatedAt"] = ""
-            # 필드명 정규화
-            if "startTime" not in schedule:
-                schedule["startTime"] = schedule.pop("start_time", "")
-            if "endTime" not in schedule:
-                schedule["endTime"] = schedule.pop("end_time", "")
-            
+            _normalize_schedule(schedule)
             logger.info(f"  [{i+1}] {schedule.get('title', '?')} - {schedule.get('date', '?')} {schedule.get('startTime', '')}")
 
         final_result = {
@@ -456,48 +422,85 @@ JSON만 출력하세요:"""
         return {"schedules": [], "confidence": 0.0, "error": str(e)}
 
 
+@router.post("/ai/extract-schedules/stream")
+async def extract_schedules_stream(payload: AIExtractSchedulePayload):
+    """
+    노트 내용에서 AI로 일정을 추출합니다. (SSE)
+    JSON 응답을 스트리밍으로 파싱하여 일정이 하나 완성될 때마다 전송합니다.
+    이벤트: schedule(일정 하나), result({schedules, confidence}), done, error
+    """
+    prompt = _build_extract_prompt(payload.content)
+
+    async def event_generator():
+        emitted: list[dict] = []
+        try:
+            async for path, value in stream_json_with_provider(
+                prompt,
+                EXTRACT_SCHEMA_HINT,
+                [("schedules", "*")],
+                provider=payload.provider,
+                api_key=payload.api_key,
+                model=payload.model or None,
+                use_cache=not payload.no_cache
+            ):
+                if path:
+                    if isinstance(value, dict):
+                        # 캐시된 응답을 다시 쓰므로 원본 대신 복사본에 ID 부여
+                        schedule = _normalize_schedule(dict(value))
+                        emitted.append(schedule)
+                        yield sse_json("schedule", schedule)
+                    continue
+
+                result = value if isinstance(value, dict) else {}
+                # 이미 보낸 일정은 같은 ID로 최종 결과에 포함
+                schedules = [
+                    emitted[i] if i < len(emitted) else _normalize_schedule(dict(schedule))
+                    for i, schedule in enumerate(result.get("schedules", []))
+                    if isinstance(schedule, dict)
+                ]
+                logger.info(f"AI 일정 추출 (스트리밍): {len(schedules)}개")
+                yield sse_json("result", {
+                    "schedules": schedules,
+                    "confidence": result.get("confidence", 0.5)
+                })
+            yield {"event": "done", "data": ""}
+        except Exception as e:
+            logger.error(f"일정 추출 스트리밍 실패: {e}")
+            yield {"event": "error", "data": str(e)}
+
+    return EventSourceResponse(event_generator())
+
+
 @router.post("/schedules/batch")
 async def create_schedules_batch(schedules: list[ScheduleCreatePayload]):
     """여러 일정을 한 번에 생성합니다."""
     created = []
     now = datetime.now().isoformat()
 
-    conn = get_conn()
-    try:
-        for payload in schedules:
-            schedule_id = str(uuid.uuid4())
-            conn.execute(
-                """
-                INSERT INTO schedules (id, title, description, date, start_time, end_time, color, completed, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
-                """,
-                (
-                    schedule_id,
-                    payload.title,
-                    payload.description,
-                    payload.date,
-                    payload.startTime,
-                    payload.endTime,
-                    payload.color,
-                    now,
-                    now,
-                ),
-            )
-            created.append({
-                "id": schedule_id,
-                "title": payload.title,
-                "description": payload.description,
-                "date": payload.date,
-                "startTime": payload.startTime,
-                "endTime": payload.endTime,
-                "color": payload.color,
-                "completed": False,
-                "createdAt": now,
-                "updatedAt": now,
-            })
-        conn.commit()
-    finally:
-        conn.close()
+    for payload in schedules:
+        created.append({
+            "id": str(uuid.uuid4()),
+            "title": payload.title,
+            "description": payload.description,
+            "date": payload.date,
+            "startTime": payload.startTime,
+            "endTime": payload.endTime,
+            "color": payload.color,
+            "completed": False,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+
+    await execute_many(
+        """
+        INSERT INTO schedules (id, title, description, date, start_time, end_time, color, completed, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
+        """,
+        [
+            (item["id"], item["title"], item["description"], item["date"], item["startTime"], item["endTime"], item["color"], now, now)
+            for item in created
+        ],
+    )
 
     logger.info(f"{len(created)}개 일정 일괄 생성")
     return {"schedules": created}
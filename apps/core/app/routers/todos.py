@@ -8,7 +8,7 @@ from typing import Optional
 from fastapi import APIRouter, Query
 
 from ..config import logger
-from ..db import get_conn
+from ..db import fetch_all
 from ..ollama_client import call_json
 from ..schemas import TodoItem
 
@@ -18,28 +18,24 @@ router = APIRouter(tags=["todos"])
 @router.get("/todos")
 async def get_todos(checked: Optional[bool] = Query(default=None)):
     """TODO 항목을 조회합니다."""
-    conn = get_conn()
-    try:
-        if checked is None:
-            rows = conn.execute(
-                """
-                SELECT id, note_path, line_no, text, checked
-                FROM todos
-                ORDER BY updated_at DESC
-                """
-            ).fetchall()
-        else:
-            rows = conn.execute(
-                """
-                SELECT id, note_path, line_no, text, checked
-                FROM todos
-                WHERE checked = ?
-                ORDER BY updated_at DESC
-                """,
-                (1 if checked else 0,),
-            ).fetchall()
-    finally:
-        conn.close()
+    if checked is None:
+        rows = await fetch_all(
+            """
+            SELECT id, note_path, line_no, text, checked
+            FROM todos
+            ORDER BY updated_at DESC
+            """
+        )
+    else:
+        rows = await fetch_all(
+            """
+            SELECT id, note_path, line_no, text, checked
+            FROM todos
+            WHERE checked = ?
+            ORDER BY updated_at DESC
+            """,
+            (1 if checked else 0,),
+        )
 
     todos = [
         TodoItem(
@@ -57,19 +53,15 @@ async def get_todos(checked: Optional[bool] = Query(default=None)):
 @router.post("/ai/today-plan")
 async def today_plan():
     """AI를 사용하여 오늘의 계획을 생성합니다."""
-    conn = get_conn()
-    try:
-        rows = conn.execute(
-            """
-            SELECT id, note_path, line_no, text, checked
-            FROM todos
-            WHERE checked = 0
-            ORDER BY updated_at DESC
-            LIMIT 50
-            """
-        ).fetchall()
-    finally:
-        conn.close()
+    rows = await fetch_all(
+        """
+        SELECT id, note_path, line_no, text, checked
+        FROM todos
+        WHERE checked = 0
+        ORDER BY updated_at DESC
+        LIMIT 50
+        """
+    )
 
     todos = [
         {
@@ -109,5 +101,5 @@ async def today_plan():
     )
     schema_hint = "TodayPlan with fields tldr, overdue, dueSoon, nextActions, quickWins"
     # model=None이면 설정된 기본 모델 사용
-    plan = call_json(prompt, schema_hint, model=None)
+    plan = await call_json(prompt, schema_hint, model=None)
     return plan
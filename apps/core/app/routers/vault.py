@@ -2,10 +2,9 @@
 CueNote Core - Vault 라우터
 파일 CRUD 및 휴지통 관리
 """
-import hashlib
 import uuid
 import base64
-import json
+import threading
 import re
 from typing import Optional
 from pathlib import Path
@@ -14,107 +13,23 @@ from datetime import datetime
 from fastapi import APIRouter, HTTPException, Query, UploadFile, File
 from fastapi.responses import FileResponse
 
-from ..config import VAULT_PATH, TRASH_PATH, TODO_PATTERN, logger, PROJECT_ROOT, DATA_DIR
-from ..db import get_conn
+from ..config import logger
+from ..db import execute, execute_many, fetch_one, run_db, transaction
+from .. import note_index
+from ..vault_context import get_current_vault_path, get_trash_path, get_img_path
+from ..todo_index import reindex_note_todos, reindex_todos_for_edits
 from pydantic import BaseModel as PydanticBaseModel
 
 from ..schemas import (
-    VaultOpenPayload, VaultFilePayload,
+    VaultOpenPayload, VaultFilePayload, VaultFilePatchPayload,
     RenameFilePayload, RestoreFilePayload, PermanentDeletePayload,
-    TodoItem, ImageUploadPayload
+    ImageUploadPayload
 )
 
 router = APIRouter(prefix="/vault", tags=["vault"])
 
-# 환경 설정 파일 경로
-ENV_CONFIG_PATH = DATA_DIR / "environments.json"
-
-
-def get_git_repos_dir() -> Path:
-    """Git 리포지토리 저장 디렉토리 반환 (github.py와 동일)"""
-    import os
-    import sys
-    if os.name == 'nt':
-        base = Path(os.environ.get('APPDATA', '')) / 'cuenote'
-    elif os.name == 'posix':
-        if 'darwin' in sys.platform:
-            base = Path.home() / 'Library' / 'Application Support' / 'cuenote'
-        else:
-            base = Path.home() / '.local' / 'share' / 'cuenote'
-    else:
-        base = Path.home() / '.cuenote'
-    
-    return base / 'git-repos'
-
-
-def get_current_vault_path() -> Path:
-    """현재 선택된 환경의 Vault 경로 반환"""
-    if not ENV_CONFIG_PATH.exists():
-        return VAULT_PATH
-    
-    try:
-        data = json.loads(ENV_CONFIG_PATH.read_text(encoding="utf-8"))
-        current_id = data.get("current_id")
-        if not current_id:
-            return VAULT_PATH
-        
-        for env in data.get("environments", []):
-            if env.get("id") == current_id:
-                env_type = env.get("type", "local")
-                
-                # GitHub 환경인 경우 실제 클론 경로 반환
-                if env_type == "github":
-                    github_info = env.get("github", {})
-                    owner = github_info.get("owner")
-                    repo = github_info.get("repo")
-                    if owner and repo:
-                        git_path = get_git_repos_dir() / f"{owner}_{repo}"
-                        if git_path.exists():
-                            return git_path
-                    return VAULT_PATH
-                
-                # 로컬 환경
-                env_path = Path(env.get("path", ""))
-                if env_path.exists():
-                    return env_path
-        
-        return VAULT_PATH
-    except Exception as e:
-        logger.error("Failed to get current vault path: %s", e)
-        return VAULT_PATH
-
-
-def get_trash_path() -> Path:
-    """현재 Vault의 휴지통 경로 반환"""
-    return get_current_vault_path() / ".trash"
-
-
-def get_img_path() -> Path:
-    """현재 Vault의 이미지 저장 경로 반환"""
-    return get_current_vault_path() / "img"
-
-
-def parse_todos(note_path: str, content: str) -> list[TodoItem]:
-    """노트에서 TODO 항목을 파싱"""
-    todos: list[TodoItem] = []
-    for index, line in enumerate(content.splitlines(), start=1):
-        match = TODO_PATTERN.match(line)
-        if not match:
-            continue
-        checked = match.group("checked").lower() == "x"
-        text = match.group("text").strip()
-        raw_id = f"{note_path}:{index}:{text}"
-        todo_id = hashlib.sha1(raw_id.encode("utf-8")).hexdigest()
-        todos.append(
-            TodoItem(
-                id=todo_id,
-                text=text,
-                checked=checked,
-                notePath=note_path,
-                lineNo=index,
-            )
-        )
-    return todos
+# 부분 저장의 기준 해시 확인 ~ 쓰기를 원자적으로 수행
+_patch_lock = threading.Lock()
 
 
 @router.post("/open")
@@ -142,18 +57,8 @@ async def list_vault_files():
     if not vault_path.exists():
         vault_path.mkdir(parents=True, exist_ok=True)
     
-    files: list[str] = []
-    for md_file in vault_path.rglob("*.md"):
-        rel_path = md_file.relative_to(vault_path)
-        rel_path_str = str(rel_path).replace("\\", "/")
-        
-        # .trash 폴더 내의 파일은 제외
-        if rel_path_str.startswith(".trash/") or "/.trash/" in rel_path_str:
-            continue
-        
-        files.append(rel_path_str)
-    
-    files.sort()
+    # 노트 인덱스에서 조회 (.trash 폴더는 인덱싱되지 않음)
+    files = await run_db(note_index.list_paths, vault_path)
     logger.info("Found %d markdown files in vault", len(files))
     return {"files": files}
 
@@ -177,12 +82,23 @@ async def get_vault_file(path: str = Query(..., description="Relative path to fi
     try:
         content = file_path.read_text(encoding="utf-8")
         logger.info("Read file: %s", safe_path)
-        return {"path": safe_path, "content": content}
+        return {"path": safe_path, "content": content, "hash": note_index.get_content_hash(content)}
     except Exception as e:
         logger.error("Failed to read file %s: %s", safe_path, e)
         raise HTTPException(status_code=500, detail="Failed to read file")
 
 
+def _save_note(vault_path: Path, rel_path: str, content: str) -> bool:
+    """전체 내용 저장 (DB 스레드에서 실행, 부분 저장의 해시 확인 ~ 쓰기와 겹치지 않도록 같은 잠금 사용)"""
+    with _patch_lock:
+        return note_index.save_note(vault_path, rel_path, content)
+
+
+def _reindex_todos(note_path: str, content: str) -> int:
+    with transaction() as conn:
+        return reindex_note_todos(conn, note_path, content)
+
+
 @router.put("/file")
 async def put_vault_file(payload: VaultFilePayload):
     """Vault 내의 마크다운 파일을 저장하고, TODO를 인덱싱합니다."""
@@ -191,34 +107,75 @@ async def put_vault_file(payload: VaultFilePayload):
     if ".." in safe_path or safe_path.startswith("/"):
         raise HTTPException(status_code=400, detail="Invalid path")
     
-    file_path = vault_path / safe_path
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    
     try:
-        file_path.write_text(payload.content, encoding="utf-8")
-        logger.info("Saved file: %s", safe_path)
+        # 저장된 해시와 같으면 디스크 쓰기 생략, 다르면 임시 파일 + rename으로 저장
+        written = await run_db(_save_note, vault_path, safe_path, payload.content)
     except Exception as e:
         logger.error("Failed to save file %s: %s", safe_path, e)
         raise HTTPException(status_code=500, detail="Failed to save file")
     
+    content_hash = note_index.get_content_hash(payload.content)
+    if not written:
+        row = await fetch_one("SELECT COUNT(*) FROM todos WHERE note_path = ?", (safe_path,))
+        return {"status": "ok", "todoCount": row[0] if row else 0, "hash": content_hash, "unchanged": True}
+    logger.info("Saved file: %s", safe_path)
+    
     # TODO 파싱 및 인덱싱
-    todos = parse_todos(safe_path, payload.content)
-    conn = get_conn()
+    todo_count = await run_db(_reindex_todos, safe_path, payload.content)
+    
+    logger.info("Indexed %s todos for %s", todo_count, safe_path)
+    return {"status": "ok", "todoCount": todo_count, "hash": content_hash}
+
+
+def _patch_note(vault_path: Path, rel_path: str, base_hash: str, edits: list[tuple[int, int, str]]) -> dict:
+    """기준 해시 확인 후 편집 적용, 저장, 편집 범위의 TODO만 갱신 (DB 스레드에서 실행)"""
+    file_path = vault_path / rel_path
+    with _patch_lock:
+        content = file_path.read_text(encoding="utf-8")
+        current_hash = note_index.get_content_hash(content)
+        if current_hash != base_hash:
+            return {"conflict": True, "hash": current_hash}
+
+        new_content, changes = note_index.apply_text_edits(content, edits)
+        if new_content == content:
+            return {"hash": current_hash, "todoCount": None}
+        note_index.write_atomic(file_path, new_content)
+        note_index.update_note(vault_path, rel_path, new_content)
+    with transaction() as conn:
+        todo_count = reindex_todos_for_edits(conn, rel_path, new_content, changes)
+    return {"hash": note_index.get_content_hash(new_content), "todoCount": todo_count}
+
+
+@router.patch("/file")
+async def patch_vault_file(payload: VaultFilePatchPayload):
+    """
+    편집 목록으로 마크다운 파일을 부분 저장합니다.
+    baseHash가 현재 파일 내용의 해시와 다르면 409를 반환하며, 이때는 전체 내용으로 다시 저장해야 합니다.
+    """
+    vault_path = get_current_vault_path()
+    safe_path = Path(payload.path).as_posix()
+    if ".." in safe_path or safe_path.startswith("/"):
+        raise HTTPException(status_code=400, detail="Invalid path")
+    if not (vault_path / safe_path).is_file():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    edits = [(edit.offset, edit.delete, edit.insert) for edit in payload.edits]
     try:
-        conn.execute("DELETE FROM todos WHERE note_path = ?", (safe_path,))
-        conn.executemany(
-            """
-            INSERT INTO todos (id, note_path, line_no, text, checked, updated_at)
-            VALUES (?, ?, ?, ?, ?, datetime('now'))
-            """,
-            [(todo.id, todo.notePath, todo.lineNo, todo.text, 1 if todo.checked else 0) for todo in todos],
-        )
-        conn.commit()
-    finally:
-        conn.close()
-    
-    logger.info("Indexed %s todos for %s", len(todos), safe_path)
-    return {"status": "ok", "todoCount": len(todos)}
+        result = await run_db(_patch_note, vault_path, safe_path, payload.baseHash, edits)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid edits: {e}")
+    except Exception as e:
+        logger.error("Failed to patch file %s: %s", safe_path, e)
+        raise HTTPException(status_code=500, detail="Failed to save file")
+    
+    if result.get("conflict"):
+        raise HTTPException(status_code=409, detail={"message": "File changed on disk", "hash": result["hash"]})
+    if result["todoCount"] is None:
+        row = await fetch_one("SELECT COUNT(*) FROM todos WHERE note_path = ?", (safe_path,))
+        return {"status": "ok", "todoCount": row[0] if row else 0, "hash": result["hash"], "unchanged": True}
+    
+    logger.info("Patched file: %s (%d edits)", safe_path, len(edits))
+    return {"status": "ok", "todoCount": result["todoCount"], "hash": result["hash"]}
 
 
 @router.post("/file")
@@ -239,6 +196,7 @@ async def create_vault_file():
         title = filename.replace('.md', '')
         default_content = f"# {title}\n\n"
         file_path.write_text(default_content, encoding="utf-8")
+        await run_db(note_index.update_note, vault_path, filename, default_content)
         logger.info("Created file: %s", filename)
         return {"status": "ok", "path": filename}
     except Exception as e:
@@ -275,14 +233,8 @@ async def rename_vault_file(payload: RenameFilePayload):
     new_file_path.parent.mkdir(parents=True, exist_ok=True)
     
     try:
-        conn = get_conn()
-        try:
-            conn.execute("UPDATE todos SET note_path = ? WHERE note_path = ?", (new_safe_path, old_safe_path))
-            conn.commit()
-        finally:
-            conn.close()
-        
         old_file_path.rename(new_file_path)
+        await run_db(note_index.rename_note, vault_path, old_safe_path, new_safe_path)
         logger.info("Renamed file: %s -> %s", old_safe_path, new_safe_path)
         return {"status": "ok", "old_path": old_safe_path, "new_path": new_safe_path}
     except Exception as e:
@@ -316,21 +268,8 @@ async def rename_vault_folder(payload: RenameFilePayload):
     new_folder_path.parent.mkdir(parents=True, exist_ok=True)
     
     try:
-        # DB의 모든 관련 경로 업데이트
-        conn = get_conn()
-        try:
-            # 해당 폴더 하위의 모든 파일 경로 업데이트
-            cursor = conn.execute("SELECT note_path FROM todos WHERE note_path LIKE ?", (old_safe_path + "/%",))
-            rows = cursor.fetchall()
-            for row in rows:
-                old_note_path = row[0]
-                new_note_path = new_safe_path + old_note_path[len(old_safe_path):]
-                conn.execute("UPDATE todos SET note_path = ? WHERE note_path = ?", (new_note_path, old_note_path))
-            conn.commit()
-        finally:
-            conn.close()
-        
         old_folder_path.rename(new_folder_path)
+        await run_db(note_index.rename_folder, vault_path, old_safe_path, new_safe_path)
         logger.info("Renamed folder: %s -> %s", old_safe_path, new_safe_path)
         return {"status": "ok", "old_path": old_safe_path, "new_path": new_safe_path}
     except Exception as e:
@@ -355,12 +294,7 @@ async def delete_vault_file(path: str = Query(..., description="Relative path to
         raise HTTPException(status_code=400, detail="Not a file")
     
     try:
-        conn = get_conn()
-        try:
-            conn.execute("DELETE FROM todos WHERE note_path = ?", (safe_path,))
-            conn.commit()
-        finally:
-            conn.close()
+        await execute("DELETE FROM todos WHERE note_path = ?", (safe_path,))
         
         trash_path.mkdir(parents=True, exist_ok=True)
         
@@ -371,6 +305,7 @@ async def delete_vault_file(path: str = Query(..., description="Relative path to
             trash_file = trash_path / f"{file_path.stem}_{counter}{file_path.suffix}"
         
         file_path.rename(trash_file)
+        await run_db(note_index.remove_note, vault_path, safe_path)
         logger.info("Moved to trash: %s -> %s", safe_path, trash_file.name)
         return {"status": "ok", "path": safe_path}
     except Exception as e:
@@ -417,6 +352,7 @@ async def restore_from_trash(payload: RestoreFilePayload):
     
     try:
         trash_file.rename(restore_path)
+        await run_db(note_index.update_note, vault_path, restore_name)
         logger.info("Restored from trash: %s -> %s", filename, restore_name)
         return {"status": "ok", "path": restore_name}
     except Exception as e:
@@ -680,6 +616,7 @@ async def delete_folder(path: str = Query(..., description="Relative path to fol
         
         # 폴더 내 md 파일들을 휴지통으로 이동
         moved_files = []
+        moved_paths = []
         for md_file in folder_path.rglob("*.md"):
             trash_file = trash_path / md_file.name
             counter = 0
@@ -688,19 +625,15 @@ async def delete_folder(path: str = Query(..., description="Relative path to fol
                 trash_file = trash_path / f"{md_file.stem}_{counter}{md_file.suffix}"
             md_file.rename(trash_file)
             moved_files.append(md_file.name)
-            
-            # TODO 데이터베이스에서 삭제
-            rel_md_path = str(md_file.relative_to(vault_path)).replace("\\", "/")
-            conn = get_conn()
-            try:
-                conn.execute("DELETE FROM todos WHERE note_path = ?", (rel_md_path,))
-                conn.commit()
-            finally:
-                conn.close()
+            moved_paths.append((str(md_file.relative_to(vault_path)).replace("\\", "/"),))
+        
+        # TODO 데이터베이스에서 삭제 (한 트랜잭션)
+        await execute_many("DELETE FROM todos WHERE note_path = ?", moved_paths)
         
         # 빈 폴더 삭제 (하위 폴더 포함)
         import shutil
         shutil.rmtree(folder_path)
+        await run_db(note_index.remove_folder, vault_path, safe_path)
         
         logger.info("Deleted folder: %s, moved %d files to trash", safe_path, len(moved_files))
         return {"status": "ok", "path": safe_path, "moved_files": moved_files}
@@ -731,6 +664,7 @@ async def create_file_in_folder(path: str = Query(..., description="Relative pat
         title = file_path.stem
         default_content = f"# {title}\n\n"
         file_path.write_text(default_content, encoding="utf-8")
+        await run_db(note_index.update_note, vault_path, safe_path, default_content)
         
         logger.info("Created file: %s", safe_path)
         return {"status": "ok", "path": safe_path}
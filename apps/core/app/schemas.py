@@ -18,6 +18,19 @@ class VaultFilePayload(BaseModel):
     content: str
 
 
+class TextEdit(BaseModel):
+    """원본 기준 텍스트 편집 (오프셋/길이는 UTF-16 코드 단위 - JS 문자열 인덱스와 동일)"""
+    offset: int = Field(ge=0)
+    delete: int = Field(default=0, ge=0)
+    insert: str = ""
+
+
+class VaultFilePatchPayload(BaseModel):
+    path: str
+    baseHash: str
+    edits: list[TextEdit]
+
+
 class DeleteFilePayload(BaseModel):
     path: str
 
@@ -73,6 +86,7 @@ class SummarizePayload(BaseModel):
     provider: str = Field(default="ollama", description="LLM 제공자 (ollama, gemini)")
     api_key: str = Field(default="", description="Gemini API 키 (gemini 선택 시)")
     model: str = Field(default="", description="사용할 모델명")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 class SummarizeResponse(BaseModel):
@@ -88,6 +102,7 @@ class TranslatePayload(BaseModel):
     provider: str = Field(default="ollama", description="LLM 제공자 (ollama, gemini)")
     api_key: str = Field(default="", description="Gemini API 키 (gemini 선택 시)")
     model: str = Field(default="", description="사용할 모델명")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 class TranslateResponse(BaseModel):
@@ -103,6 +118,7 @@ class ImprovePayload(BaseModel):
     provider: str = Field(default="ollama", description="LLM 제공자 (ollama, gemini)")
     api_key: str = Field(default="", description="Gemini API 키 (gemini 선택 시)")
     model: str = Field(default="", description="사용할 모델명")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 class ImproveResponse(BaseModel):
@@ -117,6 +133,7 @@ class ExpandPayload(BaseModel):
     provider: str = Field(default="ollama", description="LLM 제공자 (ollama, gemini)")
     api_key: str = Field(default="", description="Gemini API 키 (gemini 선택 시)")
     model: str = Field(default="", description="사용할 모델명")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 class ExpandResponse(BaseModel):
@@ -130,6 +147,7 @@ class ShortenPayload(BaseModel):
     provider: str = Field(default="ollama", description="LLM 제공자 (ollama, gemini)")
     api_key: str = Field(default="", description="Gemini API 키 (gemini 선택 시)")
     model: str = Field(default="", description="사용할 모델명")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 class ShortenResponse(BaseModel):
@@ -143,6 +161,7 @@ class ProofreadPayload(BaseModel):
     provider: str = Field(default="ollama", description="LLM 제공자 (ollama, gemini)")
     api_key: str = Field(default="", description="Gemini API 키 (gemini 선택 시)")
     model: str = Field(default="", description="사용할 모델명")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 class CorrectionItem(BaseModel):
@@ -320,6 +339,7 @@ class AIExtractSchedulePayload(BaseModel):
     provider: str = Field(default="ollama", description="LLM 제공자")
     api_key: str = Field(default="", description="API 키")
     model: str = Field(default="", description="모델명")
+    no_cache: bool = Field(default=False, description="LLM 응답 캐시를 사용하지 않음")
 
 
 class AIExtractScheduleResponse(BaseModel):
@@ -377,6 +397,10 @@ class GraphDataPayload(BaseModel):
     model: str = Field(default="", description="사용할 모델명")
     minSimilarity: float = Field(default=0.3, description="최소 유사도 (0-1)")
     maxClusters: int = Field(default=8, description="최대 클러스터 수")
+    topK: int = Field(default=10, ge=1, le=50, description="노드당 최대 유사도 엣지 수")
+    embeddingBackend: str = Field(default="tfidf", description="임베딩 백엔드 (tfidf, ollama, onnx)")
+    embeddingModel: str = Field(default="", description="임베딩 모델명 (비우면 백엔드 기본값)")
+    labelConcurrency: int = Field(default=0, ge=0, le=16, description="클러스터 라벨 동시 생성 수 (0: 제공자 기본값)")
 
 
 class GraphDataResponse(BaseModel):
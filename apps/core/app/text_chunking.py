@@ -0,0 +1,182 @@
+"""
+CueNote Core - 긴 텍스트 청크 분할 / 맵-리듀스
+모델 입력 한도를 넘는 노트·문서를 자르지 않고 마크다운 제목/문단 경계로 나누어 처리합니다.
+
+청크 경계는 내용으로 정해집니다(제목 또는 문단 해시가 절단점). 그래서 긴 노트의 한 부분을
+고쳐도 앞뒤 청크는 그대로 유지되고, 청크 단위 LLM 응답 캐시(llm_cache, 키 = 프롬프트+청크 해시)가
+바뀐 청크에만 빗나갑니다.
+"""
+import asyncio
+import re
+import zlib
+from typing import Awaitable, Callable, TypeVar
+
+from .config import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# 청크 동시 처리 수 (http_transport의 제공자별 동시성 제한도 함께 적용)
+MAP_CONCURRENCY = 3
+
+# 청크가 최대 길이의 이 비율을 넘은 뒤에만 내용 기반 절단점에서 자름
+MIN_CHUNK_RATIO = 0.25
+
+# 문단 해시 % CUT_MODULUS == 0 인 문단 뒤를 절단점으로 사용 (평균 8문단마다)
+CUT_MODULUS = 8
+
+# 계층적 리듀스 최대 단계 수
+MAX_REDUCE_DEPTH = 4
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 분할
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _split_blocks(text: str) -> list[tuple[str, int]]:
+    """
+    제목 줄과 빈 줄 경계로 블록(문단) 분할 (코드 블록 내부는 나누지 않음)
+    Returns: [(블록 텍스트, 제목 레벨 또는 0)] - 이어 붙이면 원문과 같음
+    """
+    blocks: list[tuple[str, int]] = []
+    current: list[str] = []
+    level = 0
+    in_fence = False
+    prev_blank = False
+
+    def flush():
+        if current:
+            blocks.append(("".join(current), level))
+            current.clear()
+
+    for line in text.splitlines(keepends=True):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            heading = HEADING_PATTERN.match(line)
+            if heading:
+                flush()
+                level = len(heading.group(1))
+            elif prev_blank and line.strip():
+                flush()
+                level = 0
+        current.append(line)
+        prev_blank = not in_fence and not line.strip()
+    flush()
+    return blocks
+
+
+def _hard_split(block: str, max_chars: int) -> list[str]:
+    """최대 길이보다 긴 블록을 줄/문장 경계로 분할"""
+    pieces: list[str] = []
+    while len(block) > max_chars:
+        window = block[:max_chars]
+        cut = max(window.rfind("\n"), window.rfind(". "), window.rfind("。"), window.rfind("? "), window.rfind("! "))
+        if cut < max_chars * 0.5:
+            cut = max_chars - 1
+        pieces.append(block[:cut + 1])
+        block = block[cut + 1:]
+    if block:
+        pieces.append(block)
+    return pieces
+
+
+def _is_cut_point(block: str) -> bool:
+    return zlib.crc32(block.encode("utf-8")) % CUT_MODULUS == 0
+
+
+def split_markdown(text: str, max_chars: int) -> list[str]:
+    """
+    마크다운 텍스트를 max_chars 이하 청크로 분할 (이어 붙이면 원문과 같음)
+    최소 길이를 넘긴 청크는 다음 경우에 닫습니다.
+      - 다음 블록이 최상위(#, ##) 제목
+      - 방금 넣은 문단이 내용 기반 절단점
+      - 다음 블록을 넣으면 최대 길이 초과
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    min_chars = int(max_chars * MIN_CHUNK_RATIO)
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+
+    for block, level in _split_blocks(text):
+        pieces = _hard_split(block, max_chars) if len(block) > max_chars else [block]
+        for i, piece in enumerate(pieces):
+            if current and (
+                size + len(piece) > max_chars
+                or (size >= min_chars and 0 < level <= 2 and i == 0)
+            ):
+                chunks.append("".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece)
+            if size >= min_chars and _is_cut_point(piece):
+                chunks.append("".join(current))
+                current, size = [], 0
+
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def pack(parts: list[str], max_chars: int, separator: str = "\n\n") -> list[str]:
+    """짧은 조각들을 순서대로 max_chars 이하 묶음으로 합침"""
+    groups: list[str] = []
+    current: list[str] = []
+    size = 0
+    for part in parts:
+        added = len(part) + (len(separator) if current else 0)
+        if current and size + added > max_chars:
+            groups.append(separator.join(current))
+            current, size = [], 0
+            added = len(part)
+        current.append(part)
+        size += added
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 맵 / 리듀스
+# ─────────────────────────────────────────────────────────────────────────────
+
+async def map_bounded(
+    items: list[T],
+    fn: Callable[[T], Awaitable[R]],
+    concurrency: int = MAP_CONCURRENCY
+) -> list[R]:
+    """항목마다 fn을 제한된 동시성으로 실행 (결과는 입력 순서)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await fn(item)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+async def reduce_hierarchically(
+    parts: list[str],
+    combine: Callable[[str], Awaitable[str]],
+    max_chars: int
+) -> str:
+    """
+    부분 결과들을 max_chars 이하 묶음으로 합쳐 combine으로 줄이는 과정을 반복
+    한 묶음에 들어갈 때까지 줄인 텍스트를 반환합니다 (최종 생성은 호출자가 수행).
+    """
+    for depth in range(MAX_REDUCE_DEPTH):
+        groups = pack(parts, max_chars)
+        if len(groups) <= 1:
+            return groups[0] if groups else ""
+        if len(groups) >= len(parts):
+            # 조각 하나가 이미 한 묶음을 차지해 더 줄일 수 없음
+            break
+        logger.info(f"Reducing {len(parts)} partial results in {len(groups)} groups (level {depth + 1})")
+        parts = await map_bounded(groups, combine)
+    return "\n\n".join(parts)
@@ -0,0 +1,170 @@
+"""
+CueNote Core - TODO 인덱스
+노트에서 체크박스 TODO를 파싱하여 todos 테이블에 반영합니다.
+"""
+import hashlib
+import sqlite3
+
+from .config import TODO_PATTERN
+from .db import prefix_range
+from .schemas import TodoItem
+
+
+def make_todo_id(note_path: str, text: str, occurrence: int) -> str:
+    """
+    줄 이동에 안정적인 TODO ID
+    줄 번호 대신 같은 노트에서 같은 텍스트가 몇 번째로 나타났는지를 사용하므로,
+    위쪽에 줄을 추가/삭제해도 ID가 바뀌지 않습니다.
+    """
+    raw_id = f"{note_path}:{text}:{occurrence}"
+    return hashlib.sha1(raw_id.encode("utf-8")).hexdigest()
+
+
+def parse_todos(note_path: str, content: str) -> list[TodoItem]:
+    """노트에서 TODO 항목을 파싱"""
+    todos: list[TodoItem] = []
+    occurrences: dict[str, int] = {}
+    for index, line in enumerate(content.splitlines(), start=1):
+        match = TODO_PATTERN.match(line)
+        if not match:
+            continue
+        checked = match.group("checked").lower() == "x"
+        text = match.group("text").strip()
+        occurrence = occurrences.get(text, 0)
+        occurrences[text] = occurrence + 1
+        todos.append(
+            TodoItem(
+                id=make_todo_id(note_path, text, occurrence),
+                text=text,
+                checked=checked,
+                notePath=note_path,
+                lineNo=index,
+            )
+        )
+    return todos
+
+
+def reindex_note_todos(conn: sqlite3.Connection, note_path: str, content: str) -> int:
+    """
+    노트의 TODO를 증분으로 다시 인덱싱하고 개수를 반환 (commit은 호출자가 담당)
+    기존 행과 ID(내용 기준)로 비교해 사라진 항목은 삭제, 새 항목은 추가하고,
+    체크 상태나 줄 번호가 바뀐 항목만 갱신합니다. updated_at은 추가/체크 변경 시에만 바뀝니다.
+    """
+    todos = parse_todos(note_path, content)
+    existing = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute(
+            "SELECT id, line_no, checked FROM todos WHERE note_path = ?", (note_path,)
+        )
+    }
+
+    inserts: list[tuple] = []
+    line_updates: list[tuple] = []
+    checked_updates: list[tuple] = []
+    for todo in todos:
+        checked = 1 if todo.checked else 0
+        previous = existing.pop(todo.id, None)
+        if previous is None:
+            inserts.append((todo.id, todo.notePath, todo.lineNo, todo.text, checked))
+        elif previous[1] != checked:
+            checked_updates.append((todo.lineNo, checked, todo.id))
+        elif previous[0] != todo.lineNo:
+            line_updates.append((todo.lineNo, todo.id))
+
+    if existing:
+        conn.executemany("DELETE FROM todos WHERE id = ?", [(todo_id,) for todo_id in existing])
+    if inserts:
+        # 이름이 바뀐 노트에서 옮겨 온 같은 ID가 남아 있을 수 있으므로 교체
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO todos (id, note_path, line_no, text, checked, updated_at)
+            VALUES (?, ?, ?, ?, ?, datetime('now'))
+            """,
+            inserts,
+        )
+    if checked_updates:
+        conn.executemany(
+            "UPDATE todos SET line_no = ?, checked = ?, updated_at = datetime('now') WHERE id = ?",
+            checked_updates,
+        )
+    if line_updates:
+        conn.executemany("UPDATE todos SET line_no = ? WHERE id = ?", line_updates)
+    return len(todos)
+
+
+def reindex_todos_for_edits(
+    conn: sqlite3.Connection,
+    note_path: str,
+    content: str,
+    changes: list[tuple[int, int, int, str]]
+) -> int:
+    """
+    부분 편집 후 TODO 인덱스 갱신 (commit은 호출자가 담당)
+    changes: note_index.apply_text_edits가 반환한 줄 범위
+    편집 범위에 기존 TODO 줄이나 새 TODO 줄이 있을 때만 노트 전체를 다시 비교하고,
+    그 외에는 편집 아래쪽 TODO의 줄 번호만 이동합니다.
+    """
+    rows = conn.execute(
+        "SELECT id, line_no FROM todos WHERE note_path = ?", (note_path,)
+    ).fetchall()
+    touched = any(first <= line_no <= last for _, line_no in rows for first, last, _, _ in changes)
+    new_todo = any(TODO_PATTERN.match(line) for *_, text in changes for line in text.split("\n"))
+    if touched or new_todo:
+        return reindex_note_todos(conn, note_path, content)
+
+    # 편집마다 늘어나거나 줄어든 줄 수 (바뀐 새 줄 수 - 바뀐 원본 줄 수)
+    deltas = [(last, text.count("\n") - (last - first)) for first, last, _, text in changes]
+    updates = []
+    for todo_id, line_no in rows:
+        shift = sum(delta for last, delta in deltas if last < line_no)
+        if shift:
+            updates.append((line_no + shift, todo_id))
+    if updates:
+        conn.executemany("UPDATE todos SET line_no = ? WHERE id = ?", updates)
+    return len(rows)
+
+
+def remove_note_todos(conn: sqlite3.Connection, note_path: str) -> None:
+    """노트의 TODO를 인덱스에서 제거 (commit은 호출자가 담당)"""
+    conn.execute("DELETE FROM todos WHERE note_path = ?", (note_path,))
+
+
+def _move_todos(
+    conn: sqlite3.Connection, rows: list[tuple], old_prefix: str, new_prefix: str
+) -> None:
+    """
+    TODO 행을 새 경로와 그 경로 기준 ID로 옮김
+    rows: (id, note_path, text) - 노트별 줄 순서. 같은 텍스트의 등장 순번을 parse_todos와 같은
+    순서로 다시 세므로, 옮긴 뒤 다시 인덱싱해도 ID와 체크 상태가 그대로 유지됩니다.
+    """
+    occurrences: dict[tuple[str, str], int] = {}
+    updates = []
+    for todo_id, note_path, text in rows:
+        occurrence = occurrences.get((note_path, text), 0)
+        occurrences[(note_path, text)] = occurrence + 1
+        new_path = new_prefix + note_path[len(old_prefix):]
+        updates.append((make_todo_id(new_path, text, occurrence), new_path, todo_id))
+    if updates:
+        conn.executemany("UPDATE OR REPLACE todos SET id = ?, note_path = ? WHERE id = ?", updates)
+
+
+def rename_note_todos(conn: sqlite3.Connection, old_path: str, new_path: str) -> None:
+    """이름이 바뀐 노트의 TODO를 새 경로 기준 ID로 옮김 (commit은 호출자가 담당)"""
+    rows = conn.execute(
+        "SELECT id, note_path, text FROM todos WHERE note_path = ? ORDER BY line_no",
+        (old_path,),
+    ).fetchall()
+    _move_todos(conn, rows, old_path, new_path)
+
+
+def rename_folder_todos(conn: sqlite3.Connection, old_prefix: str, new_prefix: str) -> None:
+    """이름이 바뀐 폴더 하위 노트의 TODO를 새 경로 기준 ID로 옮김 (commit은 호출자가 담당)"""
+    rows = conn.execute(
+        """
+        SELECT id, note_path, text FROM todos
+        WHERE note_path >= ? AND note_path < ?
+        ORDER BY note_path, line_no
+        """,
+        prefix_range(old_prefix),
+    ).fetchall()
+    _move_todos(conn, rows, old_prefix, new_prefix)
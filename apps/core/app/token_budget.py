@@ -0,0 +1,375 @@
+"""
+CueNote Core - 토큰 예산
+제공자/모델별 토큰 수 계산과 컨텍스트 윈도우를 기준으로 프롬프트 입력 길이를 정합니다.
+
+토큰 계산기 (오프라인에서 가능한 것부터):
+    openai - tiktoken (설치되어 있고 인코딩 파일을 불러올 수 있을 때)
+    ollama - DATA_DIR/tokenizers/<모델 이름>/tokenizer.json + tokenizers 패키지
+    그 외  - 문자 종류별 보정 계수를 쓰는 NumPy 추정기 (조회표 한 번으로 전체 텍스트 분류)
+
+컨텍스트 윈도우는 각 클라이언트의 모델 목록(GEMINI_MODELS, OPENAI_MODELS, CLAUDE_MODELS)과
+Ollama에 지정하는 num_ctx(MAX_CONTEXT_TOKENS)를 사용합니다.
+"""
+import logging
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+try:
+    from .config import DATA_DIR
+except ImportError:
+    from config import DATA_DIR
+
+logger = logging.getLogger("cuenote.core")
+
+# 사용자 지정 토크나이저 디렉토리 (Ollama 모델용 tokenizer.json)
+TOKENIZERS_DIR = DATA_DIR / "tokenizers"
+
+# 기본 출력 예약 토큰 (출력 길이가 입력에 비례하지 않는 작업)
+DEFAULT_OUTPUT_RESERVE = 1024
+
+# 추정기 오차를 위한 여유 (윈도우 대비 비율), 정확한 계산기의 최소 여유 토큰
+ESTIMATE_SAFETY_RATIO = 0.05
+EXACT_SAFETY_TOKENS = 64
+
+# 제공자별 최대 출력 토큰 (클라이언트 요청값 또는 보수적인 모델 기본값)
+MAX_OUTPUT_TOKENS = {
+    "ollama": 4096,
+    "gemini": 8192,
+    "openai": 16384,
+    "anthropic": 4096,
+}
+
+CLOUD_PROVIDERS = ("gemini", "openai", "anthropic")
+
+
+def effective_provider(provider: str, api_key: str = "") -> str:
+    """API 키가 없는 클라우드 제공자는 Ollama로 처리 (각 라우터의 호출 규칙과 동일)"""
+    return provider if provider in CLOUD_PROVIDERS and api_key else "ollama"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 추정기
+# ─────────────────────────────────────────────────────────────────────────────
+
+# 문자 분류: 공백, 라틴/숫자, 문장부호/기호/줄바꿈, 한글 음절, 한자/가나, BMP 밖(이모지 등)
+_SPACE, _LATIN, _PUNCT, _HANGUL, _CJK, _ASTRAL = range(6)
+
+
+def _build_class_table() -> np.ndarray:
+    table = np.full(0x10000, _PUNCT, dtype=np.uint8)
+    for code in range(0x250):
+        ch = chr(code)
+        if ch in " \t":
+            table[code] = _SPACE
+        elif ch.isalnum():
+            table[code] = _LATIN
+    table[0x0370:0x0530] = _LATIN     # 그리스어, 키릴 문자
+    table[0x1100:0x1200] = _HANGUL    # 한글 자모
+    table[0x3130:0x3190] = _HANGUL    # 호환용 자모
+    table[0xAC00:0xD7A4] = _HANGUL    # 한글 음절
+    table[0x3040:0x3100] = _CJK       # 가나
+    table[0x3400:0xA000] = _CJK       # 한자
+    table[0xF900:0xFB00] = _CJK
+    return table
+
+
+_CLASS_TABLE = _build_class_table()
+
+# 문자 분류별 토큰 계수 [공백, 라틴, 부호, 한글, 한자/가나, BMP 밖]
+# 각 토크나이저 계열의 한국어/영어 문서 측정치를 올림한 값 (예산을 넘지 않도록 약간 과대 추정)
+ESTIMATOR_PROFILES: dict[str, np.ndarray] = {
+    "cl100k": np.array([0.05, 0.27, 0.6, 1.6, 1.3, 2.0]),
+    "o200k": np.array([0.05, 0.25, 0.5, 0.9, 0.9, 1.5]),
+    "gemini": np.array([0.05, 0.25, 0.5, 0.7, 0.8, 1.5]),
+    "claude": np.array([0.05, 0.29, 0.6, 1.4, 1.2, 2.0]),
+    "ollama": np.array([0.05, 0.27, 0.5, 1.0, 0.9, 1.5]),
+}
+
+
+class TokenCounter(ABC):
+    """토큰 계산기 기본 클래스"""
+
+    exact = False
+    name = ""
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """텍스트의 토큰 수"""
+
+
+class EstimateCounter(TokenCounter):
+    """문자 종류별 계수로 토큰 수 추정 (Python 루프 없이 NumPy로 분류/집계)"""
+
+    def __init__(self, profile: str):
+        self.name = f"estimate:{profile}"
+        self.weights = ESTIMATOR_PROFILES[profile]
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        astral = codes > 0xFFFF
+        classes = _CLASS_TABLE[np.where(astral, 0, codes)]
+        counts = np.bincount(classes, minlength=6).astype(np.float64)
+        n_astral = int(np.count_nonzero(astral))
+        if n_astral:
+            counts[_PUNCT] -= n_astral
+            counts[_ASTRAL] += n_astral
+        return int(np.ceil(counts @ self.weights))
+
+
+class TiktokenCounter(TokenCounter):
+    """OpenAI tiktoken 인코딩 (정확)"""
+
+    exact = True
+
+    def __init__(self, encoding):
+        self.name = f"tiktoken:{encoding.name}"
+        self.encoding = encoding
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+class HFTokenizerCounter(TokenCounter):
+    """Hugging Face tokenizer.json (정확)"""
+
+    exact = True
+
+    def __init__(self, tokenizer, name: str):
+        self.name = f"tokenizer:{name}"
+        self.tokenizer = tokenizer
+
+    def count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def _openai_profile(model: str) -> str:
+    legacy = model.startswith(("gpt-3.5", "gpt-4")) and not model.startswith(("gpt-4o", "gpt-4.1"))
+    return "cl100k" if legacy else "o200k"
+
+
+def _load_tiktoken(model: str) -> Optional[TokenCounter]:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding(f"{_openai_profile(model)}_base")
+        return TiktokenCounter(encoding)
+    except Exception as e:
+        # 인코딩 파일이 캐시에 없고 오프라인인 경우
+        logger.warning(f"tiktoken unavailable for {model}, using estimator: {e}")
+        return None
+
+
+def _load_hf_tokenizer(model: str) -> Optional[TokenCounter]:
+    name = model.split(":", 1)[0]
+    tokenizer_file = TOKENIZERS_DIR / name / "tokenizer.json"
+    if not tokenizer_file.exists():
+        return None
+    try:
+        from tokenizers import Tokenizer
+        return HFTokenizerCounter(Tokenizer.from_file(str(tokenizer_file)), name)
+    except Exception as e:
+        logger.warning(f"Failed to load tokenizer for {model}, using estimator: {e}")
+        return None
+
+
+_counters: dict[tuple[str, str], TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_counter(provider: str, model: Optional[str] = None) -> TokenCounter:
+    """제공자/모델의 토큰 계산기 (프로세스 전체에서 공유)"""
+    model = model or _default_model(provider)
+    key = (provider, model)
+    counter = _counters.get(key)
+    if counter is not None:
+        return counter
+
+    with _counters_lock:
+        counter = _counters.get(key)
+        if counter is None:
+            if provider == "openai":
+                counter = _load_tiktoken(model) or EstimateCounter(_openai_profile(model))
+            elif provider == "gemini":
+                counter = EstimateCounter("gemini")
+            elif provider == "anthropic":
+                counter = EstimateCounter("claude")
+            else:
+                counter = _load_hf_tokenizer(model) or EstimateCounter("ollama")
+            _counters[key] = counter
+        return counter
+
+
+def count_tokens(text: str, provider: str = "ollama", model: Optional[str] = None) -> int:
+    """텍스트의 토큰 수 (정확한 계산기가 없으면 추정)"""
+    return get_counter(provider, model).count(text)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 컨텍스트 윈도우
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _model_table(provider: str) -> tuple[list[dict], str]:
+    # 클라이언트 모듈이 이 모듈을 import하므로 지연 import
+    if provider == "gemini":
+        from . import gemini_client
+        return gemini_client.GEMINI_MODELS, gemini_client.DEFAULT_GEMINI_MODEL
+    if provider == "openai":
+        from . import openai_client
+        return openai_client.OPENAI_MODELS, openai_client.DEFAULT_OPENAI_MODEL
+    if provider == "anthropic":
+        from . import anthropic_client
+        return anthropic_client.CLAUDE_MODELS, anthropic_client.DEFAULT_CLAUDE_MODEL
+    return [], ""
+
+
+def _default_model(provider: str) -> str:
+    if provider == "ollama":
+        from . import ollama_client
+        return ollama_client.DEFAULT_OLLAMA_MODEL
+    return _model_table(provider)[1]
+
+
+@lru_cache(maxsize=64)
+def get_context_window(provider: str, model: Optional[str] = None) -> int:
+    """모델의 컨텍스트 윈도우 (토큰). 목록에 없는 모델은 가장 긴 접두사가 일치하는 모델, 없으면 기본 모델 기준"""
+    if provider == "ollama":
+        from . import ollama_client
+        return ollama_client.MAX_CONTEXT_TOKENS
+
+    models, default_model = _model_table(provider)
+    windows = {m["id"]: m["context_window"] for m in models}
+    model = model or default_model
+    if model in windows:
+        return windows[model]
+    prefixes = [model_id for model_id in windows if model.startswith(model_id)]
+    if prefixes:
+        return windows[max(prefixes, key=len)]
+    return windows.get(default_model, min(windows.values(), default=8192))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 예산
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _cut_at_boundary(text: str, max_chars: int) -> str:
+    """max_chars 이내에서 문장/문단 경계로 자르기 (ollama_client.truncate_text와 같은 규칙)"""
+    truncated = text[:max_chars]
+    boundary = max(
+        truncated.rfind('.'),
+        truncated.rfind('。'),
+        truncated.rfind('!'),
+        truncated.rfind('?'),
+        truncated.rfind('\n\n')
+    )
+    if boundary > max_chars * 0.7:
+        truncated = truncated[:boundary + 1]
+    return truncated
+
+
+class PromptBudget:
+    """
+    프롬프트 하나의 입력 토큰 예산
+    윈도우에서 출력 예약과 오차 여유를 뺀 값으로 시작해, 고정 템플릿(spend)과
+    가변 섹션(fit)이 사용한 만큼 줄어듭니다.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        api_key: str = "",
+        model: Optional[str] = None,
+        output_reserve: int = DEFAULT_OUTPUT_RESERVE
+    ):
+        self.provider = effective_provider(provider, api_key)
+        self.model = model or None
+        self.counter = get_counter(self.provider, self.model)
+        self.window = get_context_window(self.provider, self.model)
+        self.max_output = MAX_OUTPUT_TOKENS[self.provider]
+        margin = EXACT_SAFETY_TOKENS if self.counter.exact else int(self.window * ESTIMATE_SAFETY_RATIO)
+        self.remaining = max(0, self.window - min(output_reserve, self.max_output) - margin)
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def spend(self, text: str) -> int:
+        """항상 들어가는 템플릿 부분을 예산에서 차감"""
+        tokens = self.count(text)
+        self.remaining = max(0, self.remaining - tokens)
+        return tokens
+
+    def available(self, output_ratio: float = 0.0, share: float = 1.0) -> int:
+        """
+        다음 섹션에 쓸 수 있는 토큰 수
+        output_ratio: 출력이 입력에 비례하는 작업(번역, 확장 등)의 출력/입력 비율
+        share: 남은 예산 중 이 섹션에 줄 비율
+        """
+        tokens = int(self.remaining * share)
+        if output_ratio > 0:
+            tokens = min(int(tokens / (1 + output_ratio)), int(self.max_output / output_ratio))
+        return max(0, tokens)
+
+    def fit(
+        self,
+        text: str,
+        output_ratio: float = 0.0,
+        share: float = 1.0,
+        max_tokens: Optional[int] = None
+    ) -> tuple[str, bool]:
+        """텍스트를 남은 예산에 맞게 자르고 사용한 만큼 차감. Returns: (텍스트, 잘렸는지)"""
+        limit = self.available(output_ratio, share)
+        if max_tokens is not None:
+            limit = min(limit, max_tokens)
+        text, truncated, tokens = truncate_to_tokens(text, limit, self.counter)
+        self.remaining = max(0, self.remaining - int(tokens * (1 + output_ratio)))
+        return text, truncated
+
+    def chars_for(self, text: str, tokens: int) -> int:
+        """이 텍스트의 문자/토큰 비율로 환산한 tokens만큼의 문자 수 (청크 크기 계산용)"""
+        total = self.count(text)
+        if total <= tokens:
+            return max(len(text), 1)
+        return max(1, len(text) * tokens // total)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, counter: TokenCounter) -> tuple[str, bool, int]:
+    """
+    텍스트를 max_tokens 이하로 자르기 (문장 경계 우선)
+    Returns: (텍스트, 잘렸는지, 토큰 수)
+    """
+    total = counter.count(text)
+    if total <= max_tokens:
+        return text, False, total
+    if max_tokens <= 0:
+        return "", True, 0
+
+    max_chars = len(text) * max_tokens // total
+    over_chars = len(text)
+    for _ in range(6):
+        truncated = _cut_at_boundary(text, max_chars)
+        tokens = counter.count(truncated)
+        if tokens <= max_tokens:
+            return truncated, True, tokens
+        over_chars = min(over_chars, len(truncated))
+        max_chars = max(1, int(max_chars * max_tokens / tokens * 0.97))
+
+    # 비율 보정으로도 맞추지 못하면 경계 없이 예산 안에 드는 가장 긴 앞부분을 이진 탐색
+    low, high = 0, over_chars - 1
+    while low < high:
+        mid = (low + high + 1) // 2
+        if counter.count(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    truncated = text[:low]
+    return truncated, True, counter.count(truncated)
@@ -0,0 +1,179 @@
+"""
+CueNote Core - 현재 Vault 컨텍스트
+environments.json을 파싱한 결과와, 그로부터 결정되는 현재 Vault / 휴지통 / 이미지 경로를
+메모리에 캐시합니다.
+
+- routers/environment.py를 통한 저장은 invalidate()로 즉시 반영됩니다.
+- 외부에서 파일을 고친 경우는 mtime/크기 변화로 감지합니다 (stat은 최대 STAT_INTERVAL마다 한 번).
+- GitHub 클론처럼 가리키는 경로가 아직 없어 기본 Vault로 대체된 경우, 같은 주기로 경로가 생겼는지 다시 확인합니다.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import DATA_DIR, VAULT_PATH, logger
+
+# 환경 설정 파일 경로 (앱 데이터 폴더)
+ENV_CONFIG_PATH = DATA_DIR / "environments.json"
+
+# 환경 설정 파일 변경 확인 주기 (초)
+STAT_INTERVAL = 1.0
+
+
+def get_git_repos_dir() -> Path:
+    """GitHub 리포지토리 클론 디렉토리 경로 반환 (github.py와 동일)"""
+    if os.name == 'nt':
+        base = Path(os.environ.get('APPDATA', '')) / 'cuenote'
+    elif os.name == 'posix':
+        if 'darwin' in sys.platform:
+            base = Path.home() / 'Library' / 'Application Support' / 'cuenote'
+        else:
+            base = Path.home() / '.local' / 'share' / 'cuenote'
+    else:
+        base = Path.home() / '.cuenote'
+    return base / 'git-repos'
+
+
+class VaultContext:
+    """환경 설정 한 버전에서 결정된 경로 묶음"""
+
+    __slots__ = ("env_id", "vault_path", "trash_path", "img_path", "pending_path")
+
+    def __init__(self, env_id: Optional[str], vault_path: Path, pending_path: Optional[Path] = None):
+        self.env_id = env_id
+        self.vault_path = vault_path
+        self.trash_path = vault_path / ".trash"
+        self.img_path = vault_path / "img"
+        # 환경이 가리키지만 아직 없어서 기본 Vault로 대체한 경로
+        self.pending_path = pending_path
+
+
+def _resolve(data: dict) -> VaultContext:
+    """파싱된 환경 설정에서 현재 Vault 경로 결정"""
+    current_id = data.get("current_id")
+    if not current_id:
+        return VaultContext(None, VAULT_PATH)
+
+    for env in data.get("environments", []):
+        if env.get("id") != current_id:
+            continue
+
+        # GitHub 환경인 경우 로컬 클론 경로
+        if env.get("type", "local") == "github":
+            github_info = env.get("github") or {}
+            owner = github_info.get("owner")
+            repo = github_info.get("repo")
+            if not (owner and repo):
+                return VaultContext(current_id, VAULT_PATH)
+            target = get_git_repos_dir() / f"{owner}_{repo}"
+        else:
+            target = Path(env.get("path", ""))
+
+        if target.exists():
+            return VaultContext(current_id, target)
+        return VaultContext(current_id, VAULT_PATH, pending_path=target)
+
+    return VaultContext(current_id, VAULT_PATH)
+
+
+class _EnvironmentCache:
+    """environments.json 파싱 결과 + 현재 Vault 컨텍스트 캐시 (스레드 안전)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: dict = {}
+        self._context: Optional[VaultContext] = None
+        self._signature: Optional[tuple[int, int]] = None
+        self._checked_at = 0.0
+
+    def _stat_signature(self) -> Optional[tuple[int, int]]:
+        try:
+            st = ENV_CONFIG_PATH.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, signature: Optional[tuple[int, int]]) -> None:
+        data: dict = {}
+        if signature is not None:
+            try:
+                data = json.loads(ENV_CONFIG_PATH.read_text(encoding="utf-8"))
+                if not isinstance(data, dict):
+                    data = {}
+            except Exception as e:
+                logger.error("Failed to load environment config: %s", e)
+        self._data = data
+        self._context = _resolve(data)
+        self._signature = signature
+
+    def _refresh(self) -> VaultContext:
+        now = time.monotonic()
+        context = self._context
+        if context is not None and now - self._checked_at < STAT_INTERVAL:
+            return context
+
+        with self._lock:
+            if self._context is not None and now - self._checked_at < STAT_INTERVAL:
+                return self._context
+            signature = self._stat_signature()
+            if self._context is None or signature != self._signature:
+                self._load(signature)
+            elif self._context.pending_path is not None and self._context.pending_path.exists():
+                self._context = _resolve(self._data)
+            self._checked_at = now
+            context = self._context
+            assert context is not None  # _load / _resolve가 항상 컨텍스트를 채움
+            return context
+
+    def context(self) -> VaultContext:
+        return self._refresh()
+
+    def data(self) -> dict:
+        self._refresh()
+        return self._data
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._context = None
+            self._checked_at = 0.0
+
+
+_cache = _EnvironmentCache()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 공개 API
+# ─────────────────────────────────────────────────────────────────────────────
+
+def get_env_config_data() -> dict:
+    """파싱된 environments.json (캐시, 수정하지 말 것)"""
+    return _cache.data()
+
+
+def invalidate() -> None:
+    """환경 설정을 저장한 뒤 호출 (다음 조회에서 다시 읽음)"""
+    _cache.invalidate()
+
+
+def get_vault_context() -> VaultContext:
+    """현재 환경의 Vault 컨텍스트"""
+    return _cache.context()
+
+
+def get_current_vault_path() -> Path:
+    """현재 선택된 환경의 Vault 경로 반환 (GitHub 환경 포함)"""
+    return _cache.context().vault_path
+
+
+def get_trash_path() -> Path:
+    """현재 Vault의 휴지통 경로 반환"""
+    return _cache.context().trash_path
+
+
+def get_img_path() -> Path:
+    """현재 Vault의 이미지 저장 경로 반환"""
+    return _cache.context().img_path
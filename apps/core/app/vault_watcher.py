@@ -0,0 +1,342 @@
+"""
+CueNote Core - Vault 파일 감시자
+현재 Vault 디렉토리의 변경(git pull, 챗봇 도구, 외부 에디터 등)을 감지하여
+노트 인덱스, TODO 인덱스, 그래프 캐시를 증분으로 갱신합니다.
+watchdog이 없으면 stat 기반 폴링으로 동작합니다.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Optional
+
+from . import note_index
+from .config import logger
+from .db import prefix_range, transaction
+from .todo_index import reindex_note_todos, remove_note_todos
+from .vault_context import get_current_vault_path
+
+# 마지막 이벤트 이후 이 시간 동안 조용하면 배치 처리 (초)
+DEBOUNCE_SECONDS = 0.5
+
+# 이벤트가 계속 들어와도 이 시간이 지나면 배치 처리 (초)
+MAX_BATCH_DELAY = 3.0
+
+# Vault 전환 확인 / 폴링 주기 (초)
+POLL_INTERVAL = 2.0
+
+
+def _is_excluded(rel_path: str) -> bool:
+    return any(part in note_index.EXCLUDED_DIRS for part in rel_path.split("/"))
+
+
+class _Batch:
+    """디바운스 구간 동안 모인 변경 사항 (경로는 Vault 기준 상대 경로)"""
+
+    def __init__(self):
+        self.changed: set[str] = set()
+        self.removed: set[str] = set()
+        self.removed_dirs: set[str] = set()
+        self.moved_dirs: list[tuple[str, str]] = []
+        self.scan_dirs: set[str] = set()
+
+    def file_changed(self, path: str):
+        self.removed.discard(path)
+        self.changed.add(path)
+
+    def file_removed(self, path: str):
+        self.changed.discard(path)
+        self.removed.add(path)
+
+    def __bool__(self):
+        return bool(
+            self.changed or self.removed or self.removed_dirs or self.moved_dirs or self.scan_dirs
+        )
+
+
+class VaultWatcher:
+    """현재 Vault를 감시하는 백그라운드 서비스"""
+
+    def __init__(self):
+        self.vault_path: Optional[Path] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._observer = None
+        self._snapshot: dict[str, tuple[int, int]] = {}
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # 시작 / 종료
+    # ─────────────────────────────────────────────────────────────────────────
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._stop_observer()
+        if self.vault_path is not None:
+            note_index.set_watched(self.vault_path, False)
+            self.vault_path = None
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # 감시 대상 관리
+    # ─────────────────────────────────────────────────────────────────────────
+
+    async def _switch_vault(self, vault_path: Path):
+        """감시 대상 Vault 변경 (최초 시작 포함)"""
+        loop = asyncio.get_running_loop()
+        self._stop_observer()
+        if self.vault_path is not None:
+            note_index.set_watched(self.vault_path, False)
+
+        self.vault_path = vault_path
+        self._snapshot = {}
+        if not vault_path.exists():
+            return
+
+        # 감시 시작 전 변경분 따라잡기 (stat 비교로 바뀐 노트만 다시 읽음)
+        await loop.run_in_executor(None, self._catch_up, vault_path)
+
+        if not self._start_observer(vault_path, loop):
+            self._snapshot = await loop.run_in_executor(None, self._take_snapshot, vault_path)
+        note_index.set_watched(vault_path, True)
+        logger.info(
+            "Vault watcher started (%s): %s",
+            "watchdog" if self._observer else "polling", vault_path,
+        )
+
+    def _start_observer(self, vault_path: Path, loop: asyncio.AbstractEventLoop) -> bool:
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.warning(
+                "watchdog not installed, falling back to polling. Run: pip install watchdog"
+            )
+            return False
+
+        queue = self._queue
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in ("opened", "closed", "closed_no_write"):
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, (vault_path, event))
+
+        try:
+            observer = Observer()
+            observer.schedule(_Handler(), str(vault_path), recursive=True)
+            observer.start()
+        except Exception as e:
+            logger.warning("Failed to start file observer, falling back to polling: %s", e)
+            return False
+        self._observer = observer
+        return True
+
+    def _stop_observer(self):
+        if self._observer is None:
+            return
+        try:
+            self._observer.stop()
+            self._observer.join(timeout=2)
+        except Exception as e:
+            logger.warning("Failed to stop file observer: %s", e)
+        self._observer = None
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # 이벤트 루프
+    # ─────────────────────────────────────────────────────────────────────────
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                current = get_current_vault_path()
+                if current != self.vault_path:
+                    await self._switch_vault(current)
+                # 이번 배치의 감시 대상 (_switch_vault 이후 self.vault_path와 같음)
+                vault_path = current
+
+                batch = _Batch()
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    if self._observer is None and vault_path.exists():
+                        batch = await loop.run_in_executor(None, self._poll, vault_path)
+                else:
+                    self._add_event(batch, *item)
+                    deadline = loop.time() + MAX_BATCH_DELAY
+                    while loop.time() < deadline:
+                        try:
+                            item = await asyncio.wait_for(
+                                self._queue.get(), timeout=DEBOUNCE_SECONDS
+                            )
+                        except asyncio.TimeoutError:
+                            break
+                        self._add_event(batch, *item)
+
+                if batch:
+                    await loop.run_in_executor(None, self._apply, vault_path, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Vault watcher error: %s", e)
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def _relative(self, vault_path: Path, path) -> Optional[str]:
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        try:
+            rel_path = os.path.relpath(path, vault_path).replace("\\", "/")
+        except ValueError:
+            return None
+        if rel_path == "." or rel_path.startswith("../") or _is_excluded(rel_path):
+            return None
+        return rel_path
+
+    def _add_event(self, batch: _Batch, vault_path: Path, event):
+        """watchdog 이벤트를 배치에 반영"""
+        if vault_path != self.vault_path:
+            return
+        src = self._relative(vault_path, event.src_path)
+        dest = None
+        if event.event_type == "moved":
+            dest = self._relative(vault_path, getattr(event, "dest_path", "") or "")
+
+        if event.is_directory:
+            if event.event_type == "deleted" and src:
+                batch.removed_dirs.add(src)
+            elif event.event_type == "moved":
+                if src and dest:
+                    batch.moved_dirs.append((src, dest))
+                elif src:
+                    batch.removed_dirs.add(src)
+                elif dest:
+                    batch.scan_dirs.add(dest)
+            elif event.event_type == "created" and src:
+                batch.scan_dirs.add(src)
+            return
+
+        if event.event_type == "moved":
+            if src and src.endswith(".md"):
+                batch.file_removed(src)
+            if dest and dest.endswith(".md"):
+                batch.file_changed(dest)
+        elif src and src.endswith(".md"):
+            if event.event_type == "deleted":
+                batch.file_removed(src)
+            else:
+                batch.file_changed(src)
+
+    # ─────────────────────────────────────────────────────────────────────────
+    # 인덱스 반영 (워커 스레드에서 실행)
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def _catch_up(self, vault_path: Path):
+        """마지막 실행 이후 바뀐 노트를 인덱스에 반영"""
+        result = note_index.refresh(vault_path, force=True)
+        batch = _Batch()
+        for path in result["changed"]:
+            batch.file_changed(path)
+        for path in result["removed"]:
+            batch.file_removed(path)
+        if batch:
+            self._apply(vault_path, batch)
+
+    def _take_snapshot(self, vault_path: Path) -> dict[str, tuple[int, int]]:
+        return {
+            rel_path: (st.st_mtime_ns, st.st_size)
+            for rel_path, st in note_index._iter_markdown_files(vault_path)
+        }
+
+    def _poll(self, vault_path: Path) -> _Batch:
+        """watchdog이 없을 때: stat 스냅샷 비교로 변경 감지"""
+        snapshot = self._take_snapshot(vault_path)
+        batch = _Batch()
+        for rel_path, stat in snapshot.items():
+            if self._snapshot.get(rel_path) != stat:
+                batch.file_changed(rel_path)
+        for rel_path in self._snapshot.keys() - snapshot.keys():
+            batch.file_removed(rel_path)
+        self._snapshot = snapshot
+        return batch
+
+    def _apply(self, vault_path: Path, batch: _Batch):
+        """배치를 노트 인덱스 / TODO 인덱스 / 그래프 캐시에 반영"""
+        stale_prefixes: list[str] = []
+
+        # 1. 노트 인덱스 (각 호출이 자체 트랜잭션 사용)
+        for old_dir, new_dir in batch.moved_dirs:
+            note_index.rename_folder(vault_path, old_dir, new_dir)
+            stale_prefixes.append(old_dir.rstrip("/") + "/")
+            batch.scan_dirs.add(new_dir)
+
+        for folder in batch.removed_dirs:
+            note_index.remove_folder(vault_path, folder)
+            stale_prefixes.append(folder.rstrip("/") + "/")
+
+        for folder in batch.scan_dirs:
+            for rel_path, _ in note_index._iter_markdown_files(vault_path / folder):
+                batch.file_changed(f"{folder.rstrip('/')}/{rel_path}")
+
+        removed: list[str] = []
+        for rel_path in batch.removed:
+            if (vault_path / rel_path).exists():
+                batch.changed.add(rel_path)
+                continue
+            note_index.remove_note(vault_path, rel_path)
+            removed.append(rel_path)
+
+        contents: dict[str, str] = {}
+        for rel_path in batch.changed:
+            try:
+                contents[rel_path] = (vault_path / rel_path).read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            note_index.update_note(vault_path, rel_path, contents[rel_path])
+
+        # 2. TODO 인덱스 (한 트랜잭션)
+        with transaction() as conn:
+            for prefix in stale_prefixes:
+                conn.execute(
+                    "DELETE FROM todos WHERE note_path >= ? AND note_path < ?",
+                    prefix_range(prefix),
+                )
+            for rel_path in removed:
+                remove_note_todos(conn, rel_path)
+            for rel_path, content in contents.items():
+                # 쓰기 경로에서 노트 인덱스가 먼저 갱신되었을 수 있으므로 TODO는 항상 다시 계산
+                reindex_note_todos(conn, rel_path, content)
+
+        # 변경된 노트는 콘텐츠 해시가 달라 캐시에서 자연히 무시되므로, 삭제된 경로만 정리
+        self._invalidate_graph_cache(vault_path, set(removed), tuple(stale_prefixes))
+        logger.info(
+            "Vault watcher applied: %d changed, %d removed, %d folders",
+            len(contents), len(removed),
+            len(batch.removed_dirs) + len(batch.moved_dirs),
+        )
+
+    def _invalidate_graph_cache(self, vault_path: Path, paths: set[str], prefixes: tuple[str, ...]):
+        from .routers.graph_cache import get_graph_cache
+
+        try:
+            cache = get_graph_cache(vault_path)
+            if not cache.exists():
+                return
+            if cache.invalidate_paths(paths, prefixes):
+                cache.save()
+        except Exception as e:
+            logger.warning("Failed to invalidate graph cache: %s", e)
+
+
+# 앱 전역 감시자
+vault_watcher = VaultWatcher()
@@ -0,0 +1,57 @@
+"""
+db - 버전 기반 스키마 마이그레이션
+"""
+import sqlite3
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+def _names(conn: sqlite3.Connection, kind: str) -> set[str]:
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))
+    return {row[0] for row in rows}
+
+
+def test_migrate_fresh_database_applies_all(conn):
+    version = db.migrate(conn)
+    assert version == db.MIGRATIONS[-1][0]
+    assert {"todos", "schedules", "schema_version"} <= _names(conn, "table")
+    assert "idx_todos_updated" in _names(conn, "index")
+
+
+def test_migrate_is_idempotent(conn):
+    db.migrate(conn)
+    db.migrate(conn)
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_version")]
+    assert versions == [version for version, _, _ in db.MIGRATIONS]
+
+
+def test_migrate_upgrades_from_older_version(conn, monkeypatch):
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS[:1])
+    assert db.migrate(conn) == 1
+    assert "idx_todos_updated" not in _names(conn, "index")
+
+    monkeypatch.undo()
+    assert db.migrate(conn) == db.MIGRATIONS[-1][0]
+    assert "idx_todos_updated" in _names(conn, "index")
+
+
+def test_failed_migration_rolls_back(conn, monkeypatch):
+    def broken(c: sqlite3.Connection) -> None:
+        c.execute("CREATE TABLE half_applied (id INTEGER)")
+        raise RuntimeError("boom")
+
+    latest = db.MIGRATIONS[-1][0]
+    monkeypatch.setattr(db, "MIGRATIONS", [*db.MIGRATIONS, (latest + 1, "broken", broken)])
+    with pytest.raises(RuntimeError):
+        db.migrate(conn)
+    assert db.get_schema_version(conn) == latest
+    assert "half_applied" not in _names(conn, "table")
@@ -0,0 +1,103 @@
+"""
+json_extract - LLM 응답 JSON 복구 / 스트리밍 파싱
+"""
+import pytest
+
+from app.json_extract import (
+    JSONStreamParser,
+    extract_first_json,
+    loads_lenient,
+    parse_json_response,
+    repair_json,
+)
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 스트리밍 파싱 (JSONStreamParser)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _feed_all(parser: JSONStreamParser, text: str, size: int) -> list:
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_stream_emits_matching_values_in_order(size):
+    text = (
+        '설명입니다.\n```json\n'
+        '{"summary": "요약 \\"본문\\"", "keyPoints": ["하나", "둘"], "n": -1.5}\n```'
+    )
+    parser = JSONStreamParser([("summary",), ("keyPoints", "*")])
+    events = _feed_all(parser, text, size)
+    assert events[:3] == [
+        (("summary",), '요약 "본문"'),
+        (("keyPoints", 0), "하나"),
+        (("keyPoints", 1), "둘"),
+    ]
+    assert events[-1] == ((), {"summary": '요약 "본문"', "keyPoints": ["하나", "둘"], "n": -1.5})
+    assert parser.done
+
+
+def test_stream_close_repairs_truncated_response():
+    parser = JSONStreamParser()
+    parser.feed('{"summary": "끊긴 문장')
+    assert parser.close() == '{"summary": "끊긴 문장"}'
+
+    parser = JSONStreamParser()
+    parser.feed('{"a": [1, 2], "n": -')
+    assert parser.close() == '{"a": [1, 2]}'
+
+    parser = JSONStreamParser()
+    parser.feed('{"ok": tr')
+    assert parser.close() == '{"ok": true}'
+
+
+def test_stream_close_without_json_is_value_error():
+    parser = JSONStreamParser()
+    parser.feed("JSON 없음")
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_extract_first_json_ignores_braces_in_strings():
+    assert extract_first_json('앞 {"a": "}{"} 뒤 {"b": 1}') == '{"a": "}{"}'
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 로컬 복구 (repair_json / parse_json_response)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def test_repair_with_korean_text_after_json():
+    text = "{'a': 'x'} 위 결과입니다."
+    assert parse_json_response(text, '{"a": "string"}') == {"a": "x"}
+
+
+def test_repair_with_korean_text_around_json():
+    text = "요약 결과: {summary: '회의 정리', 'keyPoints': ['일정', '예산'],} 이상입니다."
+    assert parse_json_response(text, '{"summary": "", "keyPoints": []}') == {
+        "summary": "회의 정리",
+        "keyPoints": ["일정", "예산"],
+    }
+
+
+def test_repair_quotes_non_ascii_bare_keys():
+    assert parse_json_response("{이름: '홍길동'}") == {"이름": "홍길동"}
+
+
+def test_loads_lenient_repairs_common_mistakes():
+    text = "```json\n{'items': [True, None,], “note”: “스마트 따옴표”}\n```"
+    assert loads_lenient(text) == {"items": [True, None], "note": "스마트 따옴표"}
+
+
+def test_schema_mismatch_is_value_error_unless_final():
+    with pytest.raises(ValueError):
+        parse_json_response('{"other": 1}', '{"summary": ""}')
+    assert parse_json_response('{"other": 1}', '{"summary": ""}', final=True) == {"other": 1}
+
+
+def test_repair_failure_is_value_error():
+    with pytest.raises(ValueError):
+        repair_json("JSON이 없는 응답입니다.")
+    with pytest.raises(ValueError):
+        parse_json_response("답변: 없음 {", '{"a": "string"}')
@@ -0,0 +1,59 @@
+"""
+note_index - 부분 저장 편집 적용 (apply_text_edits / _utf16_indexer)
+"""
+import pytest
+
+from app.note_index import _utf16_indexer, apply_text_edits
+
+
+def _js_offset(text: str, index: int) -> int:
+    """파이썬 인덱스 → 에디터(JS) 기준 UTF-16 오프셋"""
+    return len(text[:index].encode("utf-16-le")) // 2
+
+
+def test_utf16_indexer_ascii_and_bmp_are_identity():
+    to_index = _utf16_indexer("가나다 abc")
+    assert [to_index(i) for i in range(7)] == list(range(7))
+
+
+def test_utf16_indexer_maps_offsets_after_astral_characters():
+    content = "a😀b😀c"
+    to_index = _utf16_indexer(content)
+    for index in range(len(content) + 1):
+        assert to_index(_js_offset(content, index)) == index
+
+
+def test_utf16_indexer_rejects_split_surrogate_and_out_of_range():
+    to_index = _utf16_indexer("a😀b")
+    with pytest.raises(ValueError):
+        to_index(2)
+    with pytest.raises(ValueError):
+        to_index(5)
+    with pytest.raises(ValueError):
+        to_index(-1)
+
+
+def test_apply_edits_in_any_order_with_line_changes():
+    content = "첫 줄\n- [ ] 할 일\n끝"
+    edits = [
+        (_js_offset(content, content.index("끝")), 1, "마지막"),
+        (_js_offset(content, content.index("할 일")), 3, "할 일\n- [x] 추가"),
+    ]
+    new_content, changes = apply_text_edits(content, edits)
+    assert new_content == "첫 줄\n- [ ] 할 일\n- [x] 추가\n마지막"
+    assert changes == [
+        (2, 2, 2, "- [ ] 할 일\n- [x] 추가"),
+        (3, 3, 4, "마지막"),
+    ]
+
+
+def test_apply_edits_counts_utf16_offsets_past_emoji():
+    content = "😀😀\nx"
+    new_content, changes = apply_text_edits(content, [(_js_offset(content, 3), 1, "y")])
+    assert new_content == "😀😀\ny"
+    assert changes == [(2, 2, 2, "y")]
+
+
+def test_apply_edits_rejects_overlap():
+    with pytest.raises(ValueError):
+        apply_text_edits("abcdef", [(0, 3, "x"), (2, 2, "y")])
@@ -0,0 +1,64 @@
+"""
+text_chunking - 마크다운 청크 분할 / 계층적 리듀스
+"""
+import asyncio
+
+from app.text_chunking import _split_blocks, pack, reduce_hierarchically, split_markdown
+
+
+def _note(sections: int) -> str:
+    return "".join(
+        f"## 섹션 {s}\n\n" + "".join(f"문단 {s}-{p} 내용입니다. " * 6 + "\n\n" for p in range(5))
+        for s in range(sections)
+    )
+
+
+def test_split_is_lossless_and_within_limit():
+    text = _note(12)
+    chunks = split_markdown(text, 800)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 800 for chunk in chunks)
+
+
+def test_short_text_is_single_chunk():
+    assert split_markdown("짧은 노트", 100) == ["짧은 노트"]
+
+
+def test_oversized_block_is_hard_split():
+    text = "한 문장입니다. " * 200
+    chunks = split_markdown(text, 300)
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 300 for chunk in chunks)
+
+
+def test_edit_near_end_keeps_earlier_chunks():
+    text = _note(12)
+    edited = text[:-40] + "마지막 문단을 고쳤습니다.\n\n"
+    before, after = split_markdown(text, 800), split_markdown(edited, 800)
+    assert before[:-2] == after[:len(before) - 2]
+
+
+def test_code_fence_is_one_block():
+    text = "앞 문단\n\n```\ncode\n\n# not a heading\n```\n\n뒤 문단\n"
+    blocks = [block for block, _ in _split_blocks(text)]
+    assert any("```\ncode\n\n# not a heading\n```" in block for block in blocks)
+    assert "".join(blocks) == text
+
+
+def test_pack_groups_in_order_within_limit():
+    assert pack(["aa", "bb", "cc"], 6, "+") == ["aa+bb", "cc"]
+    assert pack(["long piece"], 3) == ["long piece"]
+
+
+def test_reduce_hierarchically_combines_until_one_group():
+    calls = []
+
+    async def combine(group: str) -> str:
+        calls.append(group)
+        return group[:5]
+
+    parts = [f"부분 결과 {i} " * 3 for i in range(20)]
+    result = asyncio.run(reduce_hierarchically(parts, combine, 100))
+    assert calls
+    assert len(result) <= 100
@@ -0,0 +1,76 @@
+"""
+todo_index - TODO ID 안정성 / 증분 인덱싱 / 이름 변경
+"""
+import sqlite3
+
+import pytest
+
+from app.db import migrate
+from app.todo_index import (
+    parse_todos,
+    reindex_note_todos,
+    rename_folder_todos,
+    rename_note_todos,
+)
+
+NOTE = "# 계획\n- [ ] 장보기\n- [x] 운동\n- [ ] 장보기\n"
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def _rows(conn: sqlite3.Connection) -> list[tuple]:
+    return conn.execute(
+        "SELECT id, note_path, line_no, text, checked, updated_at FROM todos"
+        " ORDER BY note_path, line_no"
+    ).fetchall()
+
+
+def test_ids_survive_line_shifts():
+    before = [todo.id for todo in parse_todos("a.md", NOTE)]
+    after = [todo.id for todo in parse_todos("a.md", "서문\n\n" + NOTE)]
+    assert before == after
+    assert len(set(before)) == 3  # 같은 텍스트도 등장 순번으로 구분
+
+
+def test_reindex_updates_only_line_numbers(conn):
+    reindex_note_todos(conn, "a.md", NOTE)
+    conn.execute("UPDATE todos SET updated_at = 'earlier'")
+    reindex_note_todos(conn, "a.md", "서문\n" + NOTE)
+    rows = _rows(conn)
+    assert [row[2] for row in rows] == [3, 4, 5]
+    assert {row[5] for row in rows} == {"earlier"}
+
+
+def test_rename_note_moves_todos_to_new_path_ids(conn):
+    reindex_note_todos(conn, "a.md", NOTE)
+    conn.execute("UPDATE todos SET updated_at = 'earlier'")
+    rename_note_todos(conn, "a.md", "b.md")
+
+    rows = _rows(conn)
+    assert [row[0] for row in rows] == [todo.id for todo in parse_todos("b.md", NOTE)]
+    assert {row[1] for row in rows} == {"b.md"}
+    assert {row[5] for row in rows} == {"earlier"}
+
+    # 이름 변경 후 다시 인덱싱해도 행이 바뀌지 않음
+    reindex_note_todos(conn, "b.md", NOTE)
+    assert _rows(conn) == rows
+
+
+def test_rename_folder_moves_nested_notes(conn):
+    reindex_note_todos(conn, "old/a.md", NOTE)
+    reindex_note_todos(conn, "old/sub/b.md", "- [ ] 장보기\n")
+    reindex_note_todos(conn, "older.md", "- [ ] 장보기\n")
+    rename_folder_todos(conn, "old/", "new/")
+
+    paths = {row[1] for row in _rows(conn)}
+    assert paths == {"new/a.md", "new/sub/b.md", "older.md"}
+    expected = {todo.id for todo in parse_todos("new/a.md", NOTE)}
+    expected |= {todo.id for todo in parse_todos("new/sub/b.md", "- [ ] 장보기\n")}
+    expected |= {todo.id for todo in parse_todos("older.md", "- [ ] 장보기\n")}
+    assert {row[0] for row in _rows(conn)} == expected
@@ -0,0 +1,69 @@
+"""
+token_budget - 토큰 추정 / 입력 예산 / 토큰 기준 자르기
+"""
+import pytest
+
+from app.token_budget import (
+    EstimateCounter,
+    PromptBudget,
+    TokenCounter,
+    effective_provider,
+    truncate_to_tokens,
+)
+
+
+class _StepCounter(TokenCounter):
+    """두 글자까지만 글자 수, 그 이상은 항상 큰 값 (비율 보정이 수렴하지 않는 계산기)"""
+
+    def count(self, text: str) -> int:
+        return len(text) if len(text) <= 2 else 100
+
+
+def test_token_counter_is_abstract():
+    with pytest.raises(TypeError):
+        TokenCounter()  # type: ignore[abstract]
+
+
+def test_estimate_counter_scales_with_text():
+    counter = EstimateCounter("claude")
+    assert counter.count("") == 0
+    short, long = counter.count("안녕하세요 hello"), counter.count("안녕하세요 hello " * 10)
+    assert 0 < short < long
+
+
+def test_effective_provider_requires_api_key():
+    assert effective_provider("openai", "") == "ollama"
+    assert effective_provider("openai", "key") == "openai"
+    assert effective_provider("unknown", "key") == "ollama"
+
+
+@pytest.mark.parametrize("max_tokens", [1, 10, 100, 400])
+def test_truncate_stays_within_budget(max_tokens):
+    counter = EstimateCounter("ollama")
+    text = "첫 문장입니다. 두 번째 문장이에요! 세 번째는 질문인가요? " * 50
+    truncated, was_cut, tokens = truncate_to_tokens(text, max_tokens, counter)
+    assert was_cut
+    assert text.startswith(truncated)
+    assert tokens == counter.count(truncated) <= max_tokens
+
+
+def test_truncate_falls_back_when_ratio_does_not_converge():
+    assert truncate_to_tokens("가" * 1000, 50, _StepCounter()) == ("가가", True, 2)
+
+
+def test_truncate_short_text_and_zero_budget():
+    counter = EstimateCounter("ollama")
+    tokens = counter.count("짧은 글")
+    assert truncate_to_tokens("짧은 글", 100, counter) == ("짧은 글", False, tokens)
+    assert truncate_to_tokens("짧은 글", 0, counter) == ("", True, 0)
+
+
+def test_prompt_budget_spends_and_fits():
+    budget = PromptBudget("anthropic", api_key="key", model="claude-test")
+    start = budget.remaining
+    budget.spend("고정 템플릿 " * 10)
+    assert budget.remaining < start
+
+    text, truncated = budget.fit("본문 " * 10, max_tokens=5)
+    assert truncated
+    assert budget.count(text) <= 5
@@ -24,7 +24,7 @@ const showOnlyCluster = ref<number | null | 'unclustered'>(null);
 export function useGraph() {
   const { settings: llmSettings } = useSettings();
 
-  // 그래프 데이터 로드
+  // 그래프 데이터 로드 (SSE 스트리밍: 노드 → 엣지 → 클러스터 → 라벨 순으로 점진 반영)
   async function loadGraphData() {
     isLoading.value = true;
     error.value = null;
@@ -33,7 +33,7 @@ export function useGraph() {
       // LLM 설정을 로컬 useSettings에서 읽기
       const llm = llmSettings.value.llm;
       
-      const response = await fetch(`${API_BASE_URL}/graph/data`, {
+      const response = await fetch(`${API_BASE_URL}/graph/data/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -47,8 +47,29 @@ export function useGraph() {
       
       if (!response.ok) throw new Error(`HTTP ${response.status}`);
       
-      const data: GraphData = await response.json();
-      graphData.value = data;
+      const reader = response.body?.getReader();
+      if (!reader) throw new Error('No reader available');
+      
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let currentEvent = '';
+      
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() || '';
+        
+        for (const line of lines) {
+          if (line.startsWith('event:')) {
+            currentEvent = line.slice(6).trim();
+          } else if (line.startsWith('data:')) {
+            applyGraphEvent(currentEvent, line.slice(5).trim());
+          }
+        }
+      }
     } catch (e) {
       error.value = e instanceof Error ? e.message : '알 수 없는 오류';
       console.error('Graph data load failed:', e);
@@ -57,6 +78,43 @@ export function useGraph() {
     }
   }
 
+  // 스트리밍 이벤트를 그래프 데이터에 반영
+  function applyGraphEvent(event: string, raw: string) {
+    if (event === 'error') throw new Error(raw || '그래프 데이터 생성 중 오류 발생');
+    if (!raw) return;
+    const data = JSON.parse(raw);
+    const current = graphData.value;
+    
+    if (event === 'nodes') {
+      graphData.value = { nodes: data.nodes, edges: [], clusters: [], totalNotes: data.totalNotes };
+      // 노드가 그려지면 로딩 표시 해제 (나머지 단계는 백그라운드 반영)
+      isLoading.value = false;
+    } else if (!current) {
+      return;
+    } else if (event === 'edges') {
+      graphData.value = { ...current, edges: data.edges };
+    } else if (event === 'clusters') {
+      const clusterMap = new Map<number, ClusterInfo>(
+        (data.clusters as ClusterInfo[]).map(c => [c.id, c])
+      );
+      const nodes = current.nodes.map(n => {
+        const cluster = clusterMap.get(data.assignments[n.id] ?? -1);
+        return cluster
+          ? { ...n, cluster: cluster.id, clusterLabel: cluster.label, color: cluster.color }
+          : n;
+      });
+      graphData.value = { ...current, nodes, clusters: data.clusters };
+    } else if (event === 'label') {
+      const clusters = current.clusters.map(c =>
+        c.id === data.id ? { ...c, label: data.label, keywords: data.keywords || [] } : c
+      );
+      const nodes = current.nodes.map(n =>
+        n.cluster === data.id ? { ...n, clusterLabel: data.label } : n
+      );
+      graphData.value = { ...current, nodes, clusters };
+    }
+  }
+
   // 노드 필터링
   const filteredNodes = computed(() => {
     if (!graphData.value) return [];